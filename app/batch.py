@@ -0,0 +1,191 @@
+"""
+Bulk runner for content calendars.
+
+Streams PostRequest-shaped lines from a JSONL file through the
+LangGraph workflow with bounded concurrency and appends one result
+line per request to an output JSONL. Re-running with the same output
+file resumes: requests whose hash already has an "ok" line are skipped.
+Fail-soft runs (an LLM outage mid-run) are written as "error" lines,
+so they are retried.
+
+Usage:
+    python -m app.batch posts.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from app.main import PostRequest, build_initial_state, build_response
+from graph.guards import is_fail_soft
+from graph.observability import log_run_summary, arun_workflow
+from graph.run_store import build_run_store
+from graph.workflow import get_workflow
+from graph.early_stop import trajectory
+
+
+# ---------- LINE HANDLING ----------
+
+def request_hash(request: PostRequest) -> str:
+    """
+    Stable hash of a validated request (key order and
+    defaulted fields do not change it).
+    """
+    canonical = json.dumps(request.model_dump(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def iter_requests(path: str) -> Iterator[Tuple[int, Optional[PostRequest], Optional[str]]]:
+    """
+    Lazily yields (line_number, request, error) for each non-empty line,
+    so arbitrarily large calendars never sit in memory at once.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, PostRequest.model_validate_json(line), None
+            except ValidationError as e:
+                yield line_number, None, str(e)
+
+
+def load_completed(path: str) -> Set[str]:
+    """
+    Hashes of requests that already finished successfully
+    in a previous (possibly crashed) run.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from a crash mid-write
+                continue
+            if record.get("status") == "ok" and record.get("request_hash"):
+                completed.add(record["request_hash"])
+    return completed
+
+
+# ---------- EXECUTION ----------
+
+async def run_one(line_number: int, request: PostRequest, digest: str, run_store) -> Dict[str, Any]:
+    initial_state = build_initial_state(request)
+    config = {"tags": ["agentic-linkedin-post-optimizer", "batch"]}
+
+    try:
+        final_state = await arun_workflow(get_workflow(), initial_state, config)
+    except Exception as e:
+        return {
+            "request_hash": digest,
+            "line": line_number,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+    log_run_summary(final_state["run_metrics"])
+
+    # An LLM outage ended the run early: an error, so a resume retries it
+    if is_fail_soft(final_state):
+        return {
+            "request_hash": digest,
+            "line": line_number,
+            "status": "error",
+            "error": f"fail-soft: {final_state['run_metrics']['stop_reason']}",
+        }
+
+    response = build_response(final_state)
+    run_store.record(digest, final_state, response)
+
+    return {
+        "request_hash": digest,
+        "line": line_number,
+        "status": "ok",
+        "request": request.model_dump(),
+        "final_post": response["final_post"],
+        "final_score": response["final_score"],
+        "iterations_used": response["iterations_used"],
+        "change_summary": response["change_summary"],
+        "run_metrics": final_state["run_metrics"],
+        # Training data for the early-stop predictor
+        "trajectory": trajectory(final_state),
+    }
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 4) -> Dict[str, int]:
+    """
+    Processes input_path with at most `concurrency` runs in flight,
+    appending each result to output_path as soon as it completes.
+    """
+    completed = load_completed(output_path)
+    run_store = build_run_store()
+    stats = {"submitted": 0, "ok": 0, "error": 0, "skipped": 0, "invalid": 0}
+    seen: Set[str] = set()
+    pending: Set[asyncio.Task] = set()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(record: Dict[str, Any]):
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+        async def drain(return_when):
+            nonlocal pending
+            done, pending = await asyncio.wait(pending, return_when=return_when)
+            for task in done:
+                record = task.result()
+                stats[record["status"]] += 1
+                write(record)
+
+        for line_number, request, error in iter_requests(input_path):
+            if request is None:
+                stats["invalid"] += 1
+                write({"line": line_number, "status": "invalid", "error": error})
+                continue
+
+            digest = request_hash(request)
+            if digest in completed or digest in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(digest)
+
+            if len(pending) >= concurrency:
+                await drain(asyncio.FIRST_COMPLETED)
+
+            pending.add(asyncio.create_task(run_one(line_number, request, digest, run_store)))
+            stats["submitted"] += 1
+
+        if pending:
+            await drain(asyncio.ALL_COMPLETED)
+
+    await asyncio.to_thread(run_store.close)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run LinkedIn post requests from a JSONL file through the workflow."
+    )
+    parser.add_argument("input", help="JSONL file of PostRequest objects")
+    parser.add_argument("output", help="JSONL file results are appended to (also the resume log)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max runs in flight")
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be >= 1")
+
+    stats = asyncio.run(run_batch(args.input, args.output, args.concurrency))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
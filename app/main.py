@@ -1,11 +1,80 @@
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
-from fastapi.responses import PlainTextResponse
+from fastapi import FastAPI, Header, HTTPException, Query
+from pydantic import AnyHttpUrl, BaseModel, Field, field_validator, model_validator
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Literal, Optional
-from graph.workflow import linkedin_post_workflow
-from graph.observability import log_run_summary,run_workflow
+from graph.workflow import build_graph, get_workflow
+from graph.observability import log_run_summary,arun_workflow,aresume_workflow
+from graph.checkpoints import open_checkpointer, thread_config, aresume_point, arelease_run
+from graph.cache import NullCache, build_run_cache, run_cache_key, is_cacheable
+from graph.events import astream_workflow_events
+from graph.guards import is_fail_soft
+from graph.state import get_draft
+from graph.metrics import RUNS_IN_FLIGHT, metrics_payload, record_job, record_run, register_cache
+from graph.run_store import NullRunStore, build_run_store
+from graph.job_queue import JobWorkerPool, QueueFull, build_job_queue, webhook_url_error
+from prompts.evaluator import evaluation_cache
+from models.llm_config import fused_revision_enabled, warm_up
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the run cache, run store and job queue, compiles the workflow against
+    the SQLite checkpointer, so runs that fail-soft or get interrupted
+    can be resumed by run_id, and warms LLM clients in the background
+    without delaying readiness.
+    """
+    warmup = (
+        asyncio.create_task(warm_up())
+        if os.getenv("LLM_WARMUP", "true").lower() not in ("0", "false", "off")
+        else None
+    )
+
+    # SQLite files are opened here, not at import
+    app.state.run_cache = await asyncio.to_thread(build_run_cache)
+    register_cache("run", app.state.run_cache)
+    app.state.run_store = await asyncio.to_thread(build_run_store)
+    app.state.job_queue = await asyncio.to_thread(build_job_queue)
+    job_queue = app.state.job_queue
+
+    async with open_checkpointer() as checkpointer:
+        if checkpointer is not None:
+            app.state.workflow = build_graph().compile(checkpointer=checkpointer)
+
+        # Job workers run inside the checkpointer's lifetime: a job whose
+        # worker died resumes its run from the last checkpoint
+        if job_queue is not None and job_workers() > 0:
+            await asyncio.to_thread(job_queue.prune, float(os.getenv("JOB_RETENTION_DAYS", "7")) * 86400)
+            app.state.job_pool = JobWorkerPool(
+                job_queue,
+                run_job,
+                workers=job_workers(),
+                poll_interval=float(os.getenv("JOB_POLL_SECONDS", "1.0")),
+                on_finished=record_job,
+            )
+            app.state.job_pool.start()
+        yield
+
+        if app.state.job_pool is not None:
+            await app.state.job_pool.stop()
+            app.state.job_pool = None
+
+    if warmup is not None:
+        warmup.cancel()
+    app.state.workflow = None
+    app.state.job_queue = None
+    app.state.run_cache = NullCache()
+    # Write runs still queued for the history store
+    await asyncio.to_thread(app.state.run_store.close)
+    app.state.run_store = NullRunStore()
+
 
 app = FastAPI(
     title="Agentic LinkedIn Post Optimizer",
@@ -14,14 +83,40 @@ app = FastAPI(
         "proof-of-work-safe LinkedIn post optimization using LangGraph"
     ),
     version="1.1.0",
+    lifespan=lifespan,
 )
 
+# Un-checkpointed until the lifespan opens the checkpointer; likewise
+# no run cache, run history or /jobs until it opens their SQLite files
+app.state.workflow = None
+app.state.job_pool = None
+app.state.job_queue = None
+app.state.run_store = NullRunStore()
+app.state.run_cache = NullCache()
+
+
+def current_workflow():
+    return app.state.workflow or get_workflow()
+
+register_cache("evaluation", evaluation_cache)
+
+
+def job_workers() -> int:
+    # JOB_WORKERS=0: this process only enqueues (another one drains)
+    return int(os.getenv("JOB_WORKERS", "2"))
+
 
 # ---------- API SCHEMAS ----------
 
 class PostRequest(BaseModel):
     topic: str = Field(..., description="User-provided content or claim")
     max_iterations: int = Field(3, ge=1, le=8)
+    optimizer_candidates: int = Field(
+        1,
+        ge=1,
+        le=4,
+        description="Rewrites generated and scored concurrently per iteration (best-of-N)",
+    )
 
     communication_style: Literal[
         "ENGINEERING_DIRECT",
@@ -32,6 +127,13 @@ class PostRequest(BaseModel):
         description="Controls how the post is framed, not what facts are allowed",
     )
 
+    @model_validator(mode="after")
+    def check_candidates(self):
+        # FUSED_REVISION proposes one revision per review call
+        if self.optimizer_candidates > 1 and fused_revision_enabled():
+            raise ValueError("optimizer_candidates > 1 is not supported with FUSED_REVISION")
+        return self
+
 
 class PostResponse(BaseModel):
     final_post: str
@@ -41,6 +143,38 @@ class PostResponse(BaseModel):
     # NEW: surfaced for transparency
     change_summary: Optional[str]
 
+    # Pass to /optimize/{run_id}/resume after a fail-soft result
+    run_id: Optional[str] = None
+
+
+class JobRequest(PostRequest):
+    webhook_url: Optional[AnyHttpUrl] = Field(
+        None,
+        description="POSTed the job status and result when the job finishes (https, public host)",
+    )
+
+    @field_validator("webhook_url")
+    @classmethod
+    def check_webhook_url(cls, url):
+        # Public endpoint: callbacks must not be aimed at internal services
+        error = webhook_url_error(str(url)) if url is not None else None
+        if error:
+            raise ValueError(error)
+        return url
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int
+    run_id: str
+    result: Optional[PostResponse] = None
+    error: Optional[str] = None
+    webhook_status: Optional[str] = None
+
 
 # ---------- STATE INITIALIZATION ----------
 
@@ -61,6 +195,7 @@ def build_initial_state(request: PostRequest) -> Dict[str, Any]:
         # -----------------
         "iteration_count": 0,
         "max_iterations": request.max_iterations,
+        "optimizer_candidates": request.optimizer_candidates,
 
         # -----------------
         # Agent-populated fields
@@ -68,6 +203,7 @@ def build_initial_state(request: PostRequest) -> Dict[str, Any]:
         "intent": None,
         "references": [],
         "draft_post": "",
+        "drafts": {},
         "review_feedback": "",
         "quality_score": 0,
 
@@ -86,6 +222,11 @@ def build_initial_state(request: PostRequest) -> Dict[str, Any]:
         # best iteration
         "best_iteration": None,
 
+        # Best-of-N review handed from optimizer to evaluator
+        "candidate_review": None,
+        "repeated_draft": None,
+        "proposed_revision": None,
+
         # -----------------
         # Diagnostics
         # -----------------
@@ -103,11 +244,14 @@ def build_initial_state(request: PostRequest) -> Dict[str, Any]:
                 "evaluator": 0,
                 "optimizer": 0,
                 "summarizer": 0,
+                "reviser": 0,
             },
 
             # Iteration behavior
             "iterations": 0,
             "optimizer_runs": 0,
+            "optimizer_candidates_evaluated": 0,
+            "evaluation_cache_hits": 0,
             "rollbacks": 0,
 
             # Quality
@@ -118,41 +262,44 @@ def build_initial_state(request: PostRequest) -> Dict[str, Any]:
             # Cost control
             "token_budget_remaining": 40000,
             "estimated_tokens_used": 0,
+            # Reservations awaiting reported usage, and the running
+            # (actual - estimated) error once reconciled
+            "pending_estimates": {},
+            "estimation_error_tokens": 0,
 
             # Termination
             "stop_reason": None,
 
+            # Intent fast path (local classifier vs LLM)
+            "intent_fast_path": None,
+            "intent_confidence": None,
+            "intent_fast_path_hit_rate": None,
+
             # Actual Cost
             "prompt_tokens": 0,
             "completion_tokens": 0,
             "total_tokens": 0,
             "total_cost_usd": 0,
+
+            # Exact usage per agent (filled by UsageCollector)
+            "usage_by_agent": {},
+
+            # Wall time per graph node (filled by UsageCollector)
+            "node_seconds": {},
         },
     }
 
 
 
-# ---------- ENDPOINTS ----------
-
-@app.post("/optimize", response_model=PostResponse)
-def optimize_linkedin_post(request: PostRequest):
+def build_response(final_state: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Runs the full agentic loop:
-    Intent → References → Generate → Evaluate → Optimize → Summarize
+    Picks the best iteration (never the last explored one)
+    and shapes it into the PostResponse payload.
     """
-
-    initial_state = build_initial_state(request)
-    config = {"tags": ["agentic-linkedin-post-optimizer"]}
-    final_state = run_workflow(linkedin_post_workflow,initial_state,config)
-
-    # Logging agent run summary
-    log_run_summary(final_state["run_metrics"])
-
-    # Picking up the best state post and scores
     best = final_state.get("best_iteration")
 
     final_post = (
-        best["draft_post"]
+        get_draft(final_state, best)
         if best is not None
         else final_state["draft_post"]
     )
@@ -171,28 +318,276 @@ def optimize_linkedin_post(request: PostRequest):
     }
 
 
+def request_from_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Request fields of a (resumed) run, for its run cache key.
+    """
+    return {
+        "topic": state["topic"],
+        "communication_style": state["communication_style"],
+        "max_iterations": state["max_iterations"],
+        "optimizer_candidates": state.get("optimizer_candidates", 1),
+    }
+
+
+async def finish_run(run_id: str, final_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Logs and shapes a finished run. Clean runs are cached and their
+    checkpoints dropped; fail-soft runs stay resumable by run_id.
+    """
+    # Logging agent run summary
+    log_run_summary(final_state["run_metrics"])
+    record_run(final_state["run_metrics"])
+
+    response = build_response(final_state)
+    app.state.run_store.record(run_id, final_state, response)
+    if is_cacheable(final_state):
+        await app.state.run_cache.aset(run_cache_key(request_from_state(final_state)), response)
+        await arelease_run(current_workflow(), run_id)
+    return {**response, "run_id": run_id}
+
+
+async def start_run(request: PostRequest, run_id: str) -> Dict[str, Any]:
+    initial_state = build_initial_state(request)
+    config = thread_config(run_id, {"tags": ["agentic-linkedin-post-optimizer"]})
+    with RUNS_IN_FLIGHT.track_inprogress():
+        return await arun_workflow(current_workflow(),initial_state,config)
+
+
+async def run_post_request(request: PostRequest, run_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Serves identical requests from the run cache;
+    otherwise runs the workflow and caches the response.
+    """
+    cached = await app.state.run_cache.aget(run_cache_key(request.model_dump()))
+    if cached is not None:
+        return cached
+
+    run_id = run_id or uuid.uuid4().hex
+    final_state = await start_run(request, run_id)
+    return await finish_run(run_id, final_state)
+
+
+class FailSoftRun(RuntimeError):
+    pass
+
+
+async def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Executes one queued job. A retried job (its previous worker died
+    mid-run, or the run fail-softed) continues from its run's last
+    checkpoint instead of paying for the completed nodes again.
+    """
+    workflow = current_workflow()
+    final_state = None
+    if job["attempts"] > 1 and workflow.checkpointer is not None:
+        snapshot = await aresume_point(workflow, job["run_id"])
+        if snapshot is not None:
+            config = thread_config(job["run_id"], {"tags": ["agentic-linkedin-post-optimizer", "job", "resume"]})
+            with RUNS_IN_FLIGHT.track_inprogress():
+                final_state = await aresume_workflow(workflow, snapshot, config)
+
+    if final_state is None:
+        request = PostRequest(**job["request"])
+        cached = await app.state.run_cache.aget(run_cache_key(request.model_dump()))
+        if cached is not None:
+            return cached
+        final_state = await start_run(request, job["run_id"])
+
+    response = await finish_run(job["run_id"], final_state)
+    # An LLM outage ended the run early: fail the attempt, so the queue
+    # retries it with backoff instead of succeeding with a degraded post
+    if is_fail_soft(final_state):
+        raise FailSoftRun(final_state["run_metrics"].get("stop_reason") or "fail-soft")
+    return response
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: job[key] for key in JobStatus.model_fields}
+
+
+# ---------- ENDPOINTS ----------
+
+@app.post("/optimize", response_model=PostResponse)
+async def optimize_linkedin_post(request: PostRequest):
+    """
+    Runs the full agentic loop:
+    Intent → References → Generate → Evaluate → Optimize → Summarize
+    """
+    return await run_post_request(request)
+
+
 @app.post("/optimize/text", response_class=PlainTextResponse)
-def optimize_linkedin_post_text(request: PostRequest):
+async def optimize_linkedin_post_text(request: PostRequest):
     """
     Returns only the final LinkedIn post text,
     formatted exactly as it should be published.
     """
+    response = await run_post_request(request)
+    return response["final_post"]
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_post_request(request: PostRequest, include_tokens: bool = True):
+    """
+    Yields Server-Sent Events as each node finishes,
+    ending with the best post (`result`) and `done`.
+    """
+    cached = await app.state.run_cache.aget(run_cache_key(request.model_dump()))
+    if cached is not None:
+        yield format_sse("result", {**cached, "cached": True})
+        yield format_sse("done", {})
+        return
 
+    run_id = uuid.uuid4().hex
     initial_state = build_initial_state(request)
-    config = {"tags": ["agentic-linkedin-post-optimizer"]}
-    final_state = run_workflow(linkedin_post_workflow,initial_state,config)
-    
+    config = thread_config(run_id, {"tags": ["agentic-linkedin-post-optimizer", "stream"]})
 
-    # Logging agent run summary
-    log_run_summary(final_state["run_metrics"])
+    # First event, so a client whose stream drops can still resume
+    yield format_sse("run", {"run_id": run_id})
 
-    # Picking up the best state post and scores
-    best = final_state.get("best_iteration")
+    with RUNS_IN_FLIGHT.track_inprogress():
+        async for event in astream_workflow_events(
+            current_workflow(), initial_state, config, include_tokens=include_tokens
+        ):
+            name = event.pop("event")
+            if name != "final_state":
+                yield format_sse(name, event)
+                continue
 
-    final_post = (
-        best["draft_post"]
-        if best is not None
-        else final_state["draft_post"]
+            final_state = event["state"]
+            response = await finish_run(run_id, final_state)
+
+            yield format_sse("result", {
+                **response,
+                "cached": False,
+                "stop_reason": final_state["run_metrics"]["stop_reason"],
+            })
+
+    yield format_sse("done", {})
+
+
+@app.post("/optimize/stream")
+async def optimize_linkedin_post_stream(request: PostRequest, tokens: bool = True):
+    """
+    Same loop as /optimize, streamed as Server-Sent Events:
+    run, intent, draft, evaluation (per iteration), revision, rollback,
+    fail_soft, summary, result, done.
+    With tokens=true (default), generator and optimizer output is
+    also streamed token by token as `token` events.
+    """
+    return StreamingResponse(
+        stream_post_request(request, include_tokens=tokens),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/optimize/{run_id}/resume", response_model=PostResponse)
+async def resume_linkedin_post(run_id: str):
+    """
+    Continues a fail-soft or interrupted run from its last good
+    checkpoint: nodes that already completed are not re-run (or re-paid).
+    """
+    workflow = current_workflow()
+    if workflow.checkpointer is None:
+        raise HTTPException(status_code=503, detail="Checkpointing is disabled")
+
+    snapshot = await aresume_point(workflow, run_id)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No resumable checkpoint for run {run_id} (unknown or already completed)",
+        )
+
+    config = thread_config(run_id, {"tags": ["agentic-linkedin-post-optimizer", "resume"]})
+    with RUNS_IN_FLIGHT.track_inprogress():
+        final_state = await aresume_workflow(workflow, snapshot, config)
+
+    return await finish_run(run_id, final_state)
+
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def enqueue_linkedin_post(request: JobRequest, idempotency_key: Optional[str] = Header(None)):
+    """
+    Queues the full agentic loop and returns immediately. Poll
+    GET /jobs/{job_id}, or pass webhook_url to be called back.
+    Resubmitting with the same Idempotency-Key header returns the
+    original job instead of starting (and paying for) another run.
+    """
+    job_queue = app.state.job_queue
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+
+    try:
+        job, created = await asyncio.to_thread(
+            job_queue.enqueue,
+            request.model_dump(exclude={"webhook_url"}),
+            str(request.webhook_url) if request.webhook_url else None,
+            idempotency_key,
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full ({e})", headers={"Retry-After": "30"})
+
+    if created and app.state.job_pool is not None:
+        app.state.job_pool.notify()
+    return job_status(job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """
+    Status of a queued job; `result` is set once it succeeded.
+    """
+    job_queue = app.state.job_queue
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job_status(job)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Run cache hit/miss counters (this worker's view).
+    """
+    return app.state.run_cache.stats()
+
+
+@app.get("/analytics")
+def analytics(
+    days: Optional[float] = Query(default=None, gt=0),
+    intent: Optional[Literal["TECH_THOUGHT_LEADERSHIP", "PROOF_OF_WORK"]] = None,
+    communication_style: Optional[Literal["ENGINEERING_DIRECT", "VIRAL_ENGINEER", "STORY_DRIVEN"]] = None,
+):
+    """
+    Aggregates over the local run history: cost per score point,
+    iterations distribution and stop-reason breakdown, optionally
+    over the last `days` and for one intent / style.
+    """
+    run_store = app.state.run_store
+    result = run_store.analytics(
+        since=time.time() - days * 86400 if days else None,
+        intent=intent,
+        communication_style=communication_style,
     )
+    if result is None:
+        raise HTTPException(status_code=503, detail="Run store is disabled")
+    return {**result, "store": run_store.stats()}
 
-    return final_post
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint: per-node latency histograms, per-run
+    iterations/tokens/cost, runs by stop_reason, rollbacks, in-flight
+    runs and cache hit rates.
+    """
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark: what a scale-from-zero replica pays before it
+serves its first response.
+
+Each sample is a fresh interpreter that measures
+  import_ms         `import app.main`
+  startup_ms        lifespan start-up (checkpointer, graph compile)
+  first_request_ms  first /optimize through the full stack
+with the offline fake provider (FAKE_LLM_LATENCY_MS=fixed:0 unless set),
+so the numbers are the service's own overhead, not the provider's.
+
+Usage:
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --budget-import-ms 1200   # exit 1 when over budget (CI)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main as service
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+client = TestClient(service.app)
+before_startup = time.perf_counter()
+with client:
+    ready = time.perf_counter()
+    response = client.post("/optimize", json={"topic": "Cut p95 latency 40% with a reranker cache", "max_iterations": 1})
+    served = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - before_startup) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "status": response.status_code,
+}))
+"""
+
+
+def sample(env: Dict[str, str]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import, start-up and first-request latency.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to sample")
+    parser.add_argument("--no-warmup", action="store_true", help="Disable the start-up warm-up (LLM_WARMUP=false)")
+    parser.add_argument("--budget-import-ms", type=float, help="Fail if median import time exceeds this")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = {
+            **os.environ,
+            "LLM_PROVIDER": os.getenv("LLM_PROVIDER", "fake"),
+            "FAKE_LLM_LATENCY_MS": os.getenv("FAKE_LLM_LATENCY_MS", "fixed:0"),
+            "LANGSMITH_TRACING": os.getenv("LANGSMITH_TRACING", "false"),
+            "RUN_CACHE_BACKEND": "off",
+            "EVAL_CACHE_BACKEND": "memory",
+            "CHECKPOINT_PATH": os.path.join(state_dir, "checkpoints.sqlite3"),
+        }
+        if args.no_warmup:
+            env["LLM_WARMUP"] = "false"
+
+        samples: List[Dict[str, Any]] = [sample(env) for _ in range(args.runs)]
+
+    report = {
+        metric: {
+            "median": round(statistics.median(s[metric] for s in samples), 1),
+            "max": round(max(s[metric] for s in samples), 1),
+        }
+        for metric in ("import_ms", "startup_ms", "first_request_ms")
+    }
+    report["runs"] = args.runs
+    report["warmup"] = not args.no_warmup
+
+    for metric in ("import_ms", "startup_ms", "first_request_ms"):
+        print(f"{metric:<18} median {report[metric]['median']:>8} ms   max {report[metric]['max']:>8} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.budget_import_ms is not None and report["import_ms"]["median"] > args.budget_import_ms:
+        print(f"import budget exceeded: {report['import_ms']['median']} ms > {args.budget_import_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
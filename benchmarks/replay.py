@@ -0,0 +1,168 @@
+"""
+Offline graph benchmark on recorded LLM traffic.
+
+Record a corpus once against the real provider, then replay it with no
+network: every LLM call is answered from the cassettes (models/cassette.py),
+so a run of the whole graph costs only orchestration and policy time.
+Replaying after a change to routing, stop rules or the early-stop model
+shows its effect on stop reasons, scores and tokens in seconds. Calls the
+change introduces (new prompts) are counted as misses.
+
+The corpus is PostRequest-shaped JSONL, as for app.batch.
+
+Usage:
+    python -m benchmarks.replay posts.jsonl --mode record
+    python -m benchmarks.replay posts.jsonl --repeat 5 --json replay.json
+    python -m benchmarks.replay posts.jsonl --on-miss fake   # fill unrecorded calls
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+
+# ---------- SETUP ----------
+
+def configure_env(args, state_dir: str):
+    """
+    Set before the app is imported. Caches are off or per-process so a
+    replay makes the same calls the recording made; nothing persists.
+    """
+    os.environ["LLM_PROVIDER"] = args.mode
+    os.environ["LLM_CASSETTE_DIR"] = args.cassettes
+    os.environ["CASSETTE_ON_MISS"] = args.on_miss
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+    os.environ.setdefault("LLM_WARMUP", "false")
+    os.environ["RUN_CACHE_BACKEND"] = "off"
+    os.environ["EVAL_CACHE_BACKEND"] = "memory"
+    os.environ["RUN_STORE_BACKEND"] = "off"
+    os.environ["CHECKPOINT_BACKEND"] = "off"
+    os.environ.setdefault("CHECKPOINT_PATH", os.path.join(state_dir, "checkpoints.sqlite3"))
+
+
+# ---------- EXECUTION ----------
+
+async def run_corpus(requests: List[Any], concurrency: int) -> Dict[str, Any]:
+    from app.main import build_initial_state, build_response
+    from graph.observability import arun_workflow
+    from graph.workflow import get_workflow
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Dict[str, Any]] = []
+    errors: Counter = Counter()
+
+    async def run_one(request):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                final_state = await arun_workflow(get_workflow(), build_initial_state(request), {"tags": ["replay"]})
+            except Exception as e:
+                errors[f"{type(e).__name__}: {e}"[:200]] += 1
+                return
+            results.append({
+                "seconds": time.perf_counter() - started,
+                "run_metrics": final_state["run_metrics"],
+                "final_score": build_response(final_state)["final_score"],
+            })
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_one(request) for request in requests])
+    return {"wall_seconds": time.perf_counter() - started, "results": results, "errors": errors}
+
+
+def summarize(passes: List[Dict[str, Any]], cassette_stats: Dict[str, Any]) -> Dict[str, Any]:
+    results = [r for p in passes for r in p["results"]]
+    errors = sum((p["errors"] for p in passes), Counter())
+    walls = [p["wall_seconds"] for p in passes]
+
+    node_seconds: Dict[str, float] = defaultdict(float)
+    for r in results:
+        for node, seconds in r["run_metrics"].get("node_seconds", {}).items():
+            node_seconds[node] += seconds
+
+    runs = len(results)
+    return {
+        "passes": len(passes),
+        "runs": runs,
+        "errors": dict(errors),
+        "wall_seconds_median": round(statistics.median(walls), 3),
+        "runs_per_second": round(runs / sum(walls), 2) if sum(walls) else 0.0,
+        "run_ms_median": round(statistics.median(r["seconds"] for r in results) * 1000, 2) if runs else 0.0,
+        "mean_final_score": round(statistics.mean(r["final_score"] for r in results), 2) if runs else 0.0,
+        "mean_optimizer_runs": round(statistics.mean(r["run_metrics"].get("optimizer_runs", 0) for r in results), 2) if runs else 0.0,
+        "mean_total_tokens": round(statistics.mean(r["run_metrics"].get("total_tokens", 0) for r in results)) if runs else 0,
+        "stop_reasons": dict(Counter(r["run_metrics"].get("stop_reason") for r in results).most_common()),
+        "node_ms_per_run": {
+            node: round(seconds / runs * 1000, 3) for node, seconds in sorted(node_seconds.items(), key=lambda kv: -kv[1])
+        } if runs else {},
+        "cassette": cassette_stats,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(
+        f"{report['runs']} runs over {report['passes']} pass(es)  wall {report['wall_seconds_median']}s/pass  "
+        f"{report['runs_per_second']} runs/s  errors {sum(report['errors'].values())}"
+    )
+    print(
+        f"mean final score {report['mean_final_score']}  optimizer runs {report['mean_optimizer_runs']}  "
+        f"tokens {report['mean_total_tokens']}"
+    )
+    cassette = report["cassette"]
+    print(f"cassette hits {cassette['hits']}  misses {cassette['misses']}  recorded {cassette['recorded']}")
+
+    print(f"\n{'stop reason':<46}{'runs':>6}")
+    for reason, count in report["stop_reasons"].items():
+        print(f"{str(reason):<46}{count:>6}")
+
+    print(f"\n{'node':<26}{'ms/run':>10}")
+    for node, ms in report["node_ms_per_run"].items():
+        print(f"{node:<26}{ms:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay a corpus of runs against LLM cassettes.")
+    parser.add_argument("corpus", help="PostRequest-shaped JSONL")
+    parser.add_argument("--mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--cassettes", default=os.getenv("LLM_CASSETTE_DIR", ".cache/cassettes"))
+    parser.add_argument("--on-miss", choices=("error", "fake"), default="error",
+                        help="Unrecorded calls: fail the run, or answer with schema-valid fake output")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay passes over the corpus (timing)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        configure_env(args, state_dir)
+        from app.batch import iter_requests
+        from graph.cache import build_evaluation_cache
+        from models.cassette import get_cassette
+        import prompts.evaluator as evaluator
+
+        requests = [request for _, request, _ in iter_requests(args.corpus) if request is not None]
+        # A recording is made once; repeating it would append duplicates
+        repeat = 1 if args.mode == "record" else args.repeat
+
+        passes = []
+        for _ in range(repeat):
+            # Each pass starts as cold as the recording did: first
+            # recording of every call, no reviews cached by a previous pass
+            get_cassette().rewind()
+            evaluator.evaluation_cache = build_evaluation_cache()
+            passes.append(asyncio.run(run_corpus(requests, args.concurrency)))
+
+    report = summarize(passes, get_cassette().stats())
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
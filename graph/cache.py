@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from graph.guards import is_fail_soft
+from graph.reference_index import index_version
+from models.llm_config import model_fingerprint
+from prompts.templates import prompt_version
+
+
+# ---------- KEYS ----------
+
+def normalize_topic(topic: str) -> str:
+    """
+    Whitespace-insensitive topic form: trailing newlines or
+    double spaces should not defeat the cache.
+    """
+    return " ".join(topic.split())
+
+
+def run_cache_key(request: Dict[str, Any]) -> str:
+    """
+    Content address of a full run: normalized request fields
+    plus the prompt version, model configuration and reference
+    index that produce it.
+    """
+    payload = {
+        "topic": normalize_topic(request["topic"]),
+        "communication_style": request["communication_style"],
+        "max_iterations": request["max_iterations"],
+        "optimizer_candidates": request.get("optimizer_candidates", 1),
+        "prompt_version": prompt_version(),
+        "models": model_fingerprint(),
+        "references": index_version(),
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ---------- BACKENDS ----------
+
+class MemoryCache:
+    """
+    In-process LRU with per-entry TTL. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any):
+        self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+
+class SQLiteCache:
+    """
+    Local SQLite table in WAL mode, so every uvicorn worker
+    on the host shares one cache with concurrent readers.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at >= ?",
+            (key, time.time()),
+        ).fetchone()
+        self._count(row is not None)
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl_seconds),
+        )
+        conn.commit()
+
+    # Async callers: a lookup may wait on the busy timeout, never on the event loop
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any):
+        await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, "hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """
+    Memory in front of SQLite: a shared-tier hit is promoted
+    into the local LRU, writes go to both tiers.
+    """
+
+    def __init__(self, memory: MemoryCache, shared: SQLiteCache):
+        self.memory = memory
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        value = self.shared.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        self.shared.set(key, value)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        value = await self.shared.aget(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    async def aset(self, key: str, value: Any):
+        self.memory.set(key, value)
+        await self.shared.aset(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        memory, shared = self.memory.stats(), self.shared.stats()
+        hits = memory["hits"] + shared["hits"]
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "backend": "tiered",
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "tiers": {"memory": memory, "sqlite": shared},
+        }
+
+
+class NullCache:
+    """Disabled cache (RUN_CACHE_BACKEND=off)."""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any):
+        pass
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return None
+
+    async def aset(self, key: str, value: Any):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "off"}
+
+
+class LazyCache:
+    """
+    Stand-in for a module-level cache that is only opened on first
+    use: importing the module creates no SQLite file.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = self._factory()
+        return self._cache
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.build().get(key)
+
+    def set(self, key: str, value: Any):
+        self.build().set(key, value)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        if self._cache is None:
+            await asyncio.to_thread(self.build)
+        return await self._cache.aget(key)
+
+    async def aset(self, key: str, value: Any):
+        if self._cache is None:
+            await asyncio.to_thread(self.build)
+        await self._cache.aset(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats() if self._cache is not None else {"backend": "not opened"}
+
+
+def build_cache(env_prefix: str, default_path: str):
+    """
+    {env_prefix}_BACKEND: tiered (default) | memory | sqlite | off
+    {env_prefix}_PATH, _TTL_SECONDS, _MAX_ENTRIES tune it.
+    """
+    backend = os.getenv(f"{env_prefix}_BACKEND", "tiered").lower()
+    ttl = float(os.getenv(f"{env_prefix}_TTL_SECONDS", "86400"))
+    max_entries = int(os.getenv(f"{env_prefix}_MAX_ENTRIES", "1024"))
+    path = os.getenv(f"{env_prefix}_PATH", default_path)
+
+    if backend == "off":
+        return NullCache()
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl_seconds=ttl)
+    if backend == "sqlite":
+        return SQLiteCache(path, ttl_seconds=ttl)
+    return TieredCache(
+        MemoryCache(max_entries=max_entries, ttl_seconds=ttl),
+        SQLiteCache(path, ttl_seconds=ttl),
+    )
+
+
+def build_run_cache():
+    """Full-run results, configured via RUN_CACHE_* env vars."""
+    return build_cache("RUN_CACHE", ".cache/run_cache.sqlite3")
+
+
+def build_evaluation_cache():
+    """Evaluator reviews, configured via EVAL_CACHE_* env vars."""
+    return build_cache("EVAL_CACHE", ".cache/eval_cache.sqlite3")
+
+
+def evaluation_cache_key(draft_post: str, intent: str, prompt_version: str, model: str) -> str:
+    """
+    Content address of one evaluation. The evaluator runs at
+    temperature 0, so the same draft + intent + prompt scores the same.
+    """
+    payload = {
+        "draft_post": draft_post,
+        "intent": intent,
+        "prompt_version": prompt_version,
+        "model": model,
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(final_state: Dict[str, Any]) -> bool:
+    """
+    Fail-soft runs are degraded results of a transient error;
+    caching them would pin the degradation for the whole TTL.
+    """
+    return not is_fail_soft(final_state)
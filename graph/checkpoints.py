@@ -0,0 +1,91 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from graph.guards import is_fail_soft
+
+
+# ---------- CONFIG ----------
+
+def checkpoint_path() -> Optional[str]:
+    """
+    CHECKPOINT_BACKEND: sqlite (default) | off
+    CHECKPOINT_PATH: SQLite file shared by every worker on the host.
+    """
+    if os.getenv("CHECKPOINT_BACKEND", "sqlite").lower() == "off":
+        return None
+    return os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite3")
+
+
+def thread_config(run_id: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run config whose checkpoints are keyed by run_id.
+    """
+    config = config or {}
+    return {
+        **config,
+        "configurable": {**config.get("configurable", {}), "thread_id": run_id},
+        "metadata": {**config.get("metadata", {}), "run_id": run_id},
+    }
+
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[Any]:
+    """
+    Yields an AsyncSqliteSaver for the app's lifetime, or None
+    when checkpointing is disabled.
+    """
+    path = checkpoint_path()
+    if path is None:
+        yield None
+        return
+
+    # Optional dependency: only needed when checkpointing is enabled
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        await saver.setup()
+        yield saver
+
+
+# ---------- RESUME ----------
+
+async def aresume_point(workflow, run_id: str):
+    """
+    Checkpoint a retry should continue from, or None if the run
+    is unknown or finished cleanly.
+
+    - Interrupted run (worker died mid-run): the latest checkpoint,
+      i.e. right after the last completed node.
+    - Fail-soft run: the latest checkpoint taken before any node
+      fail-softed, so the failed node is re-run and everything
+      before it is reused.
+    """
+    config = thread_config(run_id)
+    latest = await workflow.aget_state(config)
+    if not latest.values:
+        return None
+
+    if latest.next:
+        return latest
+
+    if not is_fail_soft(latest.values):
+        return None
+
+    async for snapshot in workflow.aget_state_history(config):
+        if snapshot.next and snapshot.values and not is_fail_soft(snapshot.values):
+            return snapshot
+    return None
+
+
+async def arelease_run(workflow, run_id: str):
+    """
+    Drops a cleanly finished run's checkpoints: only fail-soft or
+    interrupted runs need to stay resumable.
+    """
+    if workflow.checkpointer is not None:
+        await workflow.checkpointer.adelete_thread(run_id)
@@ -1,18 +1,201 @@
+import math
+from functools import lru_cache
 
+# Fallback per-call estimates, used only when no rendered messages are
+# available to measure (see charge_cost).
 ESTIMATED_TOKEN_COSTS = {
     "intent_classifier": 500,
     "generator": 1000,
     "evaluator": 1200,
     "optimizer": 2500,
     "summarizer": 700,
+    "reviser": 3000,
     }
 
-def charge_cost(state, agent_name: str):
-    cost = ESTIMATED_TOKEN_COSTS[agent_name]
+# Predicted completion size per agent (tokens)
+COMPLETION_ESTIMATES = {
+    "intent_classifier": 15,
+    "generator": 600,
+    "evaluator": 300,
+    "summarizer": 200,
+}
+
+# Structured-output agents also send a tool/JSON schema with the prompt
+STRUCTURED_SCHEMA_OVERHEAD = {
+    "intent_classifier": 80,
+    "evaluator": 220,
+    "summarizer": 60,
+    "reviser": 240,
+}
+
+# Chat format framing (OpenAI cookbook): per message + reply priming
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """
+    o200k_base (gpt-4.1 / gpt-4o family), loaded once. Returns None when
+    the BPE file is neither cached locally nor downloadable; counting then
+    falls back to a ~4 chars/token heuristic.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages) -> int:
+    """
+    Prompt tokens of the rendered messages (a plain string prompt
+    counts as a single user message).
+    """
+    if isinstance(messages, str):
+        messages = [messages]
+
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        content = getattr(message, "content", message)
+        total += TOKENS_PER_MESSAGE + count_text_tokens(content if isinstance(content, str) else str(content))
+    return total
+
+
+def predict_completion_tokens(state, agent_name: str) -> int:
+    """
+    The optimizer rewrites the current draft, so its output scales
+    with the draft; other agents produce roughly fixed-size outputs.
+    """
+    if agent_name == "optimizer":
+        return int(count_text_tokens(state.get("draft_post") or "") * 1.1) + 50
+    if agent_name == "reviser":
+        # Fused evaluate-and-rewrite: a review plus a rewritten draft
+        return COMPLETION_ESTIMATES["evaluator"] + predict_completion_tokens(state, "optimizer")
+    return COMPLETION_ESTIMATES[agent_name]
+
+
+def estimate_call_tokens(state, agent_name: str, messages) -> int:
+    return (
+        count_message_tokens(messages)
+        + STRUCTURED_SCHEMA_OVERHEAD.get(agent_name, 0)
+        + predict_completion_tokens(state, agent_name)
+    )
+
+
+def can_afford(state, agent_name: str, messages) -> bool:
+    """
+    Budget pre-check on the measured prompt + predicted completion.
+    """
+    return estimate_call_tokens(state, agent_name, messages) <= state["run_metrics"]["token_budget_remaining"]
+
+
+def charge_cost(state, agent_name: str, messages=None):
+    """
+    Reserves the call's tokens against the run budget: measured from the
+    rendered messages when given, else the fixed fallback estimate.
+    The reservation is replaced by the reported usage in record_usage.
+    """
+    if messages is None:
+        cost = ESTIMATED_TOKEN_COSTS[agent_name]
+    else:
+        cost = estimate_call_tokens(state, agent_name, messages)
 
     state["run_metrics"]["estimated_tokens_used"] += cost
     state["run_metrics"]["token_budget_remaining"] -= cost
     state["run_metrics"]["llm_calls"][agent_name] += 1
+    state["run_metrics"].setdefault("pending_estimates", {}).setdefault(agent_name, []).append(cost)
 
     if state["run_metrics"]["token_budget_remaining"] < 0:
         state["run_metrics"]["stop_reason"] = "token_budget_exceeded"
+
+
+def reconcile_budget(run_metrics: dict, agent_name: str, actual_tokens: int):
+    """
+    Swaps the oldest outstanding reservation for this agent with the
+    provider-reported usage, so the remaining budget tracks real spend.
+    """
+    pending = run_metrics.get("pending_estimates", {}).get(agent_name)
+    if not pending:
+        return
+
+    estimated = pending.pop(0)
+    run_metrics["token_budget_remaining"] += estimated - actual_tokens
+    run_metrics["estimation_error_tokens"] = (
+        run_metrics.get("estimation_error_tokens", 0) + actual_tokens - estimated
+    )
+
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICING = {
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# LangGraph node name -> agent name used in run_metrics
+NODE_AGENTS = {
+    "intent_classifier": "intent_classifier",
+    "generate_linkedin_post": "generator",
+    "classify_and_generate": "generator",
+    "evaluate_linkedin_post": "evaluator",
+    "optimize_linkedin_post": "optimizer",
+    "evaluate_and_rewrite": "reviser",
+    # Falls back to a plain optimizer call when it has no proposed revision
+    "apply_revision": "optimizer",
+    "summarize": "summarizer",
+}
+
+
+def model_pricing(model_name: str):
+    """
+    Resolves dated snapshots (e.g. gpt-4.1-mini-2025-04-14)
+    to their base model price; longest prefix wins.
+    """
+    for base in sorted(MODEL_PRICING, key=len, reverse=True):
+        if model_name and model_name.startswith(base):
+            return MODEL_PRICING[base]
+    return None
+
+
+def record_usage(run_metrics: dict, agent_name: str, model_name: str,
+                 prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+    """
+    Adds exact provider-reported usage for one LLM call
+    to the run totals and the per-agent breakdown.
+    """
+    pricing = model_pricing(model_name)
+    cost = 0.0
+    if pricing:
+        input_price, cached_price, output_price = pricing
+        cost = (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * output_price
+        ) / 1_000_000
+
+    run_metrics["prompt_tokens"] += prompt_tokens
+    run_metrics["completion_tokens"] += completion_tokens
+    run_metrics["total_tokens"] += prompt_tokens + completion_tokens
+    run_metrics["total_cost_usd"] = round(run_metrics["total_cost_usd"] + cost, 8)
+
+    agent = run_metrics.setdefault("usage_by_agent", {}).setdefault(agent_name, {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0,
+    })
+    agent["calls"] += 1
+    agent["prompt_tokens"] += prompt_tokens
+    agent["completion_tokens"] += completion_tokens
+    agent["cost_usd"] = round(agent["cost_usd"] + cost, 8)
+
+    reconcile_budget(run_metrics, agent_name, prompt_tokens + completion_tokens)
+
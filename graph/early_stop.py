@@ -0,0 +1,337 @@
+"""
+Learned early stop: a small logistic model estimating the probability
+that one more optimize/evaluate iteration beats the best score so far.
+should_continue stops when it falls below EARLY_STOP_THRESHOLD.
+
+Trained offline from logged run trajectories: batch result JSONL lines
+carry a "trajectory", and so does every run in the run store.
+
+    python -m graph.early_stop train results.jsonl --out models/early_stop.json
+    python -m graph.early_stop train .cache/runs.sqlite3
+    python -m graph.early_stop report results.jsonl
+
+Without a model file the predictor is off and should_continue uses its
+fixed rules only.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+FEATURES = [
+    "iteration",
+    "total_score",
+    "last_delta",
+    "best_gap",
+    "active_focus_factors",
+    "focus_min",
+    "focus_mean",
+]
+
+DEFAULT_MODEL_PATH = "models/early_stop.json"
+
+
+def model_path() -> str:
+    return os.getenv("EARLY_STOP_MODEL", DEFAULT_MODEL_PATH)
+
+
+def stop_threshold() -> float:
+    return float(os.getenv("EARLY_STOP_THRESHOLD", "0.15"))
+
+
+# ---------- TRAJECTORIES ----------
+
+def trajectory(final_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compact, loggable record of one run's score trajectory: one step
+    per evaluation, plus what an iteration cost in tokens.
+    """
+    steps = [
+        {
+            "iteration": entry["iteration"],
+            "scores": entry["scores"],
+            "total_score": entry["total_score"],
+            "active_focus_factors": focus["active_focus_factors"],
+        }
+        for entry, focus in zip(final_state.get("history", []), final_state.get("iteration_focus_history", []))
+    ]
+
+    run_metrics = final_state["run_metrics"]
+    usage = run_metrics.get("usage_by_agent", {})
+    # One more iteration = one revision + one review (or one fused call)
+    tokens_per_iteration = sum(
+        (usage[agent]["prompt_tokens"] + usage[agent]["completion_tokens"]) / usage[agent]["calls"]
+        for agent in ("optimizer", "evaluator", "reviser")
+        if usage.get(agent, {}).get("calls")
+    )
+
+    return {
+        "steps": steps,
+        "stop_reason": run_metrics.get("stop_reason"),
+        "total_tokens": run_metrics.get("total_tokens", 0),
+        "tokens_per_iteration": round(tokens_per_iteration),
+    }
+
+
+def step_features(steps: List[Dict[str, Any]], t: int) -> List[float]:
+    """Features of the run as it stands after evaluation `t`."""
+    step = steps[t]
+    total = step["total_score"]
+    best = max(s["total_score"] for s in steps[: t + 1])
+    focus = [step["scores"][f] for f in step["active_focus_factors"]] or [10]
+
+    return [
+        float(t),
+        total / 50,
+        (total - steps[t - 1]["total_score"]) / 10 if t else 0.0,
+        (best - total) / 10,
+        float(len(step["active_focus_factors"])),
+        min(focus) / 10,
+        sum(focus) / len(focus) / 10,
+    ]
+
+
+def improved(steps: List[Dict[str, Any]], t: int) -> int:
+    """Label: did evaluation t+1 beat the best score up to t?"""
+    best = max(s["total_score"] for s in steps[: t + 1])
+    return int(steps[t + 1]["total_score"] > best)
+
+
+def training_samples(trajectories: Iterable[Dict[str, Any]]) -> Tuple[List[List[float]], List[int]]:
+    X, y = [], []
+    for run in trajectories:
+        steps = run["steps"]
+        # Only decisions the run actually continued past have a label
+        for t in range(len(steps) - 1):
+            X.append(step_features(steps, t))
+            y.append(improved(steps, t))
+    return X, y
+
+
+# ---------- MODEL ----------
+
+class EarlyStopModel:
+    """
+    Logistic regression on standardized features, fitted with batch
+    gradient descent (a few hundred samples: no numeric library needed).
+    """
+
+    def __init__(self, weights: List[float], bias: float, means: List[float], scales: List[float]):
+        self.weights = weights
+        self.bias = bias
+        self.means = means
+        self.scales = scales
+
+    def predict(self, x: List[float]) -> float:
+        z = self.bias + sum(
+            w * (v - m) / s for w, v, m, s in zip(self.weights, x, self.means, self.scales)
+        )
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    @classmethod
+    def fit(cls, X: List[List[float]], y: List[int], epochs: int = 500,
+            learning_rate: float = 0.5, l2: float = 0.01) -> "EarlyStopModel":
+        n, d = len(X), len(X[0])
+        means = [sum(row[j] for row in X) / n for j in range(d)]
+        scales = [
+            math.sqrt(sum((row[j] - means[j]) ** 2 for row in X) / n) or 1.0
+            for j in range(d)
+        ]
+        Z = [[(row[j] - means[j]) / scales[j] for j in range(d)] for row in X]
+
+        model = cls([0.0] * d, 0.0, means, scales)
+        for _ in range(epochs):
+            grad_w, grad_b = [0.0] * d, 0.0
+            for z, label in zip(Z, y):
+                p = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, model.bias + sum(w * v for w, v in zip(model.weights, z))))))
+                error = p - label
+                grad_b += error
+                for j in range(d):
+                    grad_w[j] += error * z[j]
+            model.bias -= learning_rate * grad_b / n
+            model.weights = [
+                w - learning_rate * (g / n + l2 * w) for w, g in zip(model.weights, grad_w)
+            ]
+        return model
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "features": FEATURES,
+            "weights": self.weights,
+            "bias": self.bias,
+            "means": self.means,
+            "scales": self.scales,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EarlyStopModel":
+        if data["features"] != FEATURES:
+            raise ValueError("early-stop model was trained on a different feature set")
+        return cls(data["weights"], data["bias"], data["means"], data["scales"])
+
+
+@lru_cache(maxsize=4)
+def _load_file(path: str, stamp: Tuple[int, int, int]) -> Tuple[EarlyStopModel, str]:
+    # Keyed on the file's mtime/size/inode: a retrained model is picked up,
+    # and its digest is computed once, from the bytes that were loaded
+    with open(path, "rb") as f:
+        raw = f.read()
+    return EarlyStopModel.from_dict(json.loads(raw)), hashlib.sha256(raw).hexdigest()[:16]
+
+
+def active_model(path: Optional[str] = None) -> Tuple[Optional[EarlyStopModel], Optional[str]]:
+    """(model, digest of its file), or (None, None) without a model file."""
+    path = path or model_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None, None
+    return _load_file(path, (stat.st_mtime_ns, stat.st_size, stat.st_ino))
+
+
+def load_model(path: Optional[str] = None) -> Optional[EarlyStopModel]:
+    return active_model(path)[0]
+
+
+def predictor_version() -> str:
+    # Part of the run cache key: a retrained model or another threshold
+    # stops runs at different iterations, so final posts differ
+    _, digest = active_model()
+    return f"{digest}@{stop_threshold()}" if digest else "off"
+
+
+# ---------- RUNTIME ----------
+
+def should_stop_early(state: Dict[str, Any]) -> bool:
+    """
+    True when the model predicts the next iteration is unlikely to beat
+    the best score. The probability is kept in run_metrics.
+    """
+    model = load_model()
+    if model is None:
+        return False
+
+    steps = trajectory(state)["steps"]
+    if not steps:
+        return False
+
+    probability = model.predict(step_features(steps, len(steps) - 1))
+    state["run_metrics"]["improvement_probability"] = round(probability, 4)
+    return probability < stop_threshold()
+
+
+def simulate(model: EarlyStopModel, trajectories: List[Dict[str, Any]], threshold: float) -> Dict[str, Any]:
+    """
+    Replays logged runs with the predictor: each run stops at the first
+    continued decision scored below `threshold`. Reports tokens saved
+    vs best score lost against what the run actually returned.
+    """
+    tokens_total = tokens_saved = score_lost = stopped = worse = 0
+    for run in trajectories:
+        steps = run["steps"]
+        tokens_total += run.get("total_tokens", 0)
+        if not steps:
+            continue
+        for t in range(len(steps) - 1):
+            if model.predict(step_features(steps, t)) < threshold:
+                lost = max(s["total_score"] for s in steps) - max(s["total_score"] for s in steps[: t + 1])
+                stopped += 1
+                worse += int(lost > 0)
+                score_lost += lost
+                tokens_saved += (len(steps) - 1 - t) * run.get("tokens_per_iteration", 0)
+                break
+
+    runs = len(trajectories)
+    return {
+        "threshold": threshold,
+        "runs": runs,
+        "stopped_early": stopped,
+        "tokens_saved": tokens_saved,
+        "tokens_saved_pct": round(100 * tokens_saved / tokens_total, 2) if tokens_total else 0.0,
+        "mean_score_lost": round(score_lost / runs, 3) if runs else 0.0,
+        "runs_with_lower_score": worse,
+    }
+
+
+# ---------- CLI ----------
+
+def load_trajectories(paths: List[str]) -> List[Dict[str, Any]]:
+    runs = []
+    for path in paths:
+        if path.endswith((".sqlite3", ".db")):
+            from graph.run_store import RunStore
+            runs.extend(RunStore(path).iter_trajectories())
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("trajectory"):
+                    runs.append(record["trajectory"])
+    return runs
+
+
+def print_report(model: EarlyStopModel, runs: List[Dict[str, Any]], thresholds: List[float]):
+    print(f"{'threshold':>9} {'stopped':>8} {'tokens saved':>13} {'saved %':>8} {'mean lost':>10} {'worse':>6}")
+    for threshold in thresholds:
+        r = simulate(model, runs, threshold)
+        print(
+            f"{threshold:>9.2f} {r['stopped_early']:>8} {r['tokens_saved']:>13} "
+            f"{r['tokens_saved_pct']:>8} {r['mean_score_lost']:>10} {r['runs_with_lower_score']:>6}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train / evaluate the early-stop predictor.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="Fit on logged trajectories, report on a held-out split")
+    train.add_argument("inputs", nargs="+", help="JSONL files with a 'trajectory' per line, or run store databases")
+    train.add_argument("--out", default=model_path())
+    train.add_argument("--holdout", type=float, default=0.2, help="Share of runs held out for the report")
+    train.add_argument("--seed", type=int, default=0)
+
+    report = sub.add_parser("report", help="Tokens saved vs score lost for a trained model")
+    report.add_argument("inputs", nargs="+")
+    report.add_argument("--model", default=model_path())
+
+    for p in (train, report):
+        p.add_argument("--thresholds", default="0.05,0.1,0.15,0.2,0.3")
+
+    args = parser.parse_args(argv)
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    runs = load_trajectories(args.inputs)
+
+    if args.command == "train":
+        # Split by run, not by sample: decisions within a run are correlated
+        random.Random(args.seed).shuffle(runs)
+        cut = int(len(runs) * (1 - args.holdout))
+        train_runs, held_out = runs[:cut], runs[cut:]
+
+        X, y = training_samples(train_runs)
+        if not X or len(set(y)) < 2:
+            parser.error("need trajectories with both improving and non-improving iterations")
+
+        model = EarlyStopModel.fit(X, y)
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({**model.to_dict(), "trained_on_runs": len(train_runs), "samples": len(X)}, f, indent=2)
+
+        print(f"trained on {len(X)} decisions from {len(train_runs)} runs -> {args.out}")
+        print(f"held-out runs: {len(held_out)}")
+        print_report(model, held_out, thresholds)
+    else:
+        with open(args.model, encoding="utf-8") as f:
+            model = EarlyStopModel.from_dict(json.load(f))
+        print_report(model, runs, thresholds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from typing import Any, AsyncIterator, Dict, List
+
+from langgraph.config import get_stream_writer
+
+from graph.observability import durability, with_usage_collector
+
+
+async def astream_llm_text(llm, messages, node: str, iteration: int) -> str:
+    """
+    Streams a text completion, forwarding each token as a LangGraph
+    custom stream event while assembling the full text for state.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run: nothing to forward to
+        writer = None
+
+    parts = []
+    async for chunk in llm.astream(messages):
+        if not chunk.content:
+            continue
+        parts.append(chunk.content)
+        if writer is not None:
+            writer({"event": "token", "node": node, "iteration": iteration, "content": chunk.content})
+
+    return "".join(parts)
+
+
+def node_events(node: str, update: Dict[str, Any], state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Translates one LangGraph node update (a delta) into client-facing
+    progress events; `state` is the run state before the update.
+    Nodes without user-visible output emit nothing.
+    """
+    if update.get("__fail_soft__"):
+        return [{
+            "event": "fail_soft",
+            "node": node,
+            "stop_reason": update.get("stop_reason"),
+            "error": update.get("error"),
+        }]
+
+    intent_event = {
+        "event": "intent",
+        "intent": update.get("intent"),
+        "fast_path": state["run_metrics"].get("intent_fast_path"),
+    }
+    draft_event = {"event": "draft", "iteration": 0, "draft_post": update.get("draft_post")}
+
+    if node == "intent_classifier":
+        return [intent_event]
+
+    if node == "generate_linkedin_post":
+        return [draft_event]
+
+    # Fused mode: intent and draft come from the same node
+    if node == "classify_and_generate":
+        return [intent_event, draft_event]
+
+    if node in ("evaluate_linkedin_post", "evaluate_and_rewrite"):
+        history = update.get("history") or [{}]
+        return [{
+            "event": "evaluation",
+            "iteration": history[-1].get("iteration"),
+            "quality_score": update.get("quality_score"),
+            "scores": update.get("scores"),
+            "active_focus_factors": update.get("active_focus_factors"),
+            "review_feedback": update.get("review_feedback"),
+            "repeated_draft": update.get("repeated_draft"),
+        }]
+
+    if node in ("optimize_linkedin_post", "apply_revision") and "iteration_count" in update:
+        return [{
+            "event": "revision",
+            "iteration": update["iteration_count"],
+            "draft_post": update.get("draft_post"),
+        }]
+
+    if node == "rollback":
+        return [{
+            "event": "rollback",
+            "to_iteration": update.get("iteration_count"),
+            "quality_score": update.get("quality_score"),
+        }]
+
+    if node == "summarize":
+        return [{"event": "summary", "change_summary": update.get("change_summary")}]
+
+    return []
+
+
+async def astream_workflow_events(workflow, state, config, include_tokens: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs the workflow via `astream`, yielding progress events as each
+    node finishes (plus generator/optimizer tokens as they arrive).
+    The last event is {"event": "final_state", "state": ...}.
+    """
+    final_state = state
+    stream = workflow.astream(
+        state,
+        config=with_usage_collector(state, config),
+        stream_mode=["updates", "values", "custom"],
+        **durability(workflow),
+    )
+
+    async for mode, chunk in stream:
+        if mode == "values":
+            final_state = chunk
+            continue
+
+        if mode == "custom":
+            if include_tokens or chunk.get("event") != "token":
+                yield chunk
+            continue
+
+        for node, update in chunk.items():
+            for event in node_events(node, update or {}, final_state):
+                yield event
+
+    yield {"event": "final_state", "state": final_state}
@@ -1,28 +1,61 @@
-import socket
-from openai import OpenAIError
-
-LLM_FAILURES = (
-    OpenAIError,
-    TimeoutError,
-    socket.timeout,
-)
-
-
-def safe_llm_call(fn, state: dict, agent_name: str) -> dict:
-    """
-    Executes an LLM-backed function safely.
-
-    On timeout / API failure:
-    - Signals fail-soft termination
-    - Preserves best iteration
-    - Prevents further optimization
-    """
-    try:
-        return fn(state)
-    except LLM_FAILURES as e:
-        state["run_metrics"]["stop_reason"] = f"{agent_name}_fail_soft"
-        return {
-            "__fail_soft__": True,
-            "stop_reason": f"{agent_name}_timeout",
-            "error": str(e),
-        }
+import socket
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def llm_failures() -> tuple:
+    """
+    Exceptions treated as fail-soft. openai is imported on first use
+    (the first except-clause evaluation), not at module import.
+    """
+    from openai import OpenAIError
+
+    return (
+        OpenAIError,
+        TimeoutError,
+        socket.timeout,
+    )
+
+
+def safe_llm_call(fn, state: dict, agent_name: str) -> dict:
+    """
+    Executes an LLM-backed function safely.
+
+    On timeout / API failure:
+    - Signals fail-soft termination
+    - Preserves best iteration
+    - Prevents further optimization
+    """
+    try:
+        return fn(state)
+    except llm_failures() as e:
+        state["run_metrics"]["stop_reason"] = f"{agent_name}_fail_soft"
+        return {
+            "__fail_soft__": True,
+            "stop_reason": f"{agent_name}_timeout",
+            "error": str(e),
+        }
+
+
+async def asafe_llm_call(fn, state: dict, agent_name: str) -> dict:
+    """
+    Async counterpart of safe_llm_call for coroutine-based nodes.
+    Same fail-soft semantics.
+    """
+    try:
+        return await fn(state)
+    except llm_failures() as e:
+        state["run_metrics"]["stop_reason"] = f"{agent_name}_fail_soft"
+        return {
+            "__fail_soft__": True,
+            "stop_reason": f"{agent_name}_timeout",
+            "error": str(e),
+        }
+
+
+def is_fail_soft(final_state: dict) -> bool:
+    """
+    True if any node terminated the run through the fail-soft path.
+    """
+    stop_reason = final_state["run_metrics"].get("stop_reason") or ""
+    return bool(final_state.get("__fail_soft__")) or stop_reason.endswith("_fail_soft")
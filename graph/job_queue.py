@@ -0,0 +1,538 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from fnmatch import fnmatch
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " job_id TEXT PRIMARY KEY,"
+    " idempotency_key TEXT UNIQUE,"
+    " status TEXT NOT NULL,"
+    " request TEXT NOT NULL,"
+    " webhook_url TEXT,"
+    # Fixed at enqueue: a retried job resumes the same checkpointed run
+    " run_id TEXT NOT NULL,"
+    " attempts INTEGER NOT NULL DEFAULT 0,"
+    " created_at REAL NOT NULL,"
+    # A failed attempt is retried no earlier than this (backoff)
+    " available_at REAL,"
+    " started_at REAL,"
+    " finished_at REAL,"
+    " lease_until REAL,"
+    " result TEXT,"
+    " error TEXT,"
+    # Webhook outbox: 'pending' until delivered or out of attempts
+    " webhook_status TEXT,"
+    " webhook_attempts INTEGER NOT NULL DEFAULT 0,"
+    " webhook_next_at REAL)",
+    "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS jobs_webhooks ON jobs (webhook_status, webhook_next_at)",
+]
+
+JOB_COLUMNS = [
+    "job_id", "idempotency_key", "status", "request", "webhook_url", "run_id", "attempts",
+    "created_at", "available_at", "started_at", "finished_at", "lease_until", "result", "error",
+    "webhook_status", "webhook_attempts", "webhook_next_at",
+]
+
+# queued -> running -> succeeded | failed; running -> queued on retry
+# or when a worker's lease expires (crash, shutdown)
+FINISHED = ("succeeded", "failed")
+
+# Set in the same statement that finishes a job: a crash before the
+# callback is sent leaves it pending, and the outbox loop sends it later
+WEBHOOK_PENDING = "webhook_status = CASE WHEN webhook_url IS NULL THEN NULL ELSE 'pending' END"
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _job(row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    job = dict(zip(JOB_COLUMNS, row))
+    for key in ("request", "result"):
+        if job[key] is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+
+class JobQueue:
+    """
+    Durable SQLite queue of optimization requests, shared by every
+    worker process on the host.
+
+    A worker claims a job with a lease it keeps renewing while the run
+    is in progress. A job whose lease expires (worker crashed or was
+    stopped) is claimed again, up to max_attempts; a job whose attempt
+    raised is retried after retry_backoff_seconds * 2^(attempts - 1).
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300, max_attempts: int = 3, max_pending: int = 1000,
+                 retry_backoff_seconds: float = 30, webhook_max_attempts: int = 5, webhook_backoff_seconds: float = 5):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.webhook_max_attempts = webhook_max_attempts
+        self.webhook_backoff_seconds = webhook_backoff_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: transactions are opened explicitly (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _fetch(self, sql: str, params: tuple = ()) -> List[tuple]:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _update(self, sql: str, params: tuple = ()) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).rowcount
+        finally:
+            conn.close()
+
+    # ---------- PRODUCER ----------
+
+    def enqueue(self, request: Dict[str, Any], webhook_url: Optional[str] = None,
+                idempotency_key: Optional[str] = None) -> tuple:
+        """
+        Returns (job, created). A retried submission with the same
+        idempotency key gets the original job back instead of a new run.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if idempotency_key is not None:
+                existing = conn.execute(
+                    f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return _job(existing), False
+
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if pending >= self.max_pending:
+                conn.execute("ROLLBACK")
+                raise QueueFull(f"{pending} jobs pending")
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (job_id, idempotency_key, status, request, webhook_url, run_id, created_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, idempotency_key, json.dumps(request, ensure_ascii=False), webhook_url, uuid.uuid4().hex, now),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,))
+        return _job(rows[0]) if rows else None
+
+    # ---------- WORKERS ----------
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Leases the oldest runnable job: queued, or running with an
+        expired lease. A job out of attempts is marked failed and
+        returned as such (its webhook still has to fire).
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+                " WHERE (status = 'queued' AND (available_at IS NULL OR available_at <= ?))"
+                " OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            job = _job(row)
+            if job["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_until = NULL,"
+                    f" error = COALESCE(error, 'worker lease expired'), {WEBHOOK_PENDING} WHERE job_id = ?",
+                    (now, job["job_id"]),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                    " started_at = COALESCE(started_at, ?), lease_until = ? WHERE job_id = ?",
+                    (now, now + self.lease_seconds, job["job_id"]),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(job["job_id"])
+
+    def heartbeat(self, job_id: str):
+        self._update(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id),
+        )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self._update(
+            "UPDATE jobs SET status = 'succeeded', finished_at = ?, lease_until = NULL, result = ?, error = NULL,"
+            f" {WEBHOOK_PENDING} WHERE job_id = ?",
+            (time.time(), json.dumps(result, ensure_ascii=False, default=str), job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> str:
+        """
+        Requeues the job with backoff while it has attempts left,
+        otherwise marks it failed. Returns the new status.
+        """
+        job = self.get(job_id)
+        now = time.time()
+        if job["attempts"] < self.max_attempts:
+            self._update(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, available_at = ?, error = ? WHERE job_id = ?",
+                (now + self.retry_backoff_seconds * 2 ** (job["attempts"] - 1), error, job_id),
+            )
+            return "queued"
+        self._update(
+            f"UPDATE jobs SET status = 'failed', finished_at = ?, lease_until = NULL, error = ?, {WEBHOOK_PENDING}"
+            " WHERE job_id = ?",
+            (now, error, job_id),
+        )
+        return "failed"
+
+    def release(self, job_id: str):
+        """Hands a job back without spending an attempt (worker shutdown)."""
+        self._update(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), lease_until = NULL"
+            " WHERE job_id = ? AND status = 'running'",
+            (job_id,),
+        )
+
+    # ---------- WEBHOOK OUTBOX ----------
+
+    def claim_webhooks(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Due pending callbacks, leased so that another process does not
+        send them concurrently. A lease that runs out (sender crashed)
+        makes the callback due again: delivery is at-least-once.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE webhook_status = 'pending'"
+                " AND (webhook_next_at IS NULL OR webhook_next_at <= ?) ORDER BY finished_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET webhook_next_at = ? WHERE job_id = ?",
+                [(now + lease_seconds, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return [_job(row) for row in rows]
+
+    def record_webhook(self, job_id: str, done: bool, outcome: str):
+        """
+        Final outcome, or a retry with backoff until webhook_max_attempts.
+        """
+        job = self.get(job_id)
+        attempts = job["webhook_attempts"] + 1
+        if done or attempts >= self.webhook_max_attempts:
+            self._update(
+                "UPDATE jobs SET webhook_status = ?, webhook_attempts = ?, webhook_next_at = NULL WHERE job_id = ?",
+                (outcome, attempts, job_id),
+            )
+        else:
+            self._update(
+                "UPDATE jobs SET webhook_attempts = ?, webhook_next_at = ? WHERE job_id = ?",
+                (attempts, time.time() + self.webhook_backoff_seconds * 2 ** (attempts - 1), job_id),
+            )
+
+    # ---------- MAINTENANCE ----------
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Deletes finished jobs older than the retention window."""
+        return self._update(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?"
+            " AND webhook_status IS NOT 'pending'",
+            (time.time() - older_than_seconds,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._fetch("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {"backend": "sqlite", "path": self.path, **{s: counts.get(s, 0) for s in ("queued", "running", *FINISHED)}}
+
+
+# ---------- WEBHOOKS ----------
+
+def webhook_allowed_hosts() -> List[str]:
+    # JOB_WEBHOOK_ALLOWED_HOSTS=hooks.example.com,*.example.org
+    return [h.strip().lower() for h in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+
+def _allowlisted(host: str) -> bool:
+    return any(fnmatch(host, pattern) for pattern in webhook_allowed_hosts())
+
+
+def webhook_url_error(url: str) -> Optional[str]:
+    """
+    Why `url` may not be called back (None when it may). POST /jobs is
+    public, so callbacks must not reach internal services: https only
+    (http with JOB_WEBHOOK_ALLOW_HTTP), and either an allowlisted host
+    or one that is not a loopback / private / link-local address.
+    """
+    parts = urlsplit(url)
+    allow_http = os.getenv("JOB_WEBHOOK_ALLOW_HTTP", "false").lower() in ("1", "true", "on")
+    if parts.scheme != "https" and not (allow_http and parts.scheme == "http"):
+        return "webhook_url must use https"
+    if parts.username or parts.password:
+        return "webhook_url must not carry credentials"
+
+    host = (parts.hostname or "").lower()
+    if not host:
+        return "webhook_url has no host"
+    if webhook_allowed_hosts():
+        return None if _allowlisted(host) else f"host {host} is not in JOB_WEBHOOK_ALLOWED_HOSTS"
+    if host == "localhost" or host.endswith((".localhost", ".local", ".internal")):
+        return f"host {host} is not public"
+    try:
+        if not ipaddress.ip_address(host).is_global:
+            return f"address {host} is not public"
+    except ValueError:
+        pass
+    return None
+
+
+async def _resolved_address_error(url: str) -> Optional[str]:
+    # A public name can still resolve to an internal address
+    parts = urlsplit(url)
+    host = parts.hostname.lower()
+    if _allowlisted(host):
+        return None
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+    )
+    for *_, sockaddr in infos:
+        if not ipaddress.ip_address(sockaddr[0]).is_global:
+            return f"{host} resolves to non-public {sockaddr[0]}"
+    return None
+
+
+def webhook_payload(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+
+async def deliver_webhook(job: Dict[str, Any], timeout: float = 10.0) -> Tuple[bool, str]:
+    """
+    One POST of the finished job to its webhook_url. Returns (done,
+    outcome); done is False for 5xx / network errors, which the
+    outbox retries. With JOB_WEBHOOK_SECRET set, the body is signed:
+    X-Signature: sha256=<hex HMAC of the body>.
+    """
+    import httpx
+
+    url = job["webhook_url"]
+    try:
+        blocked = webhook_url_error(url) or await _resolved_address_error(url)
+    except OSError as e:
+        return False, f"failed ({type(e).__name__})"
+    if blocked:
+        return True, f"blocked ({blocked})"
+
+    body = json.dumps(webhook_payload(job), ensure_ascii=False, default=str).encode("utf-8")
+    headers = {"Content-Type": "application/json", "X-Job-Id": job["job_id"]}
+    secret = os.getenv("JOB_WEBHOOK_SECRET")
+    if secret:
+        headers["X-Signature"] = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+    try:
+        # Redirects are not followed: they could point anywhere
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
+            response = await client.post(url, content=body, headers=headers)
+    except httpx.HTTPError as e:
+        return False, f"failed ({type(e).__name__})"
+    if response.status_code >= 500:
+        return False, f"failed ({response.status_code})"
+    return True, f"delivered ({response.status_code})" if response.is_success else f"rejected ({response.status_code})"
+
+
+# ---------- WORKER POOL ----------
+
+class JobWorkerPool:
+    """
+    asyncio workers in the serving process, pulling from the shared
+    queue. Several uvicorn processes may each run a pool: claims are
+    atomic, so a job runs in one worker at a time.
+
+    Webhooks are sent by a separate outbox loop, so a slow or dead
+    endpoint never keeps a worker off the queue.
+    """
+
+    def __init__(self, queue: JobQueue, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 workers: int = 2, poll_interval: float = 1.0,
+                 on_finished: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 webhook_batch: int = 16, webhook_timeout: float = 10.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.on_finished = on_finished
+        self.webhook_batch = webhook_batch
+        self.webhook_timeout = webhook_timeout
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._webhook_wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._webhook_wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._send_webhooks(), name="job-webhooks"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wakes idle workers right away (a job was just enqueued here)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self, wakeup: asyncio.Event):
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+    async def _work(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except sqlite3.Error as e:
+                logger.warning("job queue: claim failed: %s", e)
+                job = None
+            if job is None:
+                await self._idle(self._wakeup)
+                continue
+            if job["status"] == "running":
+                job = await self._run(job)
+            if job is not None and job["status"] in FINISHED:
+                await self._finished(job)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            await asyncio.to_thread(self.queue.heartbeat, job_id)
+
+    async def _run(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        heartbeat = asyncio.create_task(self._heartbeat(job["job_id"]))
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            await asyncio.shield(asyncio.to_thread(self.queue.release, job["job_id"]))
+            raise
+        except Exception as e:
+            logger.exception("job %s: attempt %d failed", job["job_id"], job["attempts"])
+            await asyncio.to_thread(self.queue.fail, job["job_id"], f"{type(e).__name__}: {e}")
+        else:
+            await asyncio.to_thread(self.queue.complete, job["job_id"], result)
+        finally:
+            heartbeat.cancel()
+        return await asyncio.to_thread(self.queue.get, job["job_id"])
+
+    async def _finished(self, job: Dict[str, Any]):
+        if self.on_finished is not None:
+            self.on_finished(job)
+        if job["webhook_url"]:
+            self._webhook_wakeup.set()
+
+    async def _send_webhooks(self):
+        """
+        Outbox loop: sends every pending callback, including those left
+        behind by a process that crashed before sending them.
+        """
+        while True:
+            try:
+                jobs = await asyncio.to_thread(
+                    self.queue.claim_webhooks, self.webhook_batch, 2 * self.webhook_timeout
+                )
+            except sqlite3.Error as e:
+                logger.warning("job queue: webhook claim failed: %s", e)
+                jobs = []
+            if not jobs:
+                await self._idle(self._webhook_wakeup)
+                continue
+
+            outcomes = await asyncio.gather(*(deliver_webhook(job, self.webhook_timeout) for job in jobs))
+            for job, (done, outcome) in zip(jobs, outcomes):
+                await asyncio.to_thread(self.queue.record_webhook, job["job_id"], done, outcome)
+
+
+def build_job_queue() -> Optional[JobQueue]:
+    """
+    JOB_QUEUE_BACKEND: sqlite (default) | off
+    JOB_QUEUE_PATH (default .cache/jobs.sqlite3), JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF_SECONDS, JOB_QUEUE_MAX
+    (pending jobs before 429), JOB_WEBHOOK_MAX_ATTEMPTS.
+    """
+    if os.getenv("JOB_QUEUE_BACKEND", "sqlite").lower() == "off":
+        return None
+    return JobQueue(
+        os.getenv("JOB_QUEUE_PATH", ".cache/jobs.sqlite3"),
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "300")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        max_pending=int(os.getenv("JOB_QUEUE_MAX", "1000")),
+        retry_backoff_seconds=float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30")),
+        webhook_max_attempts=int(os.getenv("JOB_WEBHOOK_MAX_ATTEMPTS", "5")),
+    )
@@ -0,0 +1,151 @@
+import os
+from typing import Any, Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# Everything below is in-memory arithmetic under a lock: recording
+# costs microseconds per node, rendering happens only on scrape.
+
+NODE_SECONDS = Histogram(
+    "linkedin_optimizer_node_seconds",
+    "Wall time of one graph node execution",
+    ["node"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+
+RUN_ITERATIONS = Histogram(
+    "linkedin_optimizer_run_iterations",
+    "Optimizer iterations per finished run",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 7, 8),
+)
+
+RUN_TOKENS = Histogram(
+    "linkedin_optimizer_run_tokens",
+    "Provider-reported tokens per finished run",
+    buckets=(1000, 2500, 5000, 10000, 20000, 40000, 80000),
+)
+
+RUN_COST_USD = Histogram(
+    "linkedin_optimizer_run_cost_usd",
+    "USD cost per finished run",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5),
+)
+
+RUNS = Counter(
+    "linkedin_optimizer_runs",
+    "Finished runs by stop reason",
+    ["stop_reason"],
+)
+
+JOBS = Counter(
+    "linkedin_optimizer_jobs",
+    "Finished /jobs jobs by status",
+    ["status"],
+)
+
+ROLLBACKS = Counter(
+    "linkedin_optimizer_rollbacks",
+    "Rollbacks to the best iteration",
+)
+
+EVALUATIONS_REUSED = Counter(
+    "linkedin_optimizer_evaluations_reused",
+    "Evaluator calls skipped by reusing a known review",
+)
+
+RUNS_IN_FLIGHT = Gauge(
+    "linkedin_optimizer_runs_in_flight",
+    "Workflow runs currently executing",
+    multiprocess_mode="livesum",
+)
+
+
+# ---------- RECORDING ----------
+
+def observe_node(node: str, seconds: float):
+    NODE_SECONDS.labels(node=node).observe(seconds)
+
+
+def record_run(run_metrics: Dict[str, Any]):
+    """
+    Per-run aggregates, recorded once when a run finishes.
+    """
+    RUNS.labels(stop_reason=run_metrics.get("stop_reason") or "none").inc()
+    RUN_ITERATIONS.observe(run_metrics.get("iterations", 0))
+    RUN_TOKENS.observe(run_metrics.get("total_tokens", 0))
+    RUN_COST_USD.observe(run_metrics.get("total_cost_usd", 0))
+
+    if run_metrics.get("rollbacks"):
+        ROLLBACKS.inc(run_metrics["rollbacks"])
+    if run_metrics.get("evaluation_cache_hits"):
+        EVALUATIONS_REUSED.inc(run_metrics["evaluation_cache_hits"])
+
+
+def record_job(job: Dict[str, Any]):
+    JOBS.labels(status=job["status"]).inc()
+
+
+# ---------- CACHES ----------
+
+class CacheStatsCollector:
+    """
+    Exposes hit/miss counters the caches already keep,
+    read at scrape time instead of on every lookup.
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, Any] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("linkedin_optimizer_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("linkedin_optimizer_cache_misses", "Cache misses", labels=["cache"])
+        hit_rate = GaugeMetricFamily("linkedin_optimizer_cache_hit_rate", "Cache hit rate since start", labels=["cache"])
+
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            if "hits" not in stats:
+                continue
+            lookups = stats["hits"] + stats["misses"]
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            hit_rate.add_metric([name], stats["hits"] / lookups if lookups else 0.0)
+
+        yield hits
+        yield misses
+        yield hit_rate
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
+
+
+def register_cache(name: str, cache):
+    cache_stats.caches[name] = cache
+
+
+# ---------- EXPOSITION ----------
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """
+    Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set (several
+    uvicorn workers), values are aggregated across worker processes;
+    cache stats are then per-worker and left out.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
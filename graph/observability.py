@@ -1,30 +1,125 @@
-
-from langsmith import traceable,Client
+import threading
+import time
+from langsmith import traceable
+from langchain_core.callbacks import BaseCallbackHandler
+from graph.costs import NODE_AGENTS, record_usage
+from graph.metrics import observe_node
 
 @traceable(name='agent_run_summary')
 def log_run_summary(metrics : dict):
   return metrics
 
+class UsageCollector(BaseCallbackHandler):
+  """
+  Per-run callback that reads `usage_metadata` from every LLM response
+  and accumulates exact tokens / USD cost into that run's run_metrics,
+  plus wall time per graph node (`node_seconds`).
+  One instance per run, so concurrent runs never share counters.
+  """
+
+  # Bookkeeping only: no need to hop to an executor in async runs
+  run_inline = True
+
+  def __init__(self, run_metrics: dict):
+    self.run_metrics = run_metrics
+    self._agents = {}
+    self._chains = {}
+    self._lock = threading.Lock()
+
+  def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+    node = (metadata or {}).get("langgraph_node")
+    if not node:
+      return
+
+    # A resumed run works on run_metrics restored from its checkpoint,
+    # not the dict this collector was created with: follow the live one
+    if isinstance(inputs, dict) and "run_metrics" in inputs:
+      self.run_metrics = inputs["run_metrics"]
+
+    # Only the node's outermost run is timed, not the runnables inside it
+    nested = parent_run_id in self._chains
+    self._chains[run_id] = (node, None if nested else time.perf_counter())
+
+  def on_chain_end(self, outputs, *, run_id, **kwargs):
+    node, started = self._chains.pop(run_id, (None, None))
+    if started is None:
+      return
+
+    elapsed = time.perf_counter() - started
+    observe_node(node, elapsed)
+    with self._lock:
+      node_seconds = self.run_metrics.setdefault("node_seconds", {})
+      node_seconds[node] = round(node_seconds.get(node, 0.0) + elapsed, 6)
+
+  def on_chain_error(self, error, *, run_id, **kwargs):
+    self._chains.pop(run_id, None)
+
+  def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+    metadata = metadata or {}
+    node = metadata.get("langgraph_node")
+    # An explicit "agent" tag wins over the node (calls charged to
+    # another agent than the node they run in)
+    self._agents[run_id] = metadata.get("agent") or NODE_AGENTS.get(node, node or "unknown")
+
+  def on_llm_end(self, response, *, run_id, **kwargs):
+    agent = self._agents.pop(run_id, "unknown")
+    model_name = (response.llm_output or {}).get("model_name", "")
+
+    for generations in response.generations:
+      for generation in generations:
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None)
+        if not usage:
+          continue
+
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        with self._lock:
+          record_usage(
+            self.run_metrics,
+            agent,
+            message.response_metadata.get("model_name") or model_name,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            cached,
+          )
+
+  def on_llm_error(self, error, *, run_id, **kwargs):
+    self._agents.pop(run_id, None)
+
+def with_usage_collector(state, config):
+  """
+  Returns a copy of config with a fresh UsageCollector bound
+  to this run's metrics appended to its callbacks.
+  """
+  collector = UsageCollector(state["run_metrics"])
+  callbacks = list(config.get("callbacks") or []) + [collector]
+  return {**config, "callbacks": callbacks}
+
+def durability(workflow):
+  """
+  Checkpointed workflows persist each checkpoint before the next node
+  runs (and mutates run_metrics in place). Un-checkpointed ones must not
+  pass durability at all.
+  """
+  return {"durability": "sync"} if workflow.checkpointer is not None else {}
+
 @traceable(name='agentic-linkedin-post-run')
 def run_workflow(workflow,state,config):
-  final_state =  workflow.invoke(state,config=config)
-  client = Client()
-  runs = list(client.list_runs(
-    project_name="agentic-linkedin-post-optimizer",
-    run_name="agentic-linkedin-post-run",
-    limit=1,
-    ))
-
-  if runs:
-        run = runs[0]
-        actual_costs = {
-            "prompt_tokens": getattr(run, 'prompt_tokens', 0),
-            "completion_tokens": getattr(run, 'completion_tokens', 0),
-            "total_tokens": getattr(run, 'total_tokens', 0),
-            "total_cost_usd": getattr(run, 'total_cost', 0.0)
-        }
-        
-        for key, val in actual_costs.items():
-            final_state['run_metrics'][key] = val
-    
-  return final_state
+  return workflow.invoke(state,config=with_usage_collector(state,config))
+
+@traceable(name='agentic-linkedin-post-run')
+async def arun_workflow(workflow,state,config):
+  """
+  Async run: every LLM node awaits its client, so the event loop
+  can hold many in-flight runs without a thread per request.
+  """
+  return await workflow.ainvoke(state,config=with_usage_collector(state,config),**durability(workflow))
+
+@traceable(name='agentic-linkedin-post-resume')
+async def aresume_workflow(workflow,snapshot,config):
+  """
+  Continues a checkpointed run from `snapshot` (see graph.checkpoints.aresume_point):
+  only the nodes after it are executed.
+  """
+  config = {**config, "configurable": snapshot.config["configurable"]}
+  return await workflow.ainvoke(None,config=with_usage_collector(snapshot.values,config),**durability(workflow))
@@ -0,0 +1,345 @@
+"""
+Reference corpus index: exemplar posts with precomputed embeddings in a
+memory-mapped float32 matrix, searched by cosine similarity.
+
+    python -m graph.reference_index build exemplars.jsonl --out references/
+    python -m graph.reference_index search "Cut p95 latency with a cache" --intent PROOF_OF_WORK
+
+Corpus lines: {"text": ..., "intent": ..., "communication_style": ...}.
+An exemplar without a style matches every style.
+
+Each build writes a directory named after its version, holding
+embeddings.npy (N x dim float32, rows L2-normalized: cosine is a dot
+product) and meta.json (texts, filters, token counts), then swaps the
+CURRENT file in the index directory to point at it. The matrix is opened with numpy.load(mmap_mode="r") when
+numpy is installed, otherwise mmap'ed and read through a float32
+memoryview; either way only the rows a query scores are paged in.
+
+REFERENCE_INDEX_DIR: index directory (default references)
+REFERENCE_EMBEDDER: hashing (default: local feature hashing, no API call)
+                    | openai:<model>, e.g. openai:text-embedding-3-small
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import operator
+import os
+import re
+import shutil
+import struct
+import sys
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+DEFAULT_INDEX_DIR = "references"
+DEFAULT_DIM = 256
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our "
+    "that the this to was we were with".split()
+)
+
+
+def reference_index_dir() -> str:
+    return os.getenv("REFERENCE_INDEX_DIR", DEFAULT_INDEX_DIR)
+
+
+def embedder_spec() -> str:
+    return os.getenv("REFERENCE_EMBEDDER", "hashing")
+
+
+# ---------- EMBEDDINGS ----------
+
+def _features(text: str) -> List[str]:
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hashing_embed(texts: List[str], dim: int) -> List[List[float]]:
+    """
+    Signed feature hashing of words and word bigrams, sublinear counts.
+    Deterministic and local: topics embed in microseconds.
+    """
+    vectors = []
+    for text in texts:
+        vector = [0.0] * dim
+        for feature, count in Counter(_features(text)).items():
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % dim] += (1.0 if h >> 63 else -1.0) * (1.0 + math.log(count))
+        vectors.append(vector)
+    return vectors
+
+
+def get_embedder(spec: str, dim: int) -> Callable[[List[str]], List[List[float]]]:
+    if spec == "hashing":
+        return lambda texts: hashing_embed(texts, dim)
+    if spec.startswith("openai:"):
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=spec.split(":", 1)[1], dimensions=dim).embed_documents
+    raise ValueError(f"Unknown REFERENCE_EMBEDDER: {spec!r}")
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+# ---------- MATRIX FILE ----------
+
+def write_npy(path: str, rows: List[List[float]], dim: int):
+    """float32 matrix in .npy format (v1.0), written without numpy."""
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({len(rows)}, {dim}), }}"
+    # 10-byte preamble + header, padded so the data starts 64-byte aligned
+    header += " " * (-(len(header) + 11) % 64) + "\n"
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+        for row in rows:
+            f.write(struct.pack(f"<{dim}f", *row))
+
+
+def open_matrix(path: str):
+    """
+    Read-only mapping of the matrix: a numpy memmap, or a flat float32
+    memoryview over the mmap'ed file when numpy is not installed.
+    """
+    try:
+        import numpy
+        return numpy.load(path, mmap_mode="r")
+    except ImportError:
+        pass
+
+    if sys.byteorder != "little":
+        raise RuntimeError("the pure-Python index reader needs a little-endian host (or numpy)")
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_length = struct.unpack_from("<H", mapped, 8)[0]
+    return memoryview(mapped)[10 + header_length:].cast("f")
+
+
+# ---------- INDEX ----------
+
+class ReferenceIndex:
+    """
+    Exemplars plus their embedding matrix. Candidates are narrowed by
+    intent and style first, so a query only scores its slice.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], matrix, dim: int, embedder: str, version: str):
+        self.entries = entries
+        self.matrix = matrix
+        self.dim = dim
+        self.embedder = embedder
+        self.version = version
+        self._embed = None
+        self._slices: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+
+    @classmethod
+    def load(cls, directory: str) -> "ReferenceIndex":
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = open_matrix(os.path.join(directory, EMBEDDINGS_FILE))
+        return cls(meta["entries"], matrix, meta["dim"], meta["embedder"], meta["version"])
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict[str, Any]], dim: int = DEFAULT_DIM,
+                     embedder: str = "hashing", version: str = "inline") -> "ReferenceIndex":
+        """Small in-memory index (no files), e.g. built-in fallback snippets."""
+        rows = [normalize(v) for v in get_embedder(embedder, dim)([e["text"] for e in entries])]
+        matrix = memoryview(array("f", [v for row in rows for v in row]))
+        return cls(entries, matrix, dim, embedder, version)
+
+    def _candidates(self, intent: Optional[str], style: Optional[str]) -> List[int]:
+        key = (intent, style)
+        if key not in self._slices:
+            self._slices[key] = [
+                i for i, entry in enumerate(self.entries)
+                if (intent is None or entry.get("intent") == intent)
+                and (style is None or entry.get("communication_style") in (None, style))
+            ]
+        return self._slices[key]
+
+    def _scores(self, rows: List[int], query: List[float]) -> List[float]:
+        if isinstance(self.matrix, memoryview):
+            dim, matrix = self.dim, self.matrix
+            nonzero = [(j, v) for j, v in enumerate(query) if v]
+            if len(nonzero) < dim // 4:
+                # Hashed topics touch a few dozen dimensions: read only those
+                return [sum(v * matrix[i * dim + j] for j, v in nonzero) for i in rows]
+            return [sum(map(operator.mul, query, matrix[i * dim:(i + 1) * dim])) for i in rows]
+        import numpy
+        return (self.matrix[rows] @ numpy.asarray(query, dtype=numpy.float32)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self._embed is None:
+            self._embed = get_embedder(self.embedder, self.dim)
+        return normalize(self._embed([text])[0])
+
+    def search(self, text: str, intent: Optional[str] = None, style: Optional[str] = None,
+               k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Top-k (cosine, entry) for `text` among exemplars of the intent
+        and style; relaxes the style filter, then the intent filter,
+        when the slice is empty.
+        """
+        rows = (
+            self._candidates(intent, style)
+            or self._candidates(intent, None)
+            or self._candidates(None, None)
+        )
+        if not rows:
+            return []
+        scores = self._scores(rows, self.embed_query(text))
+        ranked = sorted(zip(scores, rows), reverse=True)[:k]
+        return [(round(score, 4), self.entries[row]) for score, row in ranked]
+
+
+def current_index_dir(directory: str) -> Optional[str]:
+    """The version directory CURRENT points at (or a flat pre-versioning layout)."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        pass
+    return directory if os.path.exists(os.path.join(directory, META_FILE)) else None
+
+
+@lru_cache(maxsize=4)
+def _load_version(version_dir: str, mtime_ns: int) -> ReferenceIndex:
+    # Keyed on the version directory and its mtime: a rebuild is picked up
+    # on the next lookup, while an unchanged index stays mapped once
+    return ReferenceIndex.load(version_dir)
+
+
+def load_index(directory: Optional[str] = None) -> Optional[ReferenceIndex]:
+    version_dir = current_index_dir(directory or reference_index_dir())
+    if version_dir is None:
+        return None
+    return _load_version(version_dir, os.stat(os.path.join(version_dir, META_FILE)).st_mtime_ns)
+
+
+def index_version() -> str:
+    # Part of the run cache key: rebuilding the corpus changes prompts
+    index = load_index()
+    return index.version if index is not None else "builtin"
+
+
+# ---------- BUILD ----------
+
+def read_corpus(path: str) -> List[Dict[str, Any]]:
+    from graph.costs import count_text_tokens
+
+    entries, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            text = (record.get("text") or "").strip()
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            entries.append({
+                "text": text,
+                "intent": record.get("intent"),
+                "communication_style": record.get("communication_style"),
+                "tokens": count_text_tokens(text),
+            })
+    return entries
+
+
+def build_index(corpus_path: str, out_dir: str, dim: int = DEFAULT_DIM,
+                embedder: Optional[str] = None, batch_size: int = 256) -> ReferenceIndex:
+    """
+    Embeds the corpus once into a new version directory and points
+    CURRENT at it: a serving process never maps a half-written matrix
+    or pairs one build's matrix with another build's meta.json.
+    """
+    embedder = embedder or embedder_spec()
+    entries = read_corpus(corpus_path)
+    embed = get_embedder(embedder, dim)
+
+    rows = []
+    for start in range(0, len(entries), batch_size):
+        batch = [e["text"] for e in entries[start:start + batch_size]]
+        rows.extend(normalize(v) for v in embed(batch))
+
+    digest = hashlib.sha256(json.dumps([embedder, dim, entries], sort_keys=True).encode("utf-8"))
+    meta = {"dim": dim, "embedder": embedder, "version": digest.hexdigest()[:16], "entries": entries}
+
+    # Versions are immutable directories; the only file replaced in place
+    # is CURRENT, so readers see the old index or the new one, never a mix
+    version_dir = os.path.join(out_dir, meta["version"])
+    if not os.path.exists(os.path.join(version_dir, META_FILE)):
+        staging = f"{version_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        write_npy(os.path.join(staging, EMBEDDINGS_FILE), rows, dim)
+        with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(staging, version_dir)
+
+    previous = current_index_dir(out_dir)
+    pointer = os.path.join(out_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(meta["version"])
+    os.replace(pointer + ".tmp", pointer)
+    _prune_versions(out_dir, keep={meta["version"], os.path.basename(previous or "")})
+
+    return ReferenceIndex.load(version_dir)
+
+
+def _prune_versions(out_dir: str, keep: set):
+    # The previous version stays: processes may still be reading it
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name not in keep and os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# ---------- CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / query the reference exemplar index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Embed a JSONL corpus into an index directory")
+    build.add_argument("corpus")
+    build.add_argument("--out", default=reference_index_dir())
+    build.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    build.add_argument("--embedder", default=embedder_spec())
+
+    search = sub.add_parser("search", help="Top-k exemplars for a topic")
+    search.add_argument("topic")
+    search.add_argument("--index", default=reference_index_dir())
+    search.add_argument("--intent")
+    search.add_argument("--style")
+    search.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_index(args.corpus, args.out, dim=args.dim, embedder=args.embedder)
+        print(f"indexed {len(index.entries)} exemplars ({index.embedder}, dim {index.dim}) -> {args.out}")
+        return
+
+    index = load_index(args.index)
+    if index is None:
+        parser.error(f"no index in {args.index}")
+    for score, entry in index.search(args.topic, intent=args.intent, style=args.style, k=args.k):
+        preview = " ".join(entry["text"].split())[:100]
+        print(f"{score:>7.4f}  {entry.get('intent') or '-':<24} {entry['tokens']:>4} tok  {preview}")
+
+
+if __name__ == "__main__":
+    main()
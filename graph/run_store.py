@@ -0,0 +1,374 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from graph.early_stop import trajectory
+from graph.guards import is_fail_soft
+from graph.state import get_draft
+
+
+logger = logging.getLogger(__name__)
+
+# Narrow, fixed-width columns only: analytics scan this table, so the
+# large JSON payloads live in run_details, read only per run
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id TEXT PRIMARY KEY,"
+    " created_at REAL NOT NULL,"
+    " intent TEXT,"
+    " communication_style TEXT,"
+    " stop_reason TEXT,"
+    " fail_soft INTEGER NOT NULL,"
+    " iterations INTEGER NOT NULL,"
+    " initial_score INTEGER,"
+    " final_score INTEGER,"
+    " llm_calls INTEGER NOT NULL,"
+    " total_tokens INTEGER NOT NULL,"
+    " total_cost_usd REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS run_details ("
+    " run_id TEXT PRIMARY KEY,"
+    " topic TEXT,"
+    " final_post TEXT,"
+    " scores TEXT,"
+    " history TEXT,"
+    " run_metrics TEXT,"
+    " trajectory TEXT)",
+    # Per-day aggregates kept in step with runs by the writer: analytics
+    # read these instead of scanning millions of rows
+    "CREATE TABLE IF NOT EXISTS run_rollups ("
+    " day INTEGER NOT NULL,"
+    " intent TEXT NOT NULL,"
+    " communication_style TEXT NOT NULL,"
+    " stop_reason TEXT NOT NULL,"
+    " iterations INTEGER NOT NULL,"
+    " runs INTEGER NOT NULL,"
+    " fail_soft INTEGER NOT NULL,"
+    " total_tokens INTEGER NOT NULL,"
+    " total_cost_usd REAL NOT NULL,"
+    " final_score INTEGER NOT NULL,"
+    " score_gained INTEGER NOT NULL,"
+    " PRIMARY KEY (day, intent, communication_style, stop_reason, iterations))",
+    "CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at)",
+    "CREATE INDEX IF NOT EXISTS runs_intent ON runs (intent, created_at)",
+    "CREATE INDEX IF NOT EXISTS runs_style ON runs (communication_style, created_at)",
+    "CREATE INDEX IF NOT EXISTS runs_stop_reason ON runs (stop_reason, created_at)",
+]
+
+RUN_COLUMNS = [
+    "run_id", "created_at", "intent", "communication_style", "stop_reason", "fail_soft",
+    "iterations", "initial_score", "final_score", "llm_calls", "total_tokens", "total_cost_usd",
+]
+DETAIL_COLUMNS = ["run_id", "topic", "final_post", "scores", "history", "run_metrics", "trajectory"]
+ROLLUP_MEASURES = ["runs", "fail_soft", "total_tokens", "total_cost_usd", "final_score", "score_gained"]
+
+ROLLUP_UPSERT = (
+    "INSERT INTO run_rollups (day, intent, communication_style, stop_reason, iterations,"
+    f" {', '.join(ROLLUP_MEASURES)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT (day, intent, communication_style, stop_reason, iterations) DO UPDATE SET "
+    + ", ".join(f"{m} = {m} + excluded.{m}" for m in ROLLUP_MEASURES)
+)
+
+
+def rollup_row(run: tuple, sign: int = 1) -> tuple:
+    """
+    run_rollups contribution of one runs row; sign=-1 retracts a row
+    that is being replaced (a resumed run finishing again).
+    """
+    values = dict(zip(RUN_COLUMNS, run))
+    final_score = values["final_score"] or 0
+    initial_score = values["initial_score"]
+    return (
+        int(values["created_at"] // 86400),
+        values["intent"] or "",
+        values["communication_style"] or "",
+        values["stop_reason"] or "",
+        values["iterations"],
+        sign,
+        sign * values["fail_soft"],
+        sign * values["total_tokens"],
+        sign * values["total_cost_usd"],
+        sign * final_score,
+        sign * (final_score - initial_score if initial_score is not None else 0),
+    )
+
+
+def run_rows(run_id: str, created_at: float, final_state: Dict[str, Any], response: Dict[str, Any]) -> tuple:
+    """(runs row, run_details row) for one finished run."""
+    run_metrics = final_state["run_metrics"]
+    history = [
+        {**entry, "draft_post": get_draft(final_state, entry)}
+        for entry in final_state.get("history", [])
+    ]
+
+    run = (
+        run_id,
+        created_at,
+        final_state.get("intent"),
+        final_state.get("communication_style"),
+        run_metrics.get("stop_reason"),
+        int(is_fail_soft(final_state)),
+        # Iterations spent, not the (possibly rolled back) iteration_count
+        run_metrics.get("optimizer_runs", 0),
+        run_metrics.get("initial_score"),
+        response.get("final_score"),
+        sum(run_metrics.get("llm_calls", {}).values()),
+        run_metrics.get("total_tokens", 0),
+        run_metrics.get("total_cost_usd", 0.0),
+    )
+    details = (
+        run_id,
+        final_state.get("topic"),
+        response.get("final_post"),
+        json.dumps(final_state.get("scores"), ensure_ascii=False),
+        json.dumps(history, ensure_ascii=False, default=str),
+        json.dumps(run_metrics, ensure_ascii=False, default=str),
+        json.dumps(trajectory(final_state), ensure_ascii=False, default=str),
+    )
+    return run, details
+
+
+class RunStore:
+    """
+    Append-only SQLite history of finished runs.
+
+    record() only enqueues: a background thread serializes and writes
+    in batched transactions, so persisting never blocks a request.
+    When the queue is full the run is dropped (and counted) rather than
+    applying back-pressure to /optimize.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------- WRITE-BEHIND ----------
+
+    def record(self, run_id: str, final_state: Dict[str, Any], response: Dict[str, Any]):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((run_id, time.time(), final_state, response))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._drain, name="run-store-writer", daemon=True)
+                self._writer.start()
+
+    def _drain(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch: List[tuple] = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write(conn, batch)
+            for _ in range(len(batch) + int(stopping)):
+                self._queue.task_done()
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[tuple]):
+        try:
+            batch = [run_rows(*item) for item in batch]
+            with conn:
+                for run, _ in batch:
+                    replaced = conn.execute(
+                        f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE run_id = ?", (run[0],)
+                    ).fetchone()
+                    if replaced is not None:
+                        conn.execute(ROLLUP_UPSERT, rollup_row(replaced, sign=-1))
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO runs ({', '.join(RUN_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                        run,
+                    )
+                    conn.execute(ROLLUP_UPSERT, rollup_row(run))
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO run_details ({', '.join(DETAIL_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(DETAIL_COLUMNS))})",
+                    [details for _, details in batch],
+                )
+            with self._lock:
+                self.written += len(batch)
+        except Exception as e:
+            # History is best effort: a bad batch is dropped, not retried
+            with self._lock:
+                self.dropped += len(batch)
+            logger.warning("run store: dropped %d runs: %s", len(batch), e)
+
+    def flush(self):
+        """Blocks until every queued run is written."""
+        self._queue.join()
+
+    def close(self):
+        """Writes what is queued, then stops the writer thread."""
+        with self._lock:
+            writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    # ---------- ANALYTICS ----------
+
+    def analytics(self, since: Optional[float] = None, intent: Optional[str] = None,
+                  communication_style: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Aggregates from run_rollups, whose size depends on days x
+        dimensions, not on the number of runs. `since` is applied at
+        UTC-day granularity.
+        """
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(int(since // 86400))
+        if intent is not None:
+            clauses.append("intent = ?")
+            params.append(intent)
+        if communication_style is not None:
+            clauses.append("communication_style = ?")
+            params.append(communication_style)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connect()
+        try:
+            groups = conn.execute(
+                "SELECT stop_reason, iterations, SUM(runs), SUM(fail_soft), SUM(total_tokens),"
+                " SUM(total_cost_usd), SUM(final_score), SUM(score_gained)"
+                f" FROM run_rollups {where} GROUP BY stop_reason, iterations",
+                params,
+            ).fetchall()
+        finally:
+            conn.close()
+
+        totals = dict.fromkeys(ROLLUP_MEASURES, 0)
+        iterations: Dict[int, int] = {}
+        reasons: Dict[str, Dict[str, float]] = {}
+        for reason, n_iterations, *measures in groups:
+            values = dict(zip(ROLLUP_MEASURES, measures))
+            if not values["runs"]:
+                # Only retracted (replaced) runs left in this group
+                continue
+            for key, value in values.items():
+                totals[key] += value
+            iterations[n_iterations] = iterations.get(n_iterations, 0) + values["runs"]
+
+            by_reason = reasons.setdefault(reason, {"runs": 0, "final_score": 0, "total_cost_usd": 0.0, "iterations": 0})
+            by_reason["runs"] += values["runs"]
+            by_reason["final_score"] += values["final_score"]
+            by_reason["total_cost_usd"] += values["total_cost_usd"]
+            by_reason["iterations"] += n_iterations * values["runs"]
+
+        runs, cost = totals["runs"], totals["total_cost_usd"]
+        return {
+            "runs": runs,
+            "fail_soft_runs": totals["fail_soft"],
+            "total_cost_usd": round(cost, 6),
+            "total_tokens": totals["total_tokens"],
+            "avg_final_score": round(totals["final_score"] / runs, 3) if runs else None,
+            # USD per point of final score, and per point the loop added
+            "cost_per_score_point": round(cost / totals["final_score"], 8) if totals["final_score"] else None,
+            "cost_per_point_gained": round(cost / totals["score_gained"], 8) if totals["score_gained"] > 0 else None,
+            "iterations_distribution": {str(n): iterations[n] for n in sorted(iterations)},
+            "stop_reasons": [
+                {
+                    "stop_reason": reason or None,
+                    "runs": r["runs"],
+                    "share": round(r["runs"] / runs, 4),
+                    "avg_final_score": round(r["final_score"] / r["runs"], 3),
+                    "avg_cost_usd": round(r["total_cost_usd"] / r["runs"], 8),
+                    "avg_iterations": round(r["iterations"] / r["runs"], 3),
+                }
+                for reason, r in sorted(reasons.items(), key=lambda item: -item[1]["runs"])
+            ],
+        }
+
+    def iter_trajectories(self) -> Iterator[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            for (raw,) in conn.execute("SELECT trajectory FROM run_details WHERE trajectory IS NOT NULL"):
+                yield json.loads(raw)
+        finally:
+            conn.close()
+
+
+class NullRunStore:
+    """Disabled run store (RUN_STORE_BACKEND=off)."""
+
+    def record(self, run_id: str, final_state: Dict[str, Any], response: Dict[str, Any]):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "off"}
+
+    def analytics(self, **filters) -> Optional[Dict[str, Any]]:
+        return None
+
+
+def build_run_store():
+    """
+    RUN_STORE_BACKEND: sqlite (default) | off
+    RUN_STORE_PATH (default .cache/runs.sqlite3), RUN_STORE_QUEUE_SIZE.
+    """
+    if os.getenv("RUN_STORE_BACKEND", "sqlite").lower() == "off":
+        return NullRunStore()
+    return RunStore(
+        os.getenv("RUN_STORE_PATH", ".cache/runs.sqlite3"),
+        max_queue=int(os.getenv("RUN_STORE_QUEUE_SIZE", "10000")),
+    )
@@ -1,7 +1,36 @@
+import hashlib
 from typing import TypedDict, Literal, List, Dict, Any, Optional, Annotated
 from operator import add
 
 
+# ---------- DRAFT STORE ----------
+
+def draft_id(text: str) -> str:
+    """Content address of a draft inside one run's draft store."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def get_draft(state, entry: Dict[str, Any]) -> str:
+    """
+    Resolves a history / best-iteration entry to its draft text.
+    Entries without a draft_id (older shape) carry the text inline.
+    """
+    if "draft_id" in entry:
+        return state["drafts"][entry["draft_id"]]
+    return entry["draft_post"]
+
+
+# ---------- REDUCERS ----------
+
+def merge_drafts(left: Optional[Dict[str, str]], right: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Adds newly evaluated drafts to the run's draft store.
+    Returns a new dict: LangGraph shares channel values between
+    step snapshots, so reducers must not mutate `left`.
+    """
+    return {**(left or {}), **(right or {})}
+
+
 class LinkedInPostState(TypedDict):
     # -----------------
     # User input
@@ -19,6 +48,9 @@ class LinkedInPostState(TypedDict):
         "STORY_DRIVEN",
     ]
 
+    # Intent-specific reference snippets (style and density only)
+    references: List[str]
+
     # -----------------
     # Draft content
     # -----------------
@@ -33,6 +65,10 @@ class LinkedInPostState(TypedDict):
     # Per-dimension evaluator scores
     scores: Dict[str, int]
 
+    # Every evaluated draft, stored once: draft_id -> text.
+    # history, best_iteration and candidate_review reference draft_id.
+    drafts: Annotated[Dict[str, str], merge_drafts]
+
     # -----------------
     # Focus control (NEW)
     # -----------------
@@ -51,10 +87,23 @@ class LinkedInPostState(TypedDict):
     iteration_count: int
     max_iterations: int
 
+    # Best-of-N optimizer: rewrites sampled and scored per iteration
+    optimizer_candidates: int
+
+    # Review of the winning candidate, reused by the evaluator
+    candidate_review: Optional[Dict[str, Any]]
+
+    # "unchanged" / "cyclic" when the evaluated draft was already scored
+    repeated_draft: Optional[str]
+
+    # Fused evaluate-and-rewrite: rewrite of the current draft proposed
+    # alongside its review, applied by apply_revision
+    proposed_revision: Optional[str]
+
     # -----------------
     # History & diagnostics
     # -----------------
-    history: List[Dict[str, Any]]
+    history: Annotated[List[Dict[str, Any]], add]
 
     # Accumulates evaluator feedback across iterations
     review_feedback_history: Annotated[List[str], add]
@@ -1,13 +1,30 @@
+from functools import lru_cache
+from typing import Optional
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 
-from graph.state import LinkedInPostState
+from graph.state import LinkedInPostState, get_draft
+from graph.guards import is_fail_soft
+from graph.early_stop import should_stop_early
+from models.llm_config import fused_generation_enabled, fused_revision_enabled
 
-from prompts.intent_classifier import intent_classifier
+from prompts.intent_classifier import intent_classifier, aintent_classifier
 from prompts.reference_retriever import reference_retriever
-from prompts.generator import generate_linkedin_post
-from prompts.evaluator import evaluate_linkedin_post
-from prompts.optimizer import optimize_linkedin_post
-from prompts.summarize_changes import summarize_changes
+from prompts.generator import (
+    generate_linkedin_post,
+    agenerate_linkedin_post,
+    classify_and_generate,
+    aclassify_and_generate,
+)
+from prompts.evaluator import evaluate_linkedin_post, aevaluate_linkedin_post
+from prompts.optimizer import optimize_linkedin_post, aoptimize_linkedin_post
+from prompts.evaluate_and_rewrite import (
+    evaluate_and_rewrite,
+    aevaluate_and_rewrite,
+    apply_revision,
+    aapply_revision,
+)
+from prompts.summarize_changes import summarize_changes, asummarize_changes
 
 def active_focus_flattened(state: LinkedInPostState) -> bool:
     """
@@ -94,7 +111,7 @@ def rollback_to_best(state: LinkedInPostState) -> LinkedInPostState:
     state["run_metrics"]["rollbacks"] += 1
 
     return {
-        "draft_post": best["draft_post"],
+        "draft_post": get_draft(state, best),
         "quality_score": best["quality_score"],
         "scores": best["scores"],
         "active_focus_factors": best["active_focus_factors"],
@@ -106,7 +123,8 @@ def rollback_to_best(state: LinkedInPostState) -> LinkedInPostState:
 def should_continue(state: LinkedInPostState):
     
     # 🔒 FAIL-SOFT GUARD
-    if state.get('__fail_soft__'):
+    # (`__fail_soft__` is not a state key, so also check the recorded stop reason)
+    if is_fail_soft(state):
         return 'summarize_changes'
     
     # 0. Early stop: strong generator output
@@ -148,42 +166,127 @@ def should_continue(state: LinkedInPostState):
     if state["run_metrics"]["stop_reason"] == "token_budget_exceeded":
         return "summarize_changes"
 
+    # Optimizer returned a draft we already scored: another
+    # iteration would re-run the same (or a cycling) rewrite
+    if state.get("repeated_draft") == "unchanged":
+        state["run_metrics"]["stop_reason"] = "Unchanged_Draft"
+        return "summarize_changes"
+    if state.get("repeated_draft") == "cyclic":
+        state["run_metrics"]["stop_reason"] = "Cyclic_Draft"
+        return "summarize_changes"
+
+    # Learned stop: the next iteration is unlikely to beat the best score
+    if should_stop_early(state):
+        state["run_metrics"]["stop_reason"] = "Predicted_No_Gain"
+        return "summarize_changes"
+
     # Otherwise, continue optimizing
     return "optimize_linkedin_post"
 
 
-def build_graph():
+def after_optimize(state: LinkedInPostState):
+    # Optimizer ran out of budget before rewriting: the draft is unchanged,
+    # so re-scoring it would only record a duplicate iteration
+    if state["run_metrics"]["stop_reason"] == "token_budget_exceeded":
+        return "summarize_changes"
+    return "evaluate"
+
+
+def llm_node(name: str, func, afunc):
+    """
+    Wraps an LLM-backed node so `invoke` runs the sync implementation
+    and `ainvoke` / `astream` await the native async one
+    (no threadpool thread pinned during network wait).
+    """
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+
+def build_graph(fused_generation: Optional[bool] = None, fused_revision: Optional[bool] = None):
+    """
+    fused_generation (default: FUSED_GENERATION env) replaces the
+    intent_classifier -> generate_linkedin_post hops with a single
+    classify_and_generate call, one round trip less per request.
+
+    fused_revision (default: FUSED_REVISION env) replaces the
+    evaluate -> optimize loop with evaluate_and_rewrite -> apply_revision:
+    one LLM call per iteration instead of two, same stop/rollback guards.
+    """
+    if fused_generation is None:
+        fused_generation = fused_generation_enabled()
+    if fused_revision is None:
+        fused_revision = fused_revision_enabled()
+
+    # The loop's review and revision nodes
+    evaluate = "evaluate_and_rewrite" if fused_revision else "evaluate_linkedin_post"
+    revise = "apply_revision" if fused_revision else "optimize_linkedin_post"
+
     graph = StateGraph(LinkedInPostState)
 
-    graph.add_node("intent_classifier", intent_classifier)
+    if fused_generation:
+        graph.add_node("classify_and_generate", llm_node("classify_and_generate", classify_and_generate, aclassify_and_generate))
+    else:
+        graph.add_node("intent_classifier", llm_node("intent_classifier", intent_classifier, aintent_classifier))
+        graph.add_node("generate_linkedin_post", llm_node("generate_linkedin_post", generate_linkedin_post, agenerate_linkedin_post))
     graph.add_node("reference_retriever", reference_retriever)
-    graph.add_node("generate_linkedin_post", generate_linkedin_post)
-    graph.add_node("evaluate_linkedin_post", evaluate_linkedin_post)
-    graph.add_node("optimize_linkedin_post", optimize_linkedin_post)
+    if fused_revision:
+        graph.add_node("evaluate_and_rewrite", llm_node("evaluate_and_rewrite", evaluate_and_rewrite, aevaluate_and_rewrite))
+        graph.add_node("apply_revision", llm_node("apply_revision", apply_revision, aapply_revision))
+    else:
+        graph.add_node("evaluate_linkedin_post", llm_node("evaluate_linkedin_post", evaluate_linkedin_post, aevaluate_linkedin_post))
+        graph.add_node("optimize_linkedin_post", llm_node("optimize_linkedin_post", optimize_linkedin_post, aoptimize_linkedin_post))
     graph.add_node("rollback", rollback_to_best)
-    graph.add_node("summarize", summarize_changes)
-
-    graph.add_edge(START, "intent_classifier")
-    graph.add_edge("intent_classifier", "reference_retriever")
-    graph.add_edge("reference_retriever", "generate_linkedin_post")
-    graph.add_edge("generate_linkedin_post", "evaluate_linkedin_post")
+    graph.add_node("summarize", llm_node("summarize", summarize_changes, asummarize_changes))
+
+    if fused_generation:
+        # The intent arrives with the draft: references are retrieved
+        # first, by style only, so the fused prompt can include them
+        graph.add_edge(START, "reference_retriever")
+        graph.add_edge("reference_retriever", "classify_and_generate")
+        graph.add_edge("classify_and_generate", evaluate)
+    else:
+        graph.add_edge(START, "intent_classifier")
+        graph.add_edge("intent_classifier", "reference_retriever")
+        graph.add_edge("reference_retriever", "generate_linkedin_post")
+        graph.add_edge("generate_linkedin_post", evaluate)
 
     graph.add_conditional_edges(
-        "evaluate_linkedin_post",
+        evaluate,
         should_continue,
         {
-            "optimize_linkedin_post": "optimize_linkedin_post",
+            "optimize_linkedin_post": revise,
             "rollback": "rollback",
             "summarize_changes": "summarize",
         },
     )
 
-    graph.add_edge("optimize_linkedin_post", "evaluate_linkedin_post")
+    if fused_revision:
+        graph.add_edge(revise, evaluate)
+    else:
+        graph.add_conditional_edges(
+            revise,
+            after_optimize,
+            {
+                "evaluate": evaluate,
+                "summarize_changes": "summarize",
+            },
+        )
     graph.add_edge("rollback", "summarize")
     graph.add_edge("summarize", END)
 
     return graph
 
 
-# Production workflow (unchanged behavior)
-linkedin_post_workflow = build_graph().compile()
+@lru_cache(maxsize=None)
+def get_workflow():
+    """
+    Production workflow (unchanged behavior), compiled on first use
+    rather than at import.
+    """
+    return build_graph().compile()
+
+
+def __getattr__(name):
+    # `from graph.workflow import linkedin_post_workflow` keeps working
+    if name == "linkedin_post_workflow":
+        return get_workflow()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,352 @@
+"""
+Record / replay LLM cassettes for deterministic offline runs of the graph.
+
+LLM_PROVIDER=record   real calls (through the gateway), each request and
+                      response appended to <LLM_CASSETTE_DIR>/<node>.jsonl
+LLM_PROVIDER=replay   no network: every call is answered from the cassettes
+
+A call is keyed by the graph node that made it plus a hash of the full
+rendered request (messages, model, temperature, response schema), so a
+prompt or parameter change misses instead of replaying a stale answer.
+Sampled calls repeated with the same request (best-of-N candidates) are
+replayed in recorded order.
+
+LLM_CASSETTE_DIR: cassette directory (default .cache/cassettes)
+CASSETTE_ON_MISS: error (default) raises CassetteMiss | fake answers with
+                  schema-valid output seeded by the request key
+CASSETTE_LATENCY_SCALE: replay recorded latencies scaled by this (default 0)
+"""
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from langgraph.config import get_config
+from pydantic import BaseModel
+
+from models.fake import WORDS
+from models.gateway import GatewayChatOpenAI
+
+
+DEFAULT_CASSETTE_DIR = ".cache/cassettes"
+
+# Transport flags: a streamed and a non-streamed call share a recording
+TRANSPORT_FIELDS = ("stream", "stream_options")
+
+
+def cassette_dir() -> str:
+    return os.getenv("LLM_CASSETTE_DIR", DEFAULT_CASSETTE_DIR)
+
+
+def on_miss() -> str:
+    return os.getenv("CASSETTE_ON_MISS", "error").lower()
+
+
+def latency_scale() -> float:
+    return float(os.getenv("CASSETTE_LATENCY_SCALE", "0"))
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+# ---------- KEYS ----------
+
+def current_node() -> str:
+    """The graph node making the call ("unknown" outside a graph run)."""
+    try:
+        return get_config().get("metadata", {}).get("langgraph_node") or "unknown"
+    except RuntimeError:
+        return "unknown"
+
+
+def canonical_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The request as sent, JSON-ready. A structured-output schema class
+    becomes its JSON schema, so editing a field changes the key.
+    """
+    request = {k: v for k, v in payload.items() if k not in TRANSPORT_FIELDS}
+    response_format = request.get("response_format")
+    if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+        request["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": response_format.__name__, "schema": response_format.model_json_schema()},
+        }
+    return request
+
+
+def request_key(node: str, request: Dict[str, Any]) -> str:
+    canonical = json.dumps({"node": node, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ---------- SERIALIZATION ----------
+
+def dump_result(result: ChatResult) -> Dict[str, Any]:
+    # model_dump turns a parsed structured output into a plain dict,
+    # which ChatOpenAI's structured-output parser accepts on replay
+    return json.loads(json.dumps({
+        "messages": [message_to_dict(g.message) for g in result.generations],
+        "llm_output": result.llm_output,
+    }, default=str))
+
+
+def load_result(response: Dict[str, Any]) -> ChatResult:
+    return ChatResult(
+        generations=[ChatGeneration(message=m) for m in messages_from_dict(response["messages"])],
+        llm_output=response.get("llm_output"),
+    )
+
+
+def merge_chunks(chunks: List[ChatGenerationChunk]) -> ChatResult:
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+    return ChatResult(generations=[ChatGeneration(message=message_chunk_to_message(merged.message))])
+
+
+def stream_chunks(message: AIMessage):
+    """A recorded response as a token stream, usage on the final chunk."""
+    words = str(message.content).split(" ")
+    for i, word in enumerate(words):
+        yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+    yield ChatGenerationChunk(message=AIMessageChunk(
+        content="",
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        usage_metadata=message.usage_metadata,
+    ))
+
+
+# ---------- STORE ----------
+
+class Cassette:
+    """
+    Recordings under one directory, one JSONL file per node. Loaded on
+    first replay; each key hands out its responses in recorded order,
+    wrapping around when a replay makes more identical calls.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._responses: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.recorded = self.hits = self.misses = 0
+
+    def _path(self, node: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", node) + ".jsonl")
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._responses is None:
+            self._responses = defaultdict(list)
+            for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl"))):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # Torn last line from an interrupted recording
+                            continue
+                        self._responses[entry["key"]].append(entry)
+        return self._responses
+
+    def record(self, node: str, request: Dict[str, Any], result: ChatResult, latency_s: float):
+        entry = {
+            "key": request_key(node, request),
+            "node": node,
+            "request": request,
+            "response": dump_result(result),
+            "latency_ms": round(latency_s * 1000, 1),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(node), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            if self._responses is not None:
+                self._responses[entry["key"]].append(entry)
+            self.recorded += 1
+
+    def play(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._load().get(key)
+            if not entries:
+                self.misses += 1
+                return None
+            entry = entries[self._cursor[key] % len(entries)]
+            self._cursor[key] += 1
+            self.hits += 1
+            return entry
+
+    def rewind(self):
+        with self._lock:
+            self._cursor.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "recorded": self.recorded,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_cassette(directory: Optional[str] = None) -> Cassette:
+    return Cassette(directory or cassette_dir())
+
+
+# ---------- MISSES ----------
+
+def fake_value(schema: Dict[str, Any], rng: random.Random, root: Dict[str, Any]) -> Any:
+    """Schema-valid value for a JSON schema (the subset pydantic emits)."""
+    if "$ref" in schema:
+        schema = root.get("$defs", {})[schema["$ref"].rsplit("/", 1)[-1]]
+    if "anyOf" in schema:
+        schema = next(s for s in schema["anyOf"] if s.get("type") != "null")
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+
+    kind = schema.get("type")
+    if kind == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 10))
+    if kind == "number":
+        return round(rng.uniform(schema.get("minimum", 0), schema.get("maximum", 1)), 3)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "array":
+        return [fake_value(schema.get("items", {}), rng, root) for _ in range(2)]
+    if kind == "object":
+        values = {name: fake_value(prop, rng, root) for name, prop in schema.get("properties", {}).items()}
+        if "total_score" in values:
+            dimensions = [v for k, v in values.items() if k != "total_score" and isinstance(v, int)]
+            values["total_score"] = sum(dimensions)
+        return values
+    return " ".join(rng.choices(WORDS, k=12))
+
+
+def fake_result(key: str, request: Dict[str, Any]) -> ChatResult:
+    # Seeded by the request key: the same missed call fakes the same answer
+    rng = random.Random(key)
+    schema = (request.get("response_format") or {}).get("json_schema", {}).get("schema")
+
+    additional_kwargs = {}
+    if schema:
+        parsed = fake_value(schema, rng, schema)
+        content = json.dumps(parsed)
+        additional_kwargs["parsed"] = parsed
+    else:
+        content = " ".join(rng.choices(WORDS, k=150))
+
+    input_tokens = len(json.dumps(request.get("messages", []), default=str)) // 4
+    output_tokens = max(1, len(content) // 4)
+    message = AIMessage(
+        content=content,
+        additional_kwargs=additional_kwargs,
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+        response_metadata={"model_name": request.get("model")},
+    )
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# ---------- CLIENTS ----------
+
+class RecordingChatOpenAI(GatewayChatOpenAI):
+    """
+    Gateway client that appends every completed call to the cassette.
+    """
+
+    def _record(self, node, messages, stop, kwargs, result, started):
+        request = canonical_request(self._get_request_payload(messages, stop=stop, **kwargs))
+        get_cassette().record(node, request, result, time.perf_counter() - started)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        node, started = current_node(), time.perf_counter()
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        self._record(node, messages, stop, kwargs, result, started)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        node, started = current_node(), time.perf_counter()
+        result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        self._record(node, messages, stop, kwargs, result, started)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        node, started = current_node(), time.perf_counter()
+        chunks = []
+        for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self._record(node, messages, stop, kwargs, merge_chunks(chunks), started)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        node, started = current_node(), time.perf_counter()
+        chunks = []
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self._record(node, messages, stop, kwargs, merge_chunks(chunks), started)
+
+
+class ReplayChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI answered from the cassette: renders the request exactly
+    as the real client would, then looks it up instead of sending it.
+    """
+
+    def __init__(self, **kwargs):
+        # Never used: requests are rendered, not sent
+        kwargs.setdefault("api_key", "replay")
+        super().__init__(**kwargs)
+
+    def _lookup(self, messages, stop, kwargs):
+        request = canonical_request(self._get_request_payload(messages, stop=stop, **kwargs))
+        key = request_key(current_node(), request)
+        entry = get_cassette().play(key)
+        if entry is not None:
+            return load_result(entry["response"]), entry.get("latency_ms", 0) / 1000 * latency_scale()
+        if on_miss() == "fake":
+            return fake_result(key, request), 0.0
+        raise CassetteMiss(f"no recording for {current_node()} request {key[:12]} in {get_cassette().directory}")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result, wait = self._lookup(messages, stop, kwargs)
+        if wait:
+            time.sleep(wait)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result, wait = self._lookup(messages, stop, kwargs)
+        if wait:
+            await asyncio.sleep(wait)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        result, wait = self._lookup(messages, stop, kwargs)
+        if wait:
+            time.sleep(wait)
+        yield from stream_chunks(result.generations[0].message)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        result, wait = self._lookup(messages, stop, kwargs)
+        if wait:
+            await asyncio.sleep(wait)
+        for chunk in stream_chunks(result.generations[0].message):
+            yield chunk
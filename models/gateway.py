@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from langchain_core.outputs import ChatResult
+from langchain_openai import ChatOpenAI
+
+
+# ---------- CONFIG ----------
+
+# Requests / tokens per minute per model (OpenAI usage tier 1).
+# Override with LLM_RATE_LIMITS='{"gpt-4.1": {"rpm": 5000, "tpm": 800000}}'.
+DEFAULT_RATE_LIMITS = {
+    "gpt-4.1": {"rpm": 500, "tpm": 30000},
+    "gpt-4.1-mini": {"rpm": 500, "tpm": 200000},
+}
+
+# Completion tokens reserved when a call sets no max_tokens;
+# settled against reported usage once the call returns
+DEFAULT_COMPLETION_RESERVATION = 512
+
+
+def rate_limits() -> Dict[str, Dict[str, float]]:
+    return {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))}
+
+
+def rate_limit_processes() -> int:
+    """
+    Buckets live in process memory, so each serving process gets an
+    equal share of the account limits: LLM_RATE_LIMIT_PROCESSES, else
+    WEB_CONCURRENCY (uvicorn --workers), else 1.
+    """
+    return max(1, int(os.getenv("LLM_RATE_LIMIT_PROCESSES") or os.getenv("WEB_CONCURRENCY") or "1"))
+
+
+def coalescing_enabled() -> bool:
+    return os.getenv("LLM_COALESCE", "true").lower() not in ("0", "false", "off")
+
+
+def _pool_limits() -> Tuple[httpx.Limits, httpx.Timeout]:
+    """
+    LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, LLM_HTTP_TIMEOUT
+    size the connection pool shared by every client.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=30.0,
+    )
+    timeout = httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "60")), connect=5.0)
+    return limits, timeout
+
+
+@lru_cache(maxsize=None)
+def shared_http_client() -> httpx.Client:
+    limits, timeout = _pool_limits()
+    return httpx.Client(limits=limits, timeout=timeout)
+
+
+@lru_cache(maxsize=None)
+def shared_async_http_client() -> httpx.AsyncClient:
+    limits, timeout = _pool_limits()
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+async def aprewarm_connections():
+    """
+    Opens LLM_WARMUP_CONNECTIONS (default 2) keep-alive connections to
+    the provider in the shared async pool. Any response, even an auth
+    error, leaves a reusable connection behind.
+    """
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
+    client = shared_async_http_client()
+    count = int(os.getenv("LLM_WARMUP_CONNECTIONS", "2"))
+
+    await asyncio.gather(
+        *[client.get(f"{base_url}/models", headers=headers) for _ in range(count)],
+        return_exceptions=True,
+    )
+
+
+# ---------- RATE LIMITING ----------
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to one minute's worth.
+    Reservations may overdraw it: the caller then waits until the
+    debt is repaid, so concurrent callers queue in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Takes `amount` and returns the seconds to wait before using it."""
+        self._refill(now)
+        # A single call larger than the bucket still goes through, once it is full
+        self.available -= min(amount, self.capacity)
+        return max(0.0, -self.available / self.rate)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.available = min(self.capacity, self.available + amount)
+
+
+class ModelRateLimiter:
+    """
+    Request and token buckets for one model, shared by every
+    client of that model in the process (not across processes).
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            waits = [0.0]
+            if self.requests is not None:
+                waits.append(self.requests.reserve(1, now))
+            if self.tokens is not None:
+                waits.append(self.tokens.reserve(tokens, now))
+            return max(waits)
+
+    def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, actual: Optional[int]):
+        """Swaps a reservation for the provider-reported usage."""
+        if self.tokens is None or actual is None:
+            return
+        with self._lock:
+            self.tokens.refund(reserved - actual, time.monotonic())
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(model: str) -> ModelRateLimiter:
+    with _limiters_lock:
+        if model not in _limiters:
+            limits = rate_limits().get(model, {})
+            share = rate_limit_processes()
+            _limiters[model] = ModelRateLimiter(
+                *(limits[key] / share if limits.get(key) else None for key in ("rpm", "tpm"))
+            )
+        return _limiters[model]
+
+
+# ---------- IN-FLIGHT COALESCING ----------
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class InFlight:
+    """
+    Single-flight: concurrent callers with the same key share
+    one underlying call. `coalesced` counts calls saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._futures: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self.coalesced = 0
+
+    def run(self, key: str, fn) -> Tuple[Any, bool]:
+        """Returns (result, shared): shared is True for followers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def arun(self, key: str, fn) -> Tuple[Any, bool]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._futures.get(key)
+            leader = entry is None or entry[0] is not loop
+            if leader:
+                future = loop.create_future()
+                self._futures[key] = (loop, future)
+            else:
+                future = entry[1]
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled, not us: make the call ourselves
+                return await fn(), False
+
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: no "never retrieved" warning without followers
+            raise
+        finally:
+            with self._lock:
+                if self._futures.get(key, (None, None))[1] is future:
+                    del self._futures[key]
+
+
+in_flight = InFlight()
+
+
+def _as_shared(result: ChatResult) -> ChatResult:
+    """
+    A coalesced caller's copy of the leader's result. Its usage is
+    zeroed: the tokens were paid (and are reported) once, by the leader.
+    """
+    result = result.model_copy(deep=True)
+    for generation in result.generations:
+        generation.message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    result.llm_output = {**(result.llm_output or {}), "token_usage": {}}
+    return result
+
+
+# ---------- CLIENT ----------
+
+def _reported_tokens(result: ChatResult) -> Optional[int]:
+    totals = [
+        generation.message.usage_metadata["total_tokens"]
+        for generation in result.generations
+        if getattr(generation.message, "usage_metadata", None)
+    ]
+    return sum(totals) if totals else None
+
+
+class GatewayChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI behind the gateway:
+    - one sized keep-alive connection pool for all clients
+    - per-model RPM/TPM token buckets: over the limit, calls wait instead of 429-ing
+    - byte-identical in-flight temperature-0 requests share one call
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("http_client", shared_http_client())
+        kwargs.setdefault("http_async_client", shared_async_http_client())
+        super().__init__(**kwargs)
+
+    def _reservation(self, payload: Dict[str, Any]) -> int:
+        prompt_chars = len(json.dumps(payload.get("messages", []), ensure_ascii=False, default=str))
+        completion = (
+            payload.get("max_completion_tokens")
+            or payload.get("max_tokens")
+            or DEFAULT_COMPLETION_RESERVATION
+        )
+        return prompt_chars // 4 + completion
+
+    def _coalesce_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        # Sampled outputs must stay independent (best-of-N candidates)
+        if not coalescing_enabled() or payload.get("temperature") != 0 or payload.get("n", 1) != 1:
+            return None
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        limiter = rate_limiter(self.model_name)
+
+        def call():
+            reserved = self._reservation(payload)
+            limiter.acquire(reserved)
+            result = super(GatewayChatOpenAI, self)._generate(messages, stop, run_manager, **kwargs)
+            limiter.settle(reserved, _reported_tokens(result))
+            return result
+
+        key = self._coalesce_key(payload)
+        if key is None:
+            return call()
+        result, shared = in_flight.run(key, call)
+        return _as_shared(result) if shared else result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        limiter = rate_limiter(self.model_name)
+
+        async def call():
+            reserved = self._reservation(payload)
+            await limiter.aacquire(reserved)
+            result = await super(GatewayChatOpenAI, self)._agenerate(messages, stop, run_manager, **kwargs)
+            limiter.settle(reserved, _reported_tokens(result))
+            return result
+
+        key = self._coalesce_key(payload)
+        if key is None:
+            return await call()
+        result, shared = await in_flight.arun(key, call)
+        return _as_shared(result) if shared else result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = rate_limiter(self.model_name)
+        reserved = self._reservation(self._get_request_payload(messages, stop=stop, **kwargs))
+        limiter.acquire(reserved)
+
+        usage = None
+        for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            usage = getattr(chunk.message, "usage_metadata", None) or usage
+            yield chunk
+        limiter.settle(reserved, usage["total_tokens"] if usage else None)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = rate_limiter(self.model_name)
+        reserved = self._reservation(self._get_request_payload(messages, stop=stop, **kwargs))
+        await limiter.aacquire(reserved)
+
+        usage = None
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            usage = getattr(chunk.message, "usage_metadata", None) or usage
+            yield chunk
+        limiter.settle(reserved, usage["total_tokens"] if usage else None)
@@ -0,0 +1,64 @@
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class LazyRunnable(Runnable):
+    """
+    Stand-in for a runnable that is only built on first use.
+
+    Module-level clients (`generator_llm`, `structured_evaluator`, ...)
+    keep their names and call sites, but importing a module no longer
+    constructs HTTP clients or derives tool schemas. Calls are delegated
+    without adding a trace span of their own.
+    """
+
+    # Every instance, so a warm-up can build them all ahead of traffic
+    instances: List["LazyRunnable"] = []
+
+    def __init__(self, factory: Callable[[], Runnable], name: Optional[str] = None):
+        self._factory = factory
+        self._runnable: Optional[Runnable] = None
+        self._lock = threading.Lock()
+        self.name = name
+        LazyRunnable.instances.append(self)
+
+    def build(self) -> Runnable:
+        if self._runnable is None:
+            with self._lock:
+                if self._runnable is None:
+                    self._runnable = self._factory()
+        return self._runnable
+
+    @classmethod
+    def build_all(cls):
+        for instance in list(cls.instances):
+            instance.build()
+
+    def __getattr__(self, name: str) -> Any:
+        # Client attributes (model_name, with_structured_output, ...)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.build(), name)
+
+    # ---------- Runnable interface ----------
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        return self.build().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        return await self.build().ainvoke(input, config, **kwargs)
+
+    def batch(self, inputs, config=None, **kwargs):
+        return self.build().batch(inputs, config, **kwargs)
+
+    async def abatch(self, inputs, config=None, **kwargs):
+        return await self.build().abatch(inputs, config, **kwargs)
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator:
+        yield from self.build().stream(input, config, **kwargs)
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        async for chunk in self.build().astream(input, config, **kwargs):
+            yield chunk
@@ -1,31 +1,149 @@
-from langchain_openai import ChatOpenAI
-
-# Intent Classifier LLM (Consistent Output)
-intent_classifier_llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.0,
-)
-
-# Writer — strong POV, fluent, confident
-generator_llm = ChatOpenAI(
-    model="gpt-4.1",
-    temperature=0.6,
-)
-
-# Editor — harsher, less impressed by fluency
-evaluator_llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.0,
-)
-
-# Line editor — surgical rewrites only
-optimizer_llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.1,
-)
-
-# NEW: Change Summary / Iteration Diff LLM
-change_summary_llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.0,
-)
+import asyncio
+import logging
+import os
+from functools import lru_cache
+
+from models.lazy import LazyRunnable
+
+
+# Client settings per agent role. Clients are built on first use
+# (see get_llm), so importing this module stays cheap on cold start.
+MODEL_CONFIGS = {
+    # Intent Classifier LLM (Consistent Output)
+    "intent_classifier": {
+        "model": "gpt-4.1-mini",
+        "temperature": 0.0,
+    },
+
+    # Writer — strong POV, fluent, confident
+    "generator": {
+        "model": "gpt-4.1",
+        "temperature": 0.6,
+        # Token-streamed: still report usage on the final chunk
+        "stream_usage": True,
+    },
+
+    # Editor — harsher, less impressed by fluency
+    "evaluator": {
+        "model": "gpt-4.1-mini",
+        "temperature": 0.0,
+    },
+
+    # Line editor — surgical rewrites only
+    "optimizer": {
+        "model": "gpt-4.1-mini",
+        "temperature": 0.1,
+        "stream_usage": True,
+    },
+
+    # NEW: Change Summary / Iteration Diff LLM
+    "summarizer": {
+        "model": "gpt-4.1-mini",
+        "temperature": 0.0,
+    },
+}
+
+# Best-of-N optimizer: extra candidates sample at this temperature
+OPTIMIZER_CANDIDATE_TEMPERATURE = 0.7
+
+
+def fused_generation_enabled() -> bool:
+    # FUSED_GENERATION=true: the generator also classifies intent,
+    # in the same call (see prompts/generator.py:classify_and_generate)
+    return os.getenv("FUSED_GENERATION", "false").lower() in ("1", "true", "on")
+
+
+def fused_revision_enabled() -> bool:
+    # FUSED_REVISION=true: each loop turn reviews and rewrites in one call
+    # (see prompts/evaluate_and_rewrite.py)
+    return os.getenv("FUSED_REVISION", "false").lower() in ("1", "true", "on")
+
+
+def optimizer_prompt_mode() -> str:
+    # OPTIMIZER_PROMPT_MODE=diff: rewrite prompts send the anchor version
+    # as a sentence diff against the current draft (see prompts/optimizer.py)
+    return os.getenv("OPTIMIZER_PROMPT_MODE", "full").lower()
+
+
+def llm_provider() -> str:
+    # LLM_PROVIDER=fake swaps every client for the offline FakeChatModel
+    # (no API key, simulated latency/usage) for load tests and local runs;
+    # record / replay capture and serve LLM cassettes (models/cassette.py)
+    return os.getenv("LLM_PROVIDER", "openai").lower()
+
+
+def chat_model_class():
+    """
+    Imported on first use: langchain_openai + openai dominate import time.
+    """
+    if llm_provider() == "fake":
+        from models.fake import FakeChatModel
+        return FakeChatModel
+    if llm_provider() == "record":
+        from models.cassette import RecordingChatOpenAI
+        return RecordingChatOpenAI
+    if llm_provider() == "replay":
+        from models.cassette import ReplayChatOpenAI
+        return ReplayChatOpenAI
+
+    # All clients go through the gateway: shared connection pool,
+    # per-model rate limits, coalesced identical temperature-0 calls
+    from models.gateway import GatewayChatOpenAI
+    return GatewayChatOpenAI
+
+
+@lru_cache(maxsize=None)
+def get_llm(role: str):
+    return chat_model_class()(**MODEL_CONFIGS[role])
+
+
+intent_classifier_llm = LazyRunnable(lambda: get_llm("intent_classifier"), name="intent_classifier_llm")
+generator_llm = LazyRunnable(lambda: get_llm("generator"), name="generator_llm")
+evaluator_llm = LazyRunnable(lambda: get_llm("evaluator"), name="evaluator_llm")
+optimizer_llm = LazyRunnable(lambda: get_llm("optimizer"), name="optimizer_llm")
+change_summary_llm = LazyRunnable(lambda: get_llm("summarizer"), name="change_summary_llm")
+
+
+async def warm_up():
+    """
+    Start-up warm-up, run in the background (LLM_WARMUP=false disables):
+    builds every lazy client and structured runnable off the event loop,
+    then opens provider connections so the first request skips the
+    imports and the TCP/TLS handshake.
+    """
+    try:
+        await asyncio.to_thread(LazyRunnable.build_all)
+        if llm_provider() not in ("fake", "replay"):
+            from models.gateway import aprewarm_connections
+            await aprewarm_connections()
+    except Exception as e:
+        # Best effort: requests still build and connect on first use
+        logging.getLogger(__name__).warning("LLM warm-up failed: %s", e)
+
+
+def model_fingerprint() -> dict:
+    """
+    Model + temperature per agent role. Part of every cache key,
+    so swapping a model invalidates results it did not produce.
+    Read from config: computing a cache key never builds a client.
+    """
+    fingerprint = {
+        role: f"{config['model']}@{config['temperature']}"
+        for role, config in MODEL_CONFIGS.items()
+    }
+    fingerprint["optimizer_candidates"] = (
+        f"{MODEL_CONFIGS['optimizer']['model']}@{OPTIMIZER_CANDIDATE_TEMPERATURE}"
+    )
+    if fused_generation_enabled():
+        # The generator picks the intent instead of the classifier model
+        fingerprint["intent_classifier"] = f"fused:{fingerprint['generator']}"
+    if fused_revision_enabled():
+        # Revisions come from the evaluator model, in the review call
+        fingerprint["optimizer"] = f"fused:{fingerprint['evaluator']}"
+    if optimizer_prompt_mode() != "full":
+        # Rewrites (optimizer or fused reviser) see a different prompt
+        fingerprint["optimizer"] += f"|prompt:{optimizer_prompt_mode()}"
+
+    from graph.early_stop import predictor_version
+    fingerprint["early_stop"] = predictor_version()
+    return fingerprint
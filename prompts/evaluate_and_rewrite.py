@@ -0,0 +1,191 @@
+from pydantic import Field
+from graph.state import LinkedInPostState
+from models.llm_config import evaluator_llm, optimizer_prompt_mode
+from models.lazy import LazyRunnable
+from graph.costs import charge_cost
+from graph.guards import safe_llm_call, asafe_llm_call
+from prompts.evaluator import (
+    EVALUATOR_TEMPLATE,
+    LinkedInPostReview,
+    _apply_review,
+    _areused_review,
+    _astore_review,
+    _reused_review,
+    _store_review,
+)
+from prompts.optimizer import (
+    ANCHOR_DIFF_LEGEND,
+    PROOF_OF_WORK_SYSTEM,
+    TECH_THOUGHT_LEADERSHIP_SYSTEM,
+    compact_anchor,
+    optimize_linkedin_post,
+    aoptimize_linkedin_post,
+    previous_evaluated_draft,
+)
+from prompts.templates import PromptTemplate, intent_variant
+
+
+class ReviewAndRevision(LinkedInPostReview):
+    revised_draft: str = Field(
+        description="The post rewritten to improve only the focus areas; the unchanged post if no safe improvement exists"
+    )
+
+
+# One call per loop turn: the review the guards need, plus the next draft
+structured_reviser = LazyRunnable(
+    lambda: evaluator_llm.with_structured_output(ReviewAndRevision),
+    name="structured_reviser",
+)
+
+
+REWRITE_INSTRUCTIONS = (
+    "Then rewrite the post.\n\n"
+    "INSTRUCTIONS:\n"
+    "- Use your own review feedback as the brief.\n"
+    "- Improve ONLY the focus areas. Prefer no change over risky change.\n"
+    "- Do NOT add new claims, facts, or interpretations.\n"
+    "- Return LinkedIn-ready text in revised_draft."
+)
+
+# Starts with the evaluator's own prefix: both run on the evaluator model
+REVISER_TEMPLATE = PromptTemplate(
+    "reviser",
+    "2",
+    prefix=[
+        *EVALUATOR_TEMPLATE.prefix,
+        REWRITE_INSTRUCTIONS,
+        ("intent", {
+            "TECH_THOUGHT_LEADERSHIP": "When rewriting:\n" + TECH_THOUGHT_LEADERSHIP_SYSTEM,
+            "PROOF_OF_WORK": "When rewriting:\n" + PROOF_OF_WORK_SYSTEM,
+        }),
+    ],
+    suffix=(
+        EVALUATOR_TEMPLATE.suffix + "\n\n"
+        "Focus areas (the only dimensions allowed to improve):\n{focus}\n\n"
+        'Previous evaluated version (anchor — preserve its strengths):\n"""\n{previous_draft}\n"""'
+    ),
+)
+
+
+# OPTIMIZER_PROMPT_MODE=diff: the draft under review is already in the
+# prompt, the anchor (last iteration's draft) follows as a diff against it
+REVISER_DIFF_TEMPLATE = PromptTemplate(
+    "reviser_diff",
+    "1",
+    prefix=[*REVISER_TEMPLATE.prefix, ANCHOR_DIFF_LEGEND],
+    suffix=(
+        EVALUATOR_TEMPLATE.suffix + "\n\n"
+        "Focus areas (the only dimensions allowed to improve):\n{focus}\n\n"
+        "Previous evaluated version (anchor — preserve its strengths):\n{anchor}"
+    ),
+)
+
+
+def _build_messages(state: LinkedInPostState) -> list:
+    # Focus areas are picked from the first review's scores
+    focus = (
+        state["active_focus_factors"]
+        if state["iteration_count"]
+        else "the two lowest-scoring dimensions of your review"
+    )
+    variants = {"intent": intent_variant(state["intent"])}
+
+    if optimizer_prompt_mode() == "diff":
+        return REVISER_DIFF_TEMPLATE.render(
+            variants, draft_post=state["draft_post"], focus=focus, anchor=compact_anchor(state),
+        )
+    return REVISER_TEMPLATE.render(
+        variants,
+        draft_post=state["draft_post"],
+        focus=focus,
+        previous_draft=previous_evaluated_draft(state),
+    )
+
+
+def _review(response: ReviewAndRevision) -> LinkedInPostReview:
+    return LinkedInPostReview.model_validate(response.model_dump(exclude={"revised_draft"}))
+
+
+def _review_update(state: LinkedInPostState, review: LinkedInPostReview, response: ReviewAndRevision) -> dict:
+    return {**_apply_review(state, review), "proposed_revision": response.revised_draft}
+
+
+def _reused_update(state: LinkedInPostState, review, repeated_draft):
+    """
+    Draft already scored (this run or the evaluation cache): the guards
+    get the known review, and apply_revision asks the optimizer.
+    """
+    if review is None:
+        return None
+    return {**_apply_review(state, review, repeated_draft), "proposed_revision": None}
+
+
+# ---------- NODES ----------
+
+def evaluate_and_rewrite(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Fused loop mode: scores the current draft and proposes its revision
+    in one structured call. should_continue still decides on the scores;
+    the revision is only used if the loop continues.
+    """
+    def _evaluate(state):
+        state["run_metrics"]["iterations"] += 1
+        update = _reused_update(state, *_reused_review(state))
+        if update is not None:
+            return update
+
+        messages = _build_messages(state)
+        charge_cost(state, "reviser", messages)
+        response = structured_reviser.invoke(messages)
+        review = _review(response)
+        # Same evaluator prefix and model: later runs can reuse the scores
+        _store_review(state["draft_post"], state["intent"], review)
+        return _review_update(state, review, response)
+    return safe_llm_call(_evaluate, state, agent_name='reviser')
+
+
+async def aevaluate_and_rewrite(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of evaluate_and_rewrite (non-blocking LLM call).
+    """
+    async def _evaluate(state):
+        state["run_metrics"]["iterations"] += 1
+        update = _reused_update(state, *await _areused_review(state))
+        if update is not None:
+            return update
+
+        messages = _build_messages(state)
+        charge_cost(state, "reviser", messages)
+        response = await structured_reviser.ainvoke(messages)
+        review = _review(response)
+        await _astore_review(state["draft_post"], state["intent"], review)
+        return _review_update(state, review, response)
+    return await asafe_llm_call(_evaluate, state, agent_name='reviser')
+
+
+def apply_revision(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Advances to the revision proposed with the last review. Without one
+    (the review was reused), falls back to a regular optimizer call.
+    The fused call proposes one revision: requests for best-of-N
+    candidates are rejected in this mode (see PostRequest).
+    """
+    if not state.get("proposed_revision"):
+        return optimize_linkedin_post(state)
+
+    state["run_metrics"]["optimizer_runs"] += 1
+    return {
+        "draft_post": state["proposed_revision"],
+        "iteration_count": state["iteration_count"] + 1,
+        "proposed_revision": None,
+    }
+
+
+async def aapply_revision(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of apply_revision.
+    """
+    if not state.get("proposed_revision"):
+        return await aoptimize_linkedin_post(state)
+
+    return apply_revision(state)
@@ -1,11 +1,13 @@
 from pydantic import BaseModel, Field
 from typing import Literal, Dict, List
-from langchain_core.messages import SystemMessage, HumanMessage
-from graph.state import LinkedInPostState
-from models.llm_config import evaluator_llm
+from graph.state import LinkedInPostState, draft_id
+from models.llm_config import evaluator_llm, model_fingerprint
+from models.lazy import LazyRunnable
+from graph.cache import LazyCache, build_evaluation_cache, evaluation_cache_key
 from langsmith import traceable
 from graph.costs import charge_cost
-from graph.guards import safe_llm_call
+from graph.guards import safe_llm_call, asafe_llm_call
+from prompts.templates import PromptTemplate
 
 @traceable(name='iteration_focus_snapshot')
 def log_iteration_focus(snapshot: dict):
@@ -29,198 +31,352 @@ class LinkedInPostReview(BaseModel):
     review_feedback: str
 
 
-structured_evaluator = evaluator_llm.with_structured_output(
-    LinkedInPostReview)
+structured_evaluator = LazyRunnable(
+    lambda: evaluator_llm.with_structured_output(LinkedInPostReview),
+    name="structured_evaluator",
+)
+
+# Rules and rubric are static: only the post itself varies per request
+EVALUATOR_TEMPLATE = PromptTemplate(
+    "evaluator",
+    "2",
+    prefix=[
+        "You are a strict evaluator of LinkedIn posts written by senior AI engineers.\n\n"
+        "GENERAL RULES:\n"
+        "- Do NOT score formatting or bullet usage.\n"
+        "- Evaluate clarity, credibility, and density of claims.\n\n"
+        "PROOF_OF_WORK RULES:\n"
+        "- All user-provided metrics MUST appear verbatim.\n"
+        "- No inferred mechanisms allowed.\n"
+        "- Bounded interpretation is REQUIRED for high scores.\n\n"
+        "TECH THOUGHT LEADERSHIP RULES:\n"
+        "- Exactly five conceptual sections expected.\n"
+        "- No metrics allowed.\n",
+
+        "Score the post in the user message on the following dimensions (0–10 each):\n\n"
+        "1. Hook strength\n"
+        "2. Factual grounding\n"
+        "3. Cause → effect clarity\n"
+        "4. Interpretive judgment\n"
+        "5. Information density\n\n"
+        "Guidelines:\n"
+        "- Be strict and skeptical.\n"
+        "- Do NOT reward fluency alone.\n"
+        "- Penalize abstraction, redundancy, or vague claims.\n"
+        "- High scores should require exceptional clarity and sharpness.\n\n"
+        "Return ONLY the structured scores and feedback.",
+    ],
+    suffix='Review the LinkedIn post below.\n\nPost:\n"""\n{draft_post}\n"""',
+)
+
+# Cached reviews from an older rubric are never reused:
+# the id changes with the template text
+EVALUATOR_PROMPT_VERSION = EVALUATOR_TEMPLATE.version_id
+
+# Cross-run reviews keyed by (draft, intent, prompt version, model),
+# opened on first lookup
+evaluation_cache = LazyCache(build_evaluation_cache)
+
+
+def _build_messages(state: LinkedInPostState) -> list:
+    return EVALUATOR_TEMPLATE.render(draft_post=state["draft_post"])
+
+
+def _candidate_review(state: LinkedInPostState):
+    """
+    Review already produced by the best-of-N optimizer for this exact
+    draft (None otherwise), so the winning candidate is not scored twice.
+    """
+    review = state.get("candidate_review")
+    if not review or review.get("draft_id") != draft_id(state["draft_post"]):
+        return None
+    return LinkedInPostReview.model_validate(
+        {k: v for k, v in review.items() if k != "draft_id"}
+    )
 
 
-def evaluate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
-    def _evaluate(state):
-        intent = state["intent"]
-
-        messages = [
-            SystemMessage(
-                content=(
-                    "You are a strict evaluator of LinkedIn posts written by senior AI engineers.\n\n"
-                    "GENERAL RULES:\n"
-                    "- Do NOT score formatting or bullet usage.\n"
-                    "- Evaluate clarity, credibility, and density of claims.\n\n"
-                    "PROOF_OF_WORK RULES:\n"
-                    "- All user-provided metrics MUST appear verbatim.\n"
-                    "- No inferred mechanisms allowed.\n"
-                    "- Bounded interpretation is REQUIRED for high scores.\n\n"
-                    "TECH THOUGHT LEADERSHIP RULES:\n"
-                    "- Exactly five conceptual sections expected.\n"
-                    "- No metrics allowed.\n"
-                )
-            ),
-            HumanMessage(
-            content=f"""
-        Review the LinkedIn post below.
-
-        Post:
-        \"\"\"
-        {state["draft_post"]}
-        \"\"\"
-
-        Score the post on the following dimensions (0–10 each):
-
-        1. Hook strength
-        2. Factual grounding
-        3. Cause → effect clarity
-        4. Interpretive judgment
-        5. Information density
-
-        Guidelines:
-        - Be strict and skeptical.
-        - Do NOT reward fluency alone.
-        - Penalize abstraction, redundancy, or vague claims.
-        - High scores should require exceptional clarity and sharpness.
-
-        Return ONLY the structured scores and feedback.
-        """
+def _evaluation_key(draft_post: str, intent: str) -> str:
+    return evaluation_cache_key(
+        draft_post,
+        intent,
+        EVALUATOR_PROMPT_VERSION,
+        model_fingerprint()["evaluator"],
+    )
+
+
+def _store_review(draft_post: str, intent: str, review: LinkedInPostReview):
+    evaluation_cache.set(_evaluation_key(draft_post, intent), review.model_dump())
+
+
+async def _astore_review(draft_post: str, intent: str, review: LinkedInPostReview):
+    await evaluation_cache.aset(_evaluation_key(draft_post, intent), review.model_dump())
+
+
+def _history_match(state: LinkedInPostState):
+    """
+    (history entry, "unchanged" | "cyclic") when the current draft was
+    already scored in this run: "unchanged" = same as the last evaluated
+    draft, "cyclic" = an older one. (None, None) otherwise.
+    """
+    current_id = draft_id(state["draft_post"])
+    history = state.get("history") or []
+    for position, entry in enumerate(reversed(history)):
+        if (entry.get("draft_id") or draft_id(entry["draft_post"])) == current_id:
+            return entry, "unchanged" if position == 0 else "cyclic"
+    return None, None
+
+
+def _history_review(state: LinkedInPostState):
+    entry, repeated_draft = _history_match(state)
+    if entry is None:
+        return None, None
+    review = LinkedInPostReview(
+        review_decision="accept" if entry["total_score"] >= 40 else "revise",
+        total_score=entry["total_score"],
+        review_feedback=entry["review_feedback"],
+        **entry["scores"],
+    )
+    return review, repeated_draft
+
+
+def _known_review(state: LinkedInPostState):
+    """
+    Returns (review, repeated_draft) for a draft that was already scored:
+    earlier in this run (see _history_match) or in a previous run
+    (repeated_draft None). Returns (None, None) when the draft is new.
+    """
+    review, repeated_draft = _history_review(state)
+    if review is None:
+        cached = evaluation_cache.get(_evaluation_key(state["draft_post"], state["intent"]))
+        if cached is not None:
+            review = LinkedInPostReview.model_validate(cached)
+    return review, repeated_draft
+
+
+async def _aknown_review(state: LinkedInPostState):
+    """
+    Async variant of _known_review: the SQLite lookup runs off the event loop.
+    """
+    review, repeated_draft = _history_review(state)
+    if review is None:
+        cached = await evaluation_cache.aget(_evaluation_key(state["draft_post"], state["intent"]))
+        if cached is not None:
+            review = LinkedInPostReview.model_validate(cached)
+    return review, repeated_draft
+
+
+def _count_reuse(state: LinkedInPostState, review):
+    if review is not None:
+        state["run_metrics"]["evaluation_cache_hits"] = (
+            state["run_metrics"].get("evaluation_cache_hits", 0) + 1
         )
-        ,
-        ]
 
-        
-        state["run_metrics"]["iterations"] += 1
-        charge_cost(state, "evaluator")
-        response = structured_evaluator.invoke(messages)
-        if state['iteration_count'] == 0:
-            state['run_metrics']['initial_score'] = response.total_score
-
-        scores: Dict[str, int] = {
-            "hook_strength": response.hook_strength,
-            "factual_grounding": response.factual_grounding,
-            "causal_clarity": response.causal_clarity,
-            "interpretive_judgment": response.interpretive_judgment,
-            "density": response.density,
-        }
 
-        # ----------------------------
-        # Focus factor initialization
-        # ----------------------------
-        if not state["iteration_count"]:
-            frozen_focus_factors = sorted(scores, key=scores.get)[:2]
-            active_focus_factors = frozen_focus_factors.copy()
-        else:
-            frozen_focus_factors = state["frozen_focus_factors"]
-            active_focus_factors = state["active_focus_factors"].copy()
-        # ----------------------------
-        # Graduation logic (no replacement)
-        # ----------------------------
-        threshold = state["focus_graduation_threshold"]
-
-        active_focus_factors = [
-            factor for factor in active_focus_factors
-            if scores[factor] < threshold
-        ]
-
-        history_entry = {
+def _reused_review(state: LinkedInPostState):
+    """
+    Best-of-N review or previously seen draft; no LLM call needed.
+    A handed-over review still reports a repeated draft, so the
+    Unchanged_Draft / Cyclic_Draft stops apply in best-of-N mode too.
+    """
+    review = _candidate_review(state)
+    if review is not None:
+        return review, _history_match(state)[1]
+
+    review, repeated_draft = _known_review(state)
+    _count_reuse(state, review)
+    return review, repeated_draft
+
+
+async def _areused_review(state: LinkedInPostState):
+    """
+    Async variant of _reused_review.
+    """
+    review = _candidate_review(state)
+    if review is not None:
+        return review, _history_match(state)[1]
+
+    review, repeated_draft = await _aknown_review(state)
+    _count_reuse(state, review)
+    return review, repeated_draft
+
+
+def _apply_review(state: LinkedInPostState, response: LinkedInPostReview, repeated_draft=None) -> dict:
+    """
+    Turns a structured review into the evaluator's state update
+    (focus control, trajectory logging, best-iteration tracking).
+    """
+    if state['iteration_count'] == 0:
+        state['run_metrics']['initial_score'] = response.total_score
+
+    scores: Dict[str, int] = {
+        "hook_strength": response.hook_strength,
+        "factual_grounding": response.factual_grounding,
+        "causal_clarity": response.causal_clarity,
+        "interpretive_judgment": response.interpretive_judgment,
+        "density": response.density,
+    }
+
+    # ----------------------------
+    # Focus factor initialization
+    # ----------------------------
+    if not state["iteration_count"]:
+        frozen_focus_factors = sorted(scores, key=scores.get)[:2]
+        active_focus_factors = frozen_focus_factors.copy()
+    else:
+        frozen_focus_factors = state["frozen_focus_factors"]
+        active_focus_factors = state["active_focus_factors"].copy()
+    # ----------------------------
+    # Graduation logic (no replacement)
+    # ----------------------------
+    threshold = state["focus_graduation_threshold"]
+
+    active_focus_factors = [
+        factor for factor in active_focus_factors
+        if scores[factor] < threshold
+    ]
+
+    current_id = draft_id(state["draft_post"])
+
+    history_entry = {
+    "iteration": state["iteration_count"],
+    "draft_id": current_id,
+    "scores": scores,
+    "total_score": response.total_score,
+    "review_feedback": response.review_feedback,
+    }
+
+    # ----------------------------
+    # Trajectory logging
+    # ----------------------------
+    iteration_focus_history = [{
         "iteration": state["iteration_count"],
-        "draft_post": state["draft_post"],
-        "scores": scores,
-        "total_score": response.total_score,
-        "review_feedback": response.review_feedback,
+        "frozen_focus_factors": frozen_focus_factors,
+        "active_focus_factors": active_focus_factors,
+        "scores": {k: scores[k] for k in frozen_focus_factors},
+        "intent": state["intent"],
+        "communication_style": state["communication_style"],
+    }]
+
+    total_score = response.total_score
+
+    if state["iteration_count"] == 0:
+        log_iteration_focus({
+            "iteration": 0,
+            "total_score": total_score,
+            "scores": scores,
+            "frozen_focus_factors": frozen_focus_factors,
+            "active_focus_factors": active_focus_factors,
+            "intent": state["intent"],
+            "communication_style": state["communication_style"],
+        })
+    else:
+        total_score_delta = {
+            k: scores[k] - state["history"][-1]["scores"][k]
+            for k in scores
+            if k not in frozen_focus_factors
         }
 
-        # ----------------------------
-        # Trajectory logging
-        # ----------------------------
-        iteration_focus_history = [{
+        best = state.get("best_iteration")
+        best_delta = (
+            total_score - best["quality_score"] if best else None
+        )
+
+        best_focus_scores =  {k: best["scores"][k] for k in frozen_focus_factors if best}
+        best_iteration_index = (
+        best["iteration_count"] if best else None
+        )
+
+
+        log_iteration_focus({
             "iteration": state["iteration_count"],
+            "best_iteration_index": best_iteration_index,
             "frozen_focus_factors": frozen_focus_factors,
             "active_focus_factors": active_focus_factors,
-            "scores": {k: scores[k] for k in frozen_focus_factors},
+            "best_focus_scores" : best_focus_scores if best_focus_scores else None,
+            "focus_scores": {k: scores[k] for k in frozen_focus_factors},
+            "focus_score_delta": {
+                k: scores[k] - state["iteration_focus_history"][-1]["scores"][k]
+                for k in frozen_focus_factors
+            },
+            "total_score": total_score,
+            "total_score_delta": total_score_delta,
+            "best_score_delta": best_delta,
             "intent": state["intent"],
             "communication_style": state["communication_style"],
-        }]
-
-        total_score = response.total_score
-
-        if state["iteration_count"] == 0:
-            log_iteration_focus({
-                "iteration": 0,
-                "total_score": total_score,
-                "scores": scores,
-                "frozen_focus_factors": frozen_focus_factors,
-                "active_focus_factors": active_focus_factors,
-                "intent": state["intent"],
-                "communication_style": state["communication_style"],
-            })
-        else:
-            total_score_delta = {
-                k: scores[k] - state["history"][-1]["scores"][k]
-                for k in scores
-                if k not in frozen_focus_factors
-            }
-
-            best = state.get("best_iteration")
-            best_delta = (
-                total_score - best["quality_score"] if best else None
-            )
-
-            best_focus_scores =  {k: best["scores"][k] for k in frozen_focus_factors if best}
-            best_iteration_index = (
-            best["iteration_count"] if best else None
-            )
-
-
-            log_iteration_focus({
-                "iteration": state["iteration_count"],
-                "best_iteration_index": best_iteration_index,
-                "frozen_focus_factors": frozen_focus_factors,
-                "active_focus_factors": active_focus_factors,
-                "best_focus_scores" : best_focus_scores if best_focus_scores else None,
-                "focus_scores": {k: scores[k] for k in frozen_focus_factors},
-                "focus_score_delta": {
-                    k: scores[k] - state["iteration_focus_history"][-1]["scores"][k]
-                    for k in frozen_focus_factors
-                },
-                "total_score": total_score,
-                "total_score_delta": total_score_delta,
-                "best_score_delta": best_delta,
-                "intent": state["intent"],
-                "communication_style": state["communication_style"],
-            })
-
-
-        # Logging best iteration scores
-        current_iteration_snapshot = {
-        "draft_post": state["draft_post"],
-        "quality_score": response.total_score,
+        })
+
+
+    # Logging best iteration scores
+    current_iteration_snapshot = {
+    "draft_id": current_id,
+    "quality_score": response.total_score,
+    "review_feedback": response.review_feedback,
+    "scores": scores,
+    "iteration_count": state["iteration_count"],
+    "active_focus_factors": active_focus_factors.copy(),
+    "frozen_focus_factors": frozen_focus_factors.copy(),
+    }
+
+    best_iteration = state.get("best_iteration")
+    if (best_iteration is None or response.total_score > best_iteration['quality_score']):
+        best_iteration = current_iteration_snapshot
+
+
+    return {
         "review_feedback": response.review_feedback,
+        "review_feedback_history": [response.review_feedback],
+        "quality_score": response.total_score,
         "scores": scores,
-        "iteration_count": state["iteration_count"],
-        "active_focus_factors": active_focus_factors.copy(),
-        "frozen_focus_factors": frozen_focus_factors.copy(),
-        }
 
-        best_iteration = state.get("best_iteration")
-        if (best_iteration is None or response.total_score > best_iteration['quality_score']):
-            best_iteration = current_iteration_snapshot
+        # Focus control
+        "frozen_focus_factors": frozen_focus_factors,
+        "active_focus_factors": active_focus_factors,
 
+        # Trajectory
+        "iteration_focus_history": iteration_focus_history,
 
-        return {
-            "review_feedback": response.review_feedback,
-            "review_feedback_history": [response.review_feedback],
-            "quality_score": response.total_score,
-            "scores": scores,
+        # Appended by the history reducer; the draft text is stored once
+        "history": [history_entry],
+        "drafts": {current_id: state["draft_post"]},
 
-            # Focus control
-            "frozen_focus_factors": frozen_focus_factors,
-            "active_focus_factors": active_focus_factors,
+        # Best Iteration
+        'best_iteration': best_iteration,
 
-            # Trajectory
-            "iteration_focus_history": iteration_focus_history,
+        # Consumed (or stale) best-of-N review
+        "candidate_review": None,
 
-            # Pass-through
-            "history": state.get("history", []) + [history_entry],
+        # Draft already scored in this run: lets should_continue stop
+        "repeated_draft": repeated_draft,
+    }
 
-            # Best Iteration
-            'best_iteration': best_iteration
-        }
+
+def evaluate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    def _evaluate(state):
+        state["run_metrics"]["iterations"] += 1
+        response, repeated_draft = _reused_review(state)
+        if response is None:
+            messages = _build_messages(state)
+            charge_cost(state, "evaluator", messages)
+            response = structured_evaluator.invoke(messages)
+            _store_review(state["draft_post"], state["intent"], response)
+        return _apply_review(state, response, repeated_draft)
     result = safe_llm_call(_evaluate,state,agent_name='evaluator')
     if '__fail_soft__'  in result:
         return result
     return result
+
+
+async def aevaluate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of evaluate_linkedin_post (non-blocking LLM call).
+    """
+    async def _evaluate(state):
+        state["run_metrics"]["iterations"] += 1
+        response, repeated_draft = await _areused_review(state)
+        if response is None:
+            messages = _build_messages(state)
+            charge_cost(state, "evaluator", messages)
+            response = await structured_evaluator.ainvoke(messages)
+            await _astore_review(state["draft_post"], state["intent"], response)
+        return _apply_review(state, response, repeated_draft)
+    return await asafe_llm_call(_evaluate, state, agent_name='evaluator')
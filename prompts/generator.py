@@ -1,8 +1,17 @@
-from langchain_core.messages import SystemMessage, HumanMessage
+from typing import Literal
+from pydantic import BaseModel, Field
 from graph.state import LinkedInPostState
 from models.llm_config import generator_llm
-from graph.guards import safe_llm_call
+from models.lazy import LazyRunnable
+from graph.guards import safe_llm_call, asafe_llm_call
 from graph.costs import charge_cost
+from graph.events import astream_llm_text
+from prompts.templates import PromptTemplate, intent_variant
+from prompts.intent_classifier import (
+    INTENT_FAST_PATH_THRESHOLD,
+    classify_intent_locally,
+    record_fast_path,
+)
 
 
 # ---------- INTENT RULES ----------
@@ -50,41 +59,164 @@ STYLE_PROMPTS = {
 }
 
 
-def generate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
-    def _generate(state):
-        intent = state["intent"]
-        style = state["communication_style"]
+GENERATION_INSTRUCTIONS = (
+    "Write a LinkedIn post based ONLY on the information in the user message.\n\n"
+    "IMPORTANT:\n"
+    "- For PROOF_OF_WORK: focus on claims, not formatting.\n"
+    "- For TECH_THOUGHT_LEADERSHIP: use clear structured sections.\n"
+    "- Plain text only.\n"
+    "- Reference posts, when given, show density and reasoning style ONLY.\n"
+    "  Never reuse their facts, metrics, or wording.\n"
+)
 
-        intent_prompt = (
-            TECH_THOUGHT_LEADERSHIP_SYSTEM
-            if intent == "TECH_THOUGHT_LEADERSHIP"
-            else PROOF_OF_WORK_SYSTEM
-        )
+# Shared instructions first, then intent rules, then style:
+# the prefix common to the most requests comes first
+GENERATOR_TEMPLATE = PromptTemplate(
+    "generator",
+    "2",
+    prefix=[
+        GENERATION_INSTRUCTIONS,
+        ("intent", {
+            "TECH_THOUGHT_LEADERSHIP": TECH_THOUGHT_LEADERSHIP_SYSTEM,
+            "PROOF_OF_WORK": PROOF_OF_WORK_SYSTEM,
+        }),
+        ("communication_style", STYLE_PROMPTS),
+    ],
+    suffix="Topic:\n{topic}\n{references}",
+)
 
-        style_prompt = STYLE_PROMPTS[style]
 
-        messages = [
-            SystemMessage(content=intent_prompt),
-            SystemMessage(content=style_prompt),
-            HumanMessage(
-                content=f"""
-    Write a LinkedIn post based ONLY on the information below.
+def _reference_block(state: LinkedInPostState) -> str:
+    """
+    Retrieved exemplars (already cut to the token budget), after the
+    topic so they shape style and density without becoming facts.
+    """
+    references = state.get("references") or []
+    if not references:
+        return ""
+    return "\nReference posts:\n" + "\n---\n".join(reference.strip() for reference in references) + "\n"
 
-    Topic:
-    {state["topic"]}
 
-    IMPORTANT:
-    - For PROOF_OF_WORK: focus on claims, not formatting.
-    - For TECH_THOUGHT_LEADERSHIP: use clear structured sections.
-    - Plain text only.
-    """
-            ),
-        ]
+def _build_messages(state: LinkedInPostState) -> list:
+    return GENERATOR_TEMPLATE.render(
+        {"intent": intent_variant(state["intent"]), "communication_style": state["communication_style"]},
+        topic=state["topic"],
+        references=_reference_block(state),
+    )
 
-        charge_cost(state, 'generator')
+
+def generate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    def _generate(state):
+        messages = _build_messages(state)
+
+        charge_cost(state, 'generator', messages)
         response = generator_llm.invoke(messages).content
         return {"draft_post": response}
     result = safe_llm_call(_generate,state,agent_name='generator')
     if '__fail_soft__' in result:
         return result
     return result
+
+
+async def agenerate_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of generate_linkedin_post (non-blocking, token-streamed).
+    """
+    async def _generate(state):
+        messages = _build_messages(state)
+
+        charge_cost(state, 'generator', messages)
+        # Streamed so clients see tokens long before the draft completes
+        response = await astream_llm_text(
+            generator_llm, messages, node="generator", iteration=0
+        )
+        return {"draft_post": response}
+    return await asafe_llm_call(_generate, state, agent_name='generator')
+
+
+# ---------- FUSED CLASSIFY + GENERATE ----------
+
+class FusedDraftOutput(BaseModel):
+    prompt_intent: Literal[
+        "TECH_THOUGHT_LEADERSHIP",
+        "PROOF_OF_WORK"
+    ] = Field(description="The intent of the LinkedIn post idea")
+    draft_post: str = Field(description="The LinkedIn post, written under the rules of that intent")
+
+
+structured_fused_generator = LazyRunnable(
+    lambda: generator_llm.with_structured_output(FusedDraftOutput),
+    name="structured_fused_generator",
+)
+
+FUSED_INTENT_SYSTEM = (
+    "First classify the post idea into exactly ONE intent, then write the post\n"
+    "following ONLY the rules of that intent.\n\n"
+    "TECH_THOUGHT_LEADERSHIP: system-level insights; opinions, tradeoffs, failure modes;\n"
+    "generalized lessons beyond one build.\n"
+    "Rules:\n" + TECH_THOUGHT_LEADERSHIP_SYSTEM + "\n"
+    "PROOF_OF_WORK: something was built, tested, or implemented; mentions experiments,\n"
+    "repositories, results, or learnings; concrete execution and outcomes.\n"
+    "Rules:\n" + PROOF_OF_WORK_SYSTEM
+)
+
+
+FUSED_GENERATOR_TEMPLATE = PromptTemplate(
+    "fused_generator",
+    "2",
+    prefix=[
+        GENERATION_INSTRUCTIONS + "Return the chosen intent and the post as structured output.\n",
+        FUSED_INTENT_SYSTEM,
+        ("communication_style", STYLE_PROMPTS),
+    ],
+    suffix=GENERATOR_TEMPLATE.suffix,
+)
+
+
+def _build_fused_messages(state: LinkedInPostState) -> list:
+    return FUSED_GENERATOR_TEMPLATE.render(
+        {"communication_style": state["communication_style"]},
+        topic=state["topic"],
+        references=_reference_block(state),
+    )
+
+
+def classify_and_generate(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Fused mode: one structured generator call returns the intent and the
+    draft written under that intent's rules, instead of classifying first.
+    A confident local classification generates directly, as usual.
+    """
+    intent, confidence = classify_intent_locally(state["topic"])
+    if intent is not None and confidence >= INTENT_FAST_PATH_THRESHOLD:
+        record_fast_path(state, True, confidence)
+        return {"intent": intent, **generate_linkedin_post({**state, "intent": intent})}
+
+    def _generate(state):
+        messages = _build_fused_messages(state)
+
+        charge_cost(state, 'generator', messages)
+        result: FusedDraftOutput = structured_fused_generator.invoke(messages)
+        record_fast_path(state, False, confidence)
+        return {"intent": result.prompt_intent, "draft_post": result.draft_post}
+    return safe_llm_call(_generate, state, agent_name='generator')
+
+
+async def aclassify_and_generate(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of classify_and_generate. The fast path still streams
+    tokens; the fused structured call returns the draft in one piece.
+    """
+    intent, confidence = classify_intent_locally(state["topic"])
+    if intent is not None and confidence >= INTENT_FAST_PATH_THRESHOLD:
+        record_fast_path(state, True, confidence)
+        return {"intent": intent, **await agenerate_linkedin_post({**state, "intent": intent})}
+
+    async def _generate(state):
+        messages = _build_fused_messages(state)
+
+        charge_cost(state, 'generator', messages)
+        result: FusedDraftOutput = await structured_fused_generator.ainvoke(messages)
+        record_fast_path(state, False, confidence)
+        return {"intent": result.prompt_intent, "draft_post": result.draft_post}
+    return await asafe_llm_call(_generate, state, agent_name='generator')
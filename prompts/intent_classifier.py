@@ -1,8 +1,13 @@
-from typing import Literal
+import os
+import re
+import threading
+from typing import Literal, Optional, Tuple
 from graph.costs import charge_cost
 from pydantic import BaseModel, Field
 from models.llm_config import intent_classifier_llm
+from models.lazy import LazyRunnable
 from graph.state import LinkedInPostState
+from prompts.templates import PromptTemplate
 
 
 class IntentOutput(BaseModel):
@@ -12,41 +17,144 @@ class IntentOutput(BaseModel):
     ] = Field(description="The intent of the LinkedIn post idea")
 
 
+# Built once, on first use; rebuilding per call re-derives the tool schema every request
+structured_intent_llm = LazyRunnable(
+    lambda: intent_classifier_llm.with_structured_output(IntentOutput),
+    name="structured_intent_llm",
+)
+
+
+# ---------- LOCAL PRE-CLASSIFIER ----------
+
+# (compiled pattern, weight) — each pattern counts at most once per topic
+PROOF_OF_WORK_FEATURES = [
+    # Metrics with units: "40%", "3x", "120ms", "2.5 hours", "10k tokens"
+    (re.compile(r"\d+(?:\.\d+)?\s*(?:%|x\b|ms\b|s\b|sec|seconds?|minutes?|hours?|k\b|m\b|gb\b|mb\b|tokens?|qps|rps|users?)", re.I), 2.0),
+    # Measured change: "reduced latency by", "cut costs from"
+    (re.compile(r"\b(?:reduced|cut|improved|increased|decreased|dropped|boosted|lowered|sped up|saved)\b[^.\n]{0,40}?\b(?:by|from|to)\b", re.I), 2.0),
+    # First-person execution: "I built", "we shipped"
+    (re.compile(r"\b(?:i|we)\s+(?:just\s+)?(?:built|shipped|implemented|deployed|created|developed|launched|migrated|benchmarked|tested|trained|open-sourced)\b", re.I), 2.0),
+    # Execution verbs without a subject
+    (re.compile(r"\b(?:built|shipped|implemented|deployed|benchmarked|prototyped)\b", re.I), 1.0),
+    # Repository / artifact links
+    (re.compile(r"github\.com|gitlab\.com|huggingface\.co|\brepo(?:sitory)?\b", re.I), 1.5),
+    # Any number at all
+    (re.compile(r"\d"), 0.5),
+]
+
+TECH_THOUGHT_LEADERSHIP_FEATURES = [
+    # Opinion / argument framing
+    (re.compile(r"\b(?:why|should(?:n't)?|myths?|opinion|i think|i believe|hot take|unpopular|overrated|underrated|is dead|the future of)\b", re.I), 1.5),
+    # Lessons and tradeoffs
+    (re.compile(r"\b(?:lessons?|trade-?offs?|failure modes?|pitfalls?|anti-?patterns?|principles?|mistakes?)\b", re.I), 1.5),
+    # Generalization over teams/systems
+    (re.compile(r"\b(?:teams|engineers|companies|organizations|most systems|ai systems)\s+(?:often|usually|tend|fail|need|keep|still)\b", re.I), 2.0),
+    # Comparative claims
+    (re.compile(r"\bmatters? more than\b|\bover-?invest|\bunder-?invest|\binstead of\b", re.I), 1.0),
+]
+
+# Below this confidence the LLM decides (set > 1.0 to always use the LLM)
+INTENT_FAST_PATH_THRESHOLD = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.8"))
+
+_fast_path_lock = threading.Lock()
+_fast_path_stats = {"hits": 0, "total": 0}
+
+
+def _feature_score(features, topic: str) -> float:
+    return sum(weight for pattern, weight in features if pattern.search(topic))
+
+
+def classify_intent_locally(topic: str) -> Tuple[Optional[str], float]:
+    """
+    Deterministic feature-scored classifier.
+    Returns (intent, confidence); intent is None when no signal fires.
+    Confidence grows with the score margin between the two intents.
+    """
+    proof = _feature_score(PROOF_OF_WORK_FEATURES, topic)
+    leadership = _feature_score(TECH_THOUGHT_LEADERSHIP_FEATURES, topic)
+
+    if proof == leadership:
+        return None, 0.0
+
+    intent = "PROOF_OF_WORK" if proof > leadership else "TECH_THOUGHT_LEADERSHIP"
+    margin = abs(proof - leadership)
+    confidence = 1.0 - 0.5 ** (margin / 1.25)
+
+    return intent, round(confidence, 4)
+
+
+def record_fast_path(state: LinkedInPostState, hit: bool, confidence: float):
+    with _fast_path_lock:
+        _fast_path_stats["total"] += 1
+        _fast_path_stats["hits"] += int(hit)
+        hit_rate = _fast_path_stats["hits"] / _fast_path_stats["total"]
+
+    state["run_metrics"]["intent_fast_path"] = hit
+    state["run_metrics"]["intent_confidence"] = confidence
+    # Process-wide share of requests that skipped the LLM
+    state["run_metrics"]["intent_fast_path_hit_rate"] = round(hit_rate, 4)
+
+
+INTENT_TEMPLATE = PromptTemplate(
+    "intent_classifier",
+    "2",
+    prefix=[
+        "You are classifying a LinkedIn post idea.\n\n"
+        "Choose exactly ONE intent from the following options:\n\n"
+        "1. TECH_THOUGHT_LEADERSHIP\n"
+        "  - System-level insights\n"
+        "  - Opinions, tradeoffs, failure modes\n"
+        "  - Generalized lessons beyond one build\n\n"
+        "2. PROOF_OF_WORK\n"
+        "  - Something was built, tested, or implemented\n"
+        "  - Mentions experiments, repositories, results, or learnings\n"
+        "  - Concrete execution and outcomes\n\n"
+        "Return only the structured output."
+    ],
+    suffix='Post idea:\n"""\n{topic}\n"""',
+)
+
+
+def _build_prompt(state: LinkedInPostState) -> list:
+    return INTENT_TEMPLATE.render(topic=state["topic"])
+
+
 def intent_classifier(state: LinkedInPostState) -> LinkedInPostState:
     """
     Classifies the intent of the LinkedIn post idea
     and stores it in the agent state.
+    Uses the local classifier when confident, otherwise the LLM.
     """
 
-    structured_llm = intent_classifier_llm.with_structured_output(IntentOutput)
+    intent, confidence = classify_intent_locally(state["topic"])
+    if intent is not None and confidence >= INTENT_FAST_PATH_THRESHOLD:
+        record_fast_path(state, True, confidence)
+        return {"intent": intent}
 
-    prompt = f"""
-    You are classifying a LinkedIn post idea.
+    prompt = _build_prompt(state)
+    
+    charge_cost(state, "intent_classifier", prompt)
+    result: IntentOutput = structured_intent_llm.invoke(prompt)
+    record_fast_path(state, False, confidence)
 
-    Choose exactly ONE intent from the following options:
+    # Delta only: run_metrics is updated in place
+    return {"intent": result.prompt_intent}
 
-    1. TECH_THOUGHT_LEADERSHIP
-      - System-level insights
-      - Opinions, tradeoffs, failure modes
-      - Generalized lessons beyond one build
 
-    2. PROOF_OF_WORK
-      - Something was built, tested, or implemented
-      - Mentions experiments, repositories, results, or learnings
-      - Concrete execution and outcomes
+async def aintent_classifier(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of intent_classifier (non-blocking LLM call).
+    """
 
-    Post idea:
-    \"\"\"
-    {state["topic"]}
-    \"\"\"
+    intent, confidence = classify_intent_locally(state["topic"])
+    if intent is not None and confidence >= INTENT_FAST_PATH_THRESHOLD:
+        record_fast_path(state, True, confidence)
+        return {"intent": intent}
 
-    Return only the structured output.
-    """
-    
-    charge_cost(state, "intent_classifier")
-    result: IntentOutput = structured_llm.invoke(prompt)
+    prompt = _build_prompt(state)
 
-    # Update state immutably
-    state["intent"] = result.prompt_intent
+    charge_cost(state, "intent_classifier", prompt)
+    result: IntentOutput = await structured_intent_llm.ainvoke(prompt)
+    record_fast_path(state, False, confidence)
 
-    return state
+    return {"intent": result.prompt_intent}
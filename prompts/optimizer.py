@@ -1,8 +1,21 @@
-from langchain_core.messages import SystemMessage, HumanMessage
-from graph.state import LinkedInPostState
-from models.llm_config import optimizer_llm
-from graph.costs import charge_cost, ESTIMATED_TOKEN_COSTS
-from graph.guards import safe_llm_call
+import asyncio
+import difflib
+import re
+from langchain_core.runnables import RunnableParallel
+from graph.state import LinkedInPostState, draft_id, get_draft
+from models.llm_config import optimizer_llm, OPTIMIZER_CANDIDATE_TEMPERATURE, optimizer_prompt_mode
+from prompts.evaluator import (
+    structured_evaluator,
+    _build_messages as _build_evaluation_messages,
+    _aknown_review,
+    _astore_review,
+    _known_review,
+    _store_review,
+)
+from graph.costs import charge_cost, can_afford, estimate_call_tokens, count_text_tokens
+from graph.guards import safe_llm_call, asafe_llm_call
+from graph.events import astream_llm_text
+from prompts.templates import PromptTemplate, intent_variant
 
 
 PROOF_OF_WORK_SYSTEM = (
@@ -22,69 +35,255 @@ TECH_THOUGHT_LEADERSHIP_SYSTEM = (
 )
 
 
-def optimize_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
-    def _optimize(state):
-        intent = state["intent"]
-        active_focus_factors = state.get("active_focus_factors", [])
-
-        # Anchor to the last evaluated draft (signal-preserving anchor)
-        previous_draft = None
-        if state.get("history"):
-            previous_draft = state["history"][-1]["draft_post"]
-
-        system_prompt = (
-            TECH_THOUGHT_LEADERSHIP_SYSTEM
-            if intent == "TECH_THOUGHT_LEADERSHIP"
-            else PROOF_OF_WORK_SYSTEM
+REFINEMENT_INSTRUCTIONS = (
+    "You are refining a LinkedIn post through controlled iteration.\n\n"
+    "IMPORTANT:\n"
+    "- The previous version contains textual signals that resulted in higher evaluation scores.\n"
+    "- Those signals MUST be preserved.\n"
+    "- Prefer no change over risky change.\n\n"
+    "INSTRUCTIONS:\n"
+    "- Improve ONLY the active focus areas.\n"
+    "- Do NOT weaken or abstract content present in the previous evaluated version.\n"
+    "- Reduce abstraction by making reasoning and evidence more explicit, not by compressing or implying it.\n"
+    "- Increase density only by removing repetition, not by collapsing explanations.\n"
+    "- If uncertain whether a change improves evaluation, leave the text unchanged.\n"
+    "- Do NOT add new claims, facts, or interpretations.\n\n"
+    "Return LinkedIn-ready text only."
+)
+
+# Focus areas, feedback and drafts change every iteration: suffix only
+OPTIMIZER_TEMPLATE = PromptTemplate(
+    "optimizer",
+    "2",
+    prefix=[
+        REFINEMENT_INSTRUCTIONS,
+        ("intent", {
+            "TECH_THOUGHT_LEADERSHIP": TECH_THOUGHT_LEADERSHIP_SYSTEM,
+            "PROOF_OF_WORK": PROOF_OF_WORK_SYSTEM,
+        }),
+    ],
+    suffix=(
+        "Active focus areas (allowed to improve):\n{focus}\n\n"
+        "Evaluator feedback:\n{feedback}\n\n"
+        'Previous evaluated version (anchor — preserve its strengths):\n"""\n{previous_draft}\n"""\n\n'
+        'Current draft to revise:\n"""\n{draft_post}\n"""'
+    ),
+)
+
+
+def previous_evaluated_draft(state: LinkedInPostState) -> str:
+    # Anchor to the last evaluated draft (signal-preserving anchor)
+    if state.get("history"):
+        return get_draft(state, state["history"][-1])
+    return "N/A (first iteration)"
+
+
+# ---------- DIFF PROMPT MODE ----------
+
+# The anchor is usually the draft being revised (the evaluator has just
+# scored it) or differs from it by a few sentences: send the draft once
+# and the anchor as a sentence diff against it.
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+ANCHOR_DIFF_LEGEND = (
+    "The previous evaluated version is given as a sentence diff against the current draft: "
+    "\"= (N unchanged)\" = N shared sentences, \"- \" = only in the previous version, "
+    "\"+ \" = only in the current draft."
+)
+
+OPTIMIZER_DIFF_TEMPLATE = PromptTemplate(
+    "optimizer_diff",
+    "1",
+    prefix=[*OPTIMIZER_TEMPLATE.prefix, ANCHOR_DIFF_LEGEND],
+    suffix=(
+        "Active focus areas (allowed to improve):\n{focus}\n\n"
+        "Evaluator feedback:\n{feedback}\n\n"
+        'Current draft to revise:\n"""\n{draft_post}\n"""\n\n'
+        "Previous evaluated version (anchor — preserve its strengths):\n{anchor}"
+    ),
+)
+
+
+def split_sentences(text: str) -> list:
+    return [
+        sentence
+        for line in text.splitlines()
+        for sentence in SENTENCE_BOUNDARY.split(line.strip())
+        if sentence
+    ]
+
+
+def anchor_diff(anchor: str, current: str) -> str:
+    """
+    The anchor as a sentence diff against the current draft; quoted
+    in full instead when the diff would not be shorter (a rewrite).
+    """
+    old, new = split_sentences(anchor), split_sentences(current)
+    if old == new:
+        return "Identical to the current draft."
+
+    lines = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(a=old, b=new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            lines.append(f"= ({i2 - i1} unchanged)")
+            continue
+        lines.extend(f"- {sentence}" for sentence in old[i1:i2])
+        lines.extend(f"+ {sentence}" for sentence in new[j1:j2])
+
+    diff = "\n".join(lines)
+    quoted = f'"""\n{anchor}\n"""'
+    return diff if count_text_tokens(diff) < count_text_tokens(quoted) else quoted
+
+
+def compact_anchor(state: LinkedInPostState) -> str:
+    if not state.get("history"):
+        return "N/A (first iteration)"
+    return anchor_diff(get_draft(state, state["history"][-1]), state["draft_post"])
+
+
+def _build_messages(state: LinkedInPostState) -> list:
+    variants = {"intent": intent_variant(state["intent"])}
+    values = {
+        "focus": state.get("active_focus_factors", []),
+        "feedback": state["review_feedback"],
+        "draft_post": state["draft_post"],
+    }
+    if optimizer_prompt_mode() == "diff":
+        return OPTIMIZER_DIFF_TEMPLATE.render(variants, anchor=compact_anchor(state), **values)
+    return OPTIMIZER_TEMPLATE.render(variants, previous_draft=previous_evaluated_draft(state), **values)
+
+
+# ---------- BEST-OF-N CANDIDATES ----------
+
+def _affordable_candidates(state: LinkedInPostState, messages: list) -> int:
+    """
+    Requested candidate count, capped by what the token budget
+    can pay for (each candidate costs one rewrite + one evaluation).
+    """
+    requested = state.get("optimizer_candidates", 1) or 1
+    if requested == 1:
+        return 1
+
+    per_candidate = (
+        estimate_call_tokens(state, "optimizer", messages)
+        + estimate_call_tokens(state, "evaluator", _build_evaluation_messages(state))
+    )
+    return max(1, min(requested, state["run_metrics"]["token_budget_remaining"] // per_candidate))
+
+
+def _candidate_generators(n: int) -> RunnableParallel:
+    """
+    Candidate 0 keeps the conservative optimizer temperature
+    ("prefer no change"); the others sample more freely.
+    """
+    return RunnableParallel({
+        f"candidate_{i}": (
+            optimizer_llm if i == 0
+            else optimizer_llm.bind(temperature=OPTIMIZER_CANDIDATE_TEMPERATURE)
         )
+        for i in range(n)
+    })
+
+
+def _unique_drafts(outputs: dict) -> list:
+    # Identical rewrites are common at low temperature: score each once
+    return list(dict.fromkeys(message.content for message in outputs.values()))
+
 
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(
-                content=f"""
-    You are refining a LinkedIn post through controlled iteration.
-
-    IMPORTANT:
-    - The previous version contains textual signals that resulted in higher evaluation scores.
-    - Those signals MUST be preserved.
-    - Prefer no change over risky change.
-
-    Active focus areas (allowed to improve):
-    {active_focus_factors}
-
-    Evaluator feedback:
-    {state["review_feedback"]}
-
-    Previous evaluated version (anchor — preserve its strengths):
-    \"\"\"
-    {previous_draft if previous_draft else "N/A (first iteration)"}
-    \"\"\"
-
-    Current draft to revise:
-    \"\"\"
-    {state["draft_post"]}
-    \"\"\"
-
-    INSTRUCTIONS:
-    - Improve ONLY the active focus areas.
-    - Do NOT weaken or abstract content present in the previous evaluated version.
-    - Reduce abstraction by making reasoning and evidence more explicit, not by compressing or implying it.
-    - Increase density only by removing repetition, not by collapsing explanations.
-    - If uncertain whether a change improves evaluation, leave the text unchanged.
-    - Do NOT add new claims, facts, or interpretations.
-
-    Return LinkedIn-ready text only.
+def _known_reviews(state: LinkedInPostState, drafts: list, reviews: list) -> dict:
     """
-            ),
-        ]
+    Candidates already scored in this run or in the evaluation cache
+    (often the unchanged current draft), from their _known_review
+    results: not paid for again.
+    """
+    known = {draft: review for draft, review in zip(drafts, reviews) if review is not None}
+    if known:
+        state["run_metrics"]["evaluation_cache_hits"] = (
+            state["run_metrics"].get("evaluation_cache_hits", 0) + len(known)
+        )
+    return known
+
+
+def _select_best(state: LinkedInPostState, drafts: list, known: dict, scored: list, reviews: list) -> dict:
+    """
+    Advances with the best-scoring candidate and hands its review to the
+    evaluator, which then skips re-scoring that exact draft.
+    Ties go to the earlier (more conservative) candidate.
+    """
+    by_draft = {**known, **dict(zip(scored, reviews))}
+    best = max(drafts, key=lambda draft: (by_draft[draft].total_score, -drafts.index(draft)))
+    state["run_metrics"]["optimizer_candidates_evaluated"] = (
+        state["run_metrics"].get("optimizer_candidates_evaluated", 0) + len(scored)
+    )
+
+    return {
+        "draft_post": best,
+        "iteration_count": state["iteration_count"] + 1,
+        "candidate_review": {
+            "draft_id": draft_id(best),
+            **by_draft[best].model_dump(),
+        },
+    }
+
+
+def _charge_candidates(state: LinkedInPostState, messages: list, n: int):
+    for _ in range(n):
+        charge_cost(state, 'optimizer', messages)
+
+
+def _evaluation_batch(state: LinkedInPostState, drafts: list) -> list:
+    batch = [_build_evaluation_messages({**state, "draft_post": draft}) for draft in drafts]
+    for evaluation_messages in batch:
+        charge_cost(state, 'evaluator', evaluation_messages)
+    return batch
+
+
+# Scoring calls run inside the optimizer node but are charged to the
+# evaluator: the tag lets UsageCollector book their usage there too
+EVALUATION_CONFIG = {"metadata": {"agent": "evaluator"}}
+
+
+def _optimize_candidates(state: LinkedInPostState, messages: list, n: int) -> dict:
+    _charge_candidates(state, messages, n)
+    drafts = _unique_drafts(_candidate_generators(n).invoke(messages))
+
+    known = _known_reviews(state, drafts, [_known_review({**state, "draft_post": d})[0] for d in drafts])
+    scored = [draft for draft in drafts if draft not in known]
+    reviews = structured_evaluator.batch(_evaluation_batch(state, scored), EVALUATION_CONFIG) if scored else []
+    for draft, review in zip(scored, reviews):
+        _store_review(draft, state["intent"], review)
+    return _select_best(state, drafts, known, scored, reviews)
+
+
+async def _aoptimize_candidates(state: LinkedInPostState, messages: list, n: int) -> dict:
+    _charge_candidates(state, messages, n)
+    drafts = _unique_drafts(await _candidate_generators(n).ainvoke(messages))
+
+    found = await asyncio.gather(*(_aknown_review({**state, "draft_post": d}) for d in drafts))
+    known = _known_reviews(state, drafts, [review for review, _ in found])
+    scored = [draft for draft in drafts if draft not in known]
+    reviews = await structured_evaluator.abatch(_evaluation_batch(state, scored), EVALUATION_CONFIG) if scored else []
+    await asyncio.gather(*(_astore_review(draft, state["intent"], review) for draft, review in zip(scored, reviews)))
+    return _select_best(state, drafts, known, scored, reviews)
+
+
+# ---------- NODES ----------
+
+def optimize_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    def _optimize(state):
+        messages = _build_messages(state)
 
-        
         state["run_metrics"]["optimizer_runs"] += 1
-        if state['run_metrics']['token_budget_remaining'] < ESTIMATED_TOKEN_COSTS["optimizer"]:
+        if not can_afford(state, 'optimizer', messages):
             state['run_metrics']['stop_reason'] = 'token_budget_exceeded'
-            return state
+            return {"run_metrics": state["run_metrics"]}
+
+        candidates = _affordable_candidates(state, messages)
+        if candidates > 1:
+            return _optimize_candidates(state, messages, candidates)
         
-        charge_cost(state, 'optimizer')
+        charge_cost(state, 'optimizer', messages)
         response = optimizer_llm.invoke(messages).content
         return {
                 "draft_post": response,
@@ -94,3 +293,33 @@ def optimize_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
     if '__fail_soft__' in result:
         return result
     return result
+
+
+async def aoptimize_linkedin_post(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of optimize_linkedin_post (non-blocking, token-streamed).
+    With optimizer_candidates > 1, candidates are generated and scored
+    concurrently instead of streamed.
+    """
+    async def _optimize(state):
+        messages = _build_messages(state)
+
+        state["run_metrics"]["optimizer_runs"] += 1
+        if not can_afford(state, 'optimizer', messages):
+            state['run_metrics']['stop_reason'] = 'token_budget_exceeded'
+            return {"run_metrics": state["run_metrics"]}
+
+        candidates = _affordable_candidates(state, messages)
+        if candidates > 1:
+            return await _aoptimize_candidates(state, messages, candidates)
+
+        charge_cost(state, 'optimizer', messages)
+        response = await astream_llm_text(
+            optimizer_llm, messages,
+            node="optimizer", iteration=state["iteration_count"] + 1,
+        )
+        return {
+                "draft_post": response,
+                "iteration_count": state["iteration_count"] + 1,
+            }
+    return await asafe_llm_call(_optimize, state, agent_name='optimizer')
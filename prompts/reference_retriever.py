@@ -1,7 +1,26 @@
 
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from graph.costs import count_text_tokens
+from graph.reference_index import ReferenceIndex, load_index
 from graph.state import LinkedInPostState
 
 
+# Exemplars are few-shot context, not content: cap what they add per prompt
+def reference_token_budget() -> int:
+    return int(os.getenv("REFERENCE_TOKEN_BUDGET", "400"))
+
+
+def reference_top_k() -> int:
+    return int(os.getenv("REFERENCE_TOP_K", "5"))
+
+
+def reference_min_similarity() -> float:
+    return float(os.getenv("REFERENCE_MIN_SIMILARITY", "0.05"))
+
+
 # ---- Proof-of-Work reference snippets (style + density only) ----
 
 PROOF_OF_WORK_REFERENCES = [
@@ -50,19 +69,63 @@ Lesson: shipping reliable systems beats mastering isolated techniques.
 ]
 
 
-def reference_retriever(state: LinkedInPostState) -> LinkedInPostState:
-    """
-    Attaches intent-specific reference intelligence to the state.
-    References are used for style, density, and reasoning patterns only.
-    """
+# ---- Index ----
+
+@lru_cache(maxsize=1)
+def builtin_index() -> ReferenceIndex:
+    """The snippets above, used when no corpus index has been built."""
+    entries = [
+        {"text": text.strip(), "intent": intent, "communication_style": None, "tokens": count_text_tokens(text.strip())}
+        for intent, texts in (
+            ("PROOF_OF_WORK", PROOF_OF_WORK_REFERENCES),
+            ("TECH_THOUGHT_LEADERSHIP", TECH_THOUGHT_LEADERSHIP_REFERENCES),
+        )
+        for text in texts
+    ]
+    return ReferenceIndex.from_entries(entries, version="builtin")
+
 
-    if state["intent"] == "PROOF_OF_WORK":
-        state["references"] = PROOF_OF_WORK_REFERENCES
+def get_reference_index() -> ReferenceIndex:
+    return load_index() or builtin_index()
 
-    elif state["intent"] == "TECH_THOUGHT_LEADERSHIP":
-        state["references"] = TECH_THOUGHT_LEADERSHIP_REFERENCES
 
-    else:
-        state["references"] = []
+def select_within_budget(hits: List[Tuple[float, Dict[str, Any]]], budget: int) -> Tuple[List[str], int]:
+    """
+    Best-first: keeps each hit that still fits the token budget, so one
+    long exemplar does not crowd out the shorter ones ranked after it.
+    When no hit clears REFERENCE_MIN_SIMILARITY (short topics share few
+    words with any exemplar), the best one that fits is kept anyway:
+    it still shows the intent's style.
+    """
+    selected, used = [], 0
+    for score, entry in hits:
+        if score < reference_min_similarity() or used + entry["tokens"] > budget:
+            continue
+        selected.append(entry["text"])
+        used += entry["tokens"]
+    if not selected:
+        for score, entry in hits:
+            if entry["tokens"] <= budget:
+                return [entry["text"]], entry["tokens"]
+    return selected, used
+
 
-    return state
+def reference_retriever(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Retrieves the exemplar posts closest to the topic (same intent and
+    style) that fit REFERENCE_TOKEN_BUDGET; the generator injects them.
+    References are used for style, density, and reasoning patterns only.
+    """
+    query = dict(
+        text=state["topic"],
+        intent=state.get("intent"),
+        style=state.get("communication_style"),
+        k=reference_top_k(),
+    )
+    hits = get_reference_index().search(**query)
+    if query["intent"] and not any(entry.get("intent") == query["intent"] for _, entry in hits):
+        # The corpus has no exemplar of this intent: use the built-in ones
+        hits = builtin_index().search(**query)
+    references, tokens = select_within_budget(hits, reference_token_budget())
+    state["run_metrics"]["reference_tokens"] = tokens
+    return {"references": references}
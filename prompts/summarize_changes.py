@@ -1,55 +1,68 @@
 from pydantic import BaseModel
-from langchain_core.messages import SystemMessage, HumanMessage
 from graph.state import LinkedInPostState
 from models.llm_config import change_summary_llm
+from models.lazy import LazyRunnable
 from graph.costs import charge_cost
-from graph.guards import safe_llm_call
+from graph.guards import safe_llm_call, asafe_llm_call
+from prompts.templates import PromptTemplate
 
 
 class ChangeSummary(BaseModel):
     summary: str
 
-structured_summary_llm = change_summary_llm.with_structured_output(ChangeSummary)
+structured_summary_llm = LazyRunnable(
+    lambda: change_summary_llm.with_structured_output(ChangeSummary),
+    name="structured_summary_llm",
+)
 
+SUMMARY_TEMPLATE = PromptTemplate(
+    "summarizer",
+    "2",
+    prefix=[
+        "You summarize editorial changes across iterations.\n"
+        "Do NOT rescore or re-evaluate.\n"
+        "Do NOT introduce new claims.\n"
+        "Only describe what improved, weakened, or stayed the same.\n"
+        "Summarize the changes clearly for a user."
+    ],
+    suffix=(
+        "Initial feedback:\n{initial_feedback}\n\n"
+        "Final feedback (best iteration):\n{final_feedback}\n\n"
+        "Active Focus dimensions:\n{focus}"
+    ),
+)
 
-def summarize_changes(state: LinkedInPostState) -> LinkedInPostState:
-    def _summarize(state):
-        best = state.get("best_iteration")
-        history = state.get("review_feedback_history", [])
 
-        state["run_metrics"]["best_score"] = (
-        best["quality_score"] if best else state["quality_score"]
-        )
-        state["run_metrics"]["final_score"] = state["run_metrics"]["best_score"]
+def _build_messages(state: LinkedInPostState):
+    """
+    Records final scores and returns the summarizer messages,
+    or None when there is nothing to summarize.
+    """
+    best = state.get("best_iteration")
+    history = state.get("review_feedback_history", [])
+
+    state["run_metrics"]["best_score"] = (
+    best["quality_score"] if best else state["quality_score"]
+    )
+    state["run_metrics"]["final_score"] = state["run_metrics"]["best_score"]
+
+    if not best or len(history) < 1:
+        return None
+
+    return SUMMARY_TEMPLATE.render(
+        initial_feedback=history[0],
+        final_feedback=best["review_feedback"],
+        focus=best["frozen_focus_factors"],
+    )
 
-        if not best or len(history) < 1:
+
+def summarize_changes(state: LinkedInPostState) -> LinkedInPostState:
+    def _summarize(state):
+        messages = _build_messages(state)
+        if messages is None:
             return {"change_summary": None}
 
-        messages = [
-            SystemMessage(
-                content=(
-                    "You summarize editorial changes across iterations.\n"
-                    "Do NOT rescore or re-evaluate.\n"
-                    "Do NOT introduce new claims.\n"
-                    "Only describe what improved, weakened, or stayed the same."
-                )
-            ),
-            HumanMessage(
-                content=f"""
-            Initial feedback:
-            {history[0]}
-
-            Final feedback (best iteration):
-            {best['review_feedback']}
-
-            Active Focus dimensions:
-            {best["frozen_focus_factors"]}
-
-            Summarize the changes clearly for a user.
-            """
-                    ),
-        ]
-        charge_cost(state, "summarizer")
+        charge_cost(state, "summarizer", messages)
         response = structured_summary_llm.invoke(messages)
         return {"change_summary": response.summary}
     
@@ -57,3 +70,22 @@ def summarize_changes(state: LinkedInPostState) -> LinkedInPostState:
     if '__fail_soft__' in result:
         return {'change_summary':None}
     return result
+
+
+async def asummarize_changes(state: LinkedInPostState) -> LinkedInPostState:
+    """
+    Async variant of summarize_changes (non-blocking LLM call).
+    """
+    async def _summarize(state):
+        messages = _build_messages(state)
+        if messages is None:
+            return {"change_summary": None}
+
+        charge_cost(state, "summarizer", messages)
+        response = await structured_summary_llm.ainvoke(messages)
+        return {"change_summary": response.summary}
+
+    result = await asafe_llm_call(_summarize, state, agent_name='summarizer')
+    if '__fail_soft__' in result:
+        return {'change_summary':None}
+    return result
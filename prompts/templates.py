@@ -0,0 +1,90 @@
+"""
+Versioned prompt layout. Every prompt in prompts/ is rendered as
+- a static prefix: system messages that depend only on the template and
+  a few variant keys (intent, communication style), byte-identical for
+  every request with the same variant;
+- a dynamic suffix: one final HumanMessage holding everything
+  request-specific (topic, draft, feedback, references).
+
+The split keeps prompts diffable and versioned (prompt_version() is
+part of the run cache key).
+"""
+import hashlib
+import importlib
+import json
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+
+# A prefix part is static text, or (variant key, {variant value: text})
+PrefixPart = Union[str, Tuple[str, Mapping[str, str]]]
+
+TEMPLATES: Dict[str, "PromptTemplate"] = {}
+
+
+def intent_variant(intent: Optional[str]) -> str:
+    # Anything that is not thought leadership follows the stricter rules
+    return "TECH_THOUGHT_LEADERSHIP" if intent == "TECH_THOUGHT_LEADERSHIP" else "PROOF_OF_WORK"
+
+
+class PromptTemplate:
+    """
+    Static prefix + dynamic suffix. `version` is bumped by hand on
+    intentional changes; `version_id` also carries a hash of the text,
+    so an edit without a bump still yields a new id.
+    """
+
+    def __init__(self, name: str, version: str, prefix: List[PrefixPart], suffix: str):
+        self.name = name
+        self.version = version
+        self.prefix = prefix
+        self.suffix = suffix
+        TEMPLATES[name] = self
+
+    @property
+    def variant_keys(self) -> List[str]:
+        return [part[0] for part in self.prefix if not isinstance(part, str)]
+
+    def prefix_messages(self, **variants: str) -> List[BaseMessage]:
+        return [
+            SystemMessage(content=part if isinstance(part, str) else part[1][variants[part[0]]])
+            for part in self.prefix
+        ]
+
+    def render(self, variants: Optional[Mapping[str, str]] = None, **values) -> List[BaseMessage]:
+        return self.prefix_messages(**(variants or {})) + [HumanMessage(content=self.suffix.format(**values))]
+
+    @property
+    def version_id(self) -> str:
+        text = json.dumps([self.prefix, self.suffix], sort_keys=True)
+        return f"{self.version}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+
+# Modules that define templates; imported on demand, since agents
+# (and so their templates) are otherwise loaded lazily
+PROMPT_MODULES = (
+    "prompts.intent_classifier",
+    "prompts.generator",
+    "prompts.evaluator",
+    "prompts.optimizer",
+    "prompts.evaluate_and_rewrite",
+    "prompts.summarize_changes",
+)
+
+
+def template_versions() -> Dict[str, str]:
+    for module in PROMPT_MODULES:
+        importlib.import_module(module)
+    return {name: template.version_id for name, template in sorted(TEMPLATES.items())}
+
+
+@lru_cache(maxsize=1)
+def prompt_version() -> str:
+    """
+    Digest of every template's version_id: changes with any prompt
+    text, so cached results of older prompts are never served.
+    """
+    text = json.dumps(template_versions(), sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
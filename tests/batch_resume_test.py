@@ -0,0 +1,75 @@
+import asyncio
+import json
+import pytest
+from app import batch
+
+
+def test_batch_resume_skips_completed_requests(mocker, tmp_path):
+    # --------------------------------------------------
+    # Mock the workflow run (call-site mocking)
+    # --------------------------------------------------
+    calls = []
+
+    async def fake_run_one(line_number, request, digest, run_store):
+        calls.append(request.topic)
+        status = "error" if request.topic == "flaky" else "ok"
+        return {"request_hash": digest, "line": line_number, "status": status}
+
+    mocker.patch("app.batch.run_one", fake_run_one)
+    mocker.patch("app.batch.build_run_store")
+
+    input_path = tmp_path / "posts.jsonl"
+    output_path = tmp_path / "results.jsonl"
+    input_path.write_text(
+        "\n".join([
+            json.dumps({"topic": "a"}),
+            json.dumps({"topic": "b", "max_iterations": 2}),
+            json.dumps({"topic": "a"}),               # duplicate of line 1
+            json.dumps({"topic": "flaky"}),
+            json.dumps({"max_iterations": 2}),        # invalid: no topic
+        ])
+    )
+
+    first = asyncio.run(batch.run_batch(str(input_path), str(output_path), concurrency=2))
+    assert first == {"submitted": 3, "ok": 2, "error": 1, "skipped": 1, "invalid": 1}
+
+    # --------------------------------------------------
+    # Resume: only the failed request runs again
+    # --------------------------------------------------
+    calls.clear()
+    second = asyncio.run(batch.run_batch(str(input_path), str(output_path), concurrency=2))
+
+    assert calls == ["flaky"]
+    assert second["skipped"] == 3
+
+
+def test_fail_soft_run_is_an_error_and_retried(mocker, tmp_path):
+    from typing import Any, Dict, TypedDict
+    from langgraph.graph import StateGraph, START, END
+    from app.main import PostRequest
+    from graph.guards import safe_llm_call
+
+    class _State(TypedDict):
+        run_metrics: Dict[str, Any]
+        draft_post: str
+
+    def outage(state):
+        raise TimeoutError("provider down")
+
+    graph = StateGraph(_State)
+    graph.add_node("generate_linkedin_post", lambda s: safe_llm_call(outage, s, agent_name="generator"))
+    graph.add_edge(START, "generate_linkedin_post")
+    graph.add_edge("generate_linkedin_post", END)
+    mocker.patch.object(batch, "get_workflow", return_value=graph.compile())
+    run_store = mocker.Mock()
+
+    request = PostRequest(topic="a")
+    record = asyncio.run(batch.run_one(1, request, batch.request_hash(request), run_store))
+
+    assert record["status"] == "error"
+    assert record["error"] == "fail-soft: generator_fail_soft"
+    run_store.record.assert_not_called()
+
+    output_path = tmp_path / "results.jsonl"
+    output_path.write_text(json.dumps(record) + "\n")
+    assert batch.load_completed(str(output_path)) == set()
@@ -0,0 +1,66 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from models import cassette
+from models.cassette import CassetteMiss, ReplayChatOpenAI
+from prompts.evaluator import LinkedInPostReview
+
+
+REVIEW = {
+    "review_decision": "revise",
+    "hook_strength": 6,
+    "factual_grounding": 7,
+    "causal_clarity": 4,
+    "interpretive_judgment": 5,
+    "density": 8,
+    "total_score": 30,
+    "review_feedback": "Explain the cause",
+}
+
+
+@pytest.fixture
+def cassette_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CASSETTE_DIR", str(tmp_path))
+    cassette.get_cassette.cache_clear()
+    yield tmp_path
+    cassette.get_cassette.cache_clear()
+
+
+def test_recorded_structured_call_replays_offline(cassette_dir, mocker):
+    reviewer = ReplayChatOpenAI(model="gpt-4.1-mini", temperature=0.0).with_structured_output(LinkedInPostReview)
+    messages = [HumanMessage(content="Review this draft")]
+    request_key = mocker.spy(cassette, "request_key")
+
+    with pytest.raises(CassetteMiss):
+        reviewer.invoke(messages)
+
+    # What RecordingChatOpenAI writes after the real call
+    node, request = request_key.call_args.args
+    message = AIMessage(
+        content="{}",
+        additional_kwargs={"parsed": LinkedInPostReview(**REVIEW)},
+        usage_metadata={"input_tokens": 100, "output_tokens": 40, "total_tokens": 140},
+    )
+    cassette.get_cassette().record(node, request, ChatResult(generations=[ChatGeneration(message=message)]), 0.8)
+
+    # The schema travels with the request: a field change would miss
+    assert request["response_format"]["json_schema"]["schema"] == LinkedInPostReview.model_json_schema()
+    assert reviewer.invoke(messages) == LinkedInPostReview(**REVIEW)
+    assert (cassette_dir / "unknown.jsonl").exists()
+    assert cassette.get_cassette().stats()["hits"] == 1
+
+
+def test_unrecorded_request_misses(cassette_dir, monkeypatch):
+    reviewer = ReplayChatOpenAI(model="gpt-4.1-mini", temperature=0.0).with_structured_output(LinkedInPostReview)
+
+    with pytest.raises(CassetteMiss):
+        reviewer.invoke([HumanMessage(content="A prompt nobody recorded")])
+
+    # fake: schema-valid answer, the same one every time for the same request
+    monkeypatch.setenv("CASSETTE_ON_MISS", "fake")
+    first = reviewer.invoke([HumanMessage(content="A prompt nobody recorded")])
+    assert first.total_score == sum(
+        getattr(first, f) for f in ("hook_strength", "factual_grounding", "causal_clarity", "interpretive_judgment", "density")
+    )
+    assert reviewer.invoke([HumanMessage(content="A prompt nobody recorded")]) == first
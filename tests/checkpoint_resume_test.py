@@ -0,0 +1,79 @@
+import asyncio
+from operator import add
+from typing import Annotated, Any, Dict, List, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from graph.checkpoints import open_checkpointer, thread_config, aresume_point
+from graph.guards import is_fail_soft
+from graph.workflow import should_continue
+
+
+class _State(TypedDict):
+    run_metrics: Dict[str, Any]
+    calls: Annotated[List[str], add]
+
+
+def _build(fail: dict):
+    def first(state):
+        return {"calls": ["first"]}
+
+    def flaky(state):
+        if fail["flaky"]:
+            state["run_metrics"]["stop_reason"] = "flaky_fail_soft"
+            return {"__fail_soft__": True}
+        return {"calls": ["flaky"]}
+
+    def last(state):
+        return {"calls": ["last"]}
+
+    graph = StateGraph(_State)
+    graph.add_node("first", first)
+    graph.add_node("flaky", flaky)
+    graph.add_node("last", last)
+    graph.add_edge(START, "first")
+    graph.add_edge("first", "flaky")
+    graph.add_conditional_edges("flaky", lambda s: END if is_fail_soft(s) else "last")
+    graph.add_edge("last", END)
+    return graph
+
+
+def test_fail_soft_run_resumes_at_failed_node(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+    fail = {"flaky": True}
+
+    async def scenario():
+        async with open_checkpointer() as checkpointer:
+            workflow = _build(fail).compile(checkpointer=checkpointer)
+            config = thread_config("run-1")
+
+            await workflow.ainvoke({"run_metrics": {"stop_reason": None}, "calls": []}, config, durability="sync")
+            snapshot = await aresume_point(workflow, "run-1")
+
+            fail["flaky"] = False
+            final_state = await workflow.ainvoke(None, {"configurable": snapshot.config["configurable"]})
+            return snapshot, final_state, await aresume_point(workflow, "run-1")
+
+    snapshot, final_state, after = asyncio.run(scenario())
+
+    assert snapshot.next == ("flaky",)
+    assert final_state["calls"] == ["first", "flaky", "last"]   # "first" not re-run
+    assert final_state["run_metrics"]["stop_reason"] is None
+    assert after is None                                         # completed: nothing to resume
+
+
+def test_unknown_run_has_no_resume_point(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+
+    async def scenario():
+        async with open_checkpointer() as checkpointer:
+            return await aresume_point(_build({"flaky": False}).compile(checkpointer=checkpointer), "missing")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_recorded_fail_soft_stops_the_loop():
+    # The `__fail_soft__` flag itself never reaches state; the stop reason does
+    state = {"run_metrics": {"stop_reason": "evaluator_fail_soft"}, "iteration_count": 1}
+
+    assert should_continue(state) == "summarize_changes"
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+from models.lazy import LazyRunnable
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_builds_no_clients():
+    # Fresh interpreter without an API key: import must neither need one
+    # nor pull in the OpenAI SDK or compile the graph
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    probe = (
+        "import json, sys, app.main, graph.workflow as w, models.lazy as l;"
+        "print(json.dumps({"
+        "'openai': 'openai' in sys.modules,"
+        "'langchain_openai': 'langchain_openai' in sys.modules,"
+        "'compiled': w.get_workflow.cache_info().currsize,"
+        "'built': sum(i._runnable is not None for i in l.LazyRunnable.instances)}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", probe], env=env, cwd=REPO_ROOT, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == {
+        "openai": False,
+        "langchain_openai": False,
+        "compiled": 0,
+        "built": 0,
+    }
+
+
+def test_lazy_runnable_builds_once_and_delegates(mocker):
+    factory = mocker.Mock(return_value=mocker.Mock(invoke=lambda *a, **k: "ok", model_name="m"))
+    lazy = LazyRunnable(factory, name="test")
+    LazyRunnable.instances.remove(lazy)
+
+    assert factory.call_count == 0
+    assert lazy.invoke("x") == "ok"
+    assert lazy.model_name == "m"
+    assert factory.call_count == 1
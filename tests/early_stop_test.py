@@ -0,0 +1,48 @@
+from graph import early_stop
+from graph.early_stop import EarlyStopModel, simulate, training_samples
+
+
+def _run(totals, tokens_per_iteration=1000):
+    steps = [
+        {
+            "iteration": i,
+            "scores": {"hook_strength": total // 5, "density": total // 5},
+            "total_score": total,
+            "active_focus_factors": ["hook_strength", "density"],
+        }
+        for i, total in enumerate(totals)
+    ]
+    return {"steps": steps, "total_tokens": tokens_per_iteration * len(totals), "tokens_per_iteration": tokens_per_iteration}
+
+
+def test_model_learns_that_high_scores_rarely_improve():
+    # Low first drafts keep improving; high ones never do
+    runs = [_run([20, 25, 30])] * 10 + [_run([38, 36, 37])] * 10
+    X, y = training_samples(runs)
+    model = EarlyStopModel.fit(X, y)
+
+    low = model.predict(X[0])
+    high = model.predict(X[-2])
+    assert low > 0.5 > high
+
+    report = simulate(model, runs, threshold=0.5)
+    assert report["stopped_early"] == 10
+    assert report["tokens_saved"] == 10 * 2 * 1000
+    assert report["mean_score_lost"] == 0.0
+
+
+def test_predictor_stops_below_threshold(mocker, monkeypatch):
+    model = mocker.Mock()
+    model.predict.return_value = 0.05
+    mocker.patch.object(early_stop, "load_model", return_value=model)
+    monkeypatch.setenv("EARLY_STOP_THRESHOLD", "0.1")
+
+    run = _run([30, 31])
+    state = {
+        "history": [{**s, "draft_id": str(i)} for i, s in enumerate(run["steps"])],
+        "iteration_focus_history": run["steps"],
+        "run_metrics": {},
+    }
+
+    assert early_stop.should_stop_early(state) is True
+    assert state["run_metrics"]["improvement_probability"] == 0.05
@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from models.fake import FakeChatModel, latency_sampler
+from prompts.evaluator import LinkedInPostReview
+
+
+def test_structured_output_is_schema_valid():
+    llm = FakeChatModel(model="gpt-4.1-mini", latency_ms="fixed:0")
+
+    review = llm.with_structured_output(LinkedInPostReview).invoke([HumanMessage(content="Rate this post")])
+
+    assert isinstance(review, LinkedInPostReview)
+    dimensions = review.model_dump(exclude={"review_decision", "total_score", "review_feedback"})
+    assert review.total_score == sum(dimensions.values())
+
+
+def test_streamed_text_reports_usage_like_openai():
+    llm = FakeChatModel(model="gpt-4.1", latency_ms="fixed:0", completion_tokens=20)
+
+    async def collect():
+        chunks = [chunk async for chunk in llm.astream([HumanMessage(content="x" * 400)])]
+        return chunks
+
+    chunks = asyncio.run(collect())
+    message = sum(chunks[1:], chunks[0])
+
+    assert len(message.content.split(" ")) == 20
+    assert message.usage_metadata["input_tokens"] == 100
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("fixed:50", 0.05, 0.05),
+    ("uniform:10:20", 0.01, 0.02),
+])
+def test_latency_specs(spec, low, high):
+    sample = latency_sampler(spec)
+    rng = random.Random(0)
+
+    assert all(low <= sample(rng) <= high for _ in range(50))
+
+
+def test_seed_reproduces_outputs_across_threads(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setenv("FAKE_LLM_SEED", "7")
+    llm = FakeChatModel(model="gpt-4.1-mini", latency_ms="fixed:0").with_structured_output(LinkedInPostReview)
+    messages = [HumanMessage(content="Rate this post")]
+
+    with ThreadPoolExecutor(4) as pool:
+        reviews = list(pool.map(lambda _: llm.invoke(messages), range(4)))
+
+    # Temperature 0: same input, same answer, whichever thread runs it
+    assert len({review.model_dump_json() for review in reviews}) == 1
+    # Sampled calls with the same input still differ from one another
+    sampled = FakeChatModel(model="gpt-4.1", latency_ms="fixed:0", completion_tokens=20).bind(temperature=0.9)
+    assert sampled.invoke(messages).content != sampled.invoke(messages).content
@@ -0,0 +1,39 @@
+from prompts import generator as gen
+from graph.workflow import build_graph
+
+
+def _state(topic):
+    return {
+        "topic": topic,
+        "intent": None,
+        "communication_style": "ENGINEERING_DIRECT",
+        "run_metrics": {
+            "llm_calls": {"intent_classifier": 0, "generator": 0},
+            "token_budget_remaining": 40000,
+            "estimated_tokens_used": 0,
+            "stop_reason": None,
+        },
+    }
+
+
+def test_ambiguous_topic_gets_intent_and_draft_from_one_call(mocker):
+    fused = mocker.patch.object(gen, "structured_fused_generator")
+    fused.invoke.return_value = gen.FusedDraftOutput(
+        prompt_intent="TECH_THOUGHT_LEADERSHIP", draft_post="draft"
+    )
+
+    state = _state("Thoughts on vector databases")
+    result = gen.classify_and_generate(state)
+
+    fused.invoke.assert_called_once()
+    assert result == {"intent": "TECH_THOUGHT_LEADERSHIP", "draft_post": "draft"}
+    assert state["run_metrics"]["llm_calls"] == {"intent_classifier": 0, "generator": 1}
+    assert state["run_metrics"]["intent_fast_path"] is False
+
+
+def test_fused_graph_skips_the_classifier_hop():
+    nodes = set(build_graph(fused_generation=True).nodes)
+
+    assert "classify_and_generate" in nodes
+    assert "intent_classifier" not in nodes
+    assert "generate_linkedin_post" not in nodes
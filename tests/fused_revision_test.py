@@ -0,0 +1,84 @@
+import pytest
+from pydantic import ValidationError
+
+from prompts import evaluate_and_rewrite as fused
+from graph.workflow import build_graph
+
+
+def _state():
+    return {
+        "topic": "Test",
+        "intent": "PROOF_OF_WORK",
+        "communication_style": "VIRAL_ENGINEER",
+        "draft_post": "v0",
+        "iteration_count": 0,
+        "focus_graduation_threshold": 8,
+        "history": [],
+        "best_iteration": None,
+        "proposed_revision": None,
+        "run_metrics": {
+            "llm_calls": {"reviser": 0, "optimizer": 0},
+            "iterations": 0,
+            "optimizer_runs": 0,
+            "token_budget_remaining": 40000,
+            "estimated_tokens_used": 0,
+            "initial_score": None,
+        },
+    }
+
+
+def test_one_call_scores_the_draft_and_proposes_the_next(mocker):
+    mocker.patch.object(fused, "_reused_review", return_value=(None, None))
+    store = mocker.patch.object(fused, "_store_review")
+    reviser = mocker.patch.object(fused, "structured_reviser")
+    reviser.invoke.return_value = fused.ReviewAndRevision(
+        review_decision="revise",
+        hook_strength=6,
+        factual_grounding=7,
+        causal_clarity=4,
+        interpretive_judgment=5,
+        density=8,
+        total_score=30,
+        review_feedback="Explain the cause",
+        revised_draft="v1",
+    )
+
+    state = _state()
+    update = fused.evaluate_and_rewrite(state)
+
+    reviser.invoke.assert_called_once()
+    assert update["quality_score"] == 30
+    assert update["frozen_focus_factors"] == ["causal_clarity", "interpretive_judgment"]
+    assert update["proposed_revision"] == "v1"
+    assert state["run_metrics"]["llm_calls"] == {"reviser": 1, "optimizer": 0}
+    # Later runs reuse the review through the evaluation cache
+    draft, intent, review = store.call_args.args
+    assert (draft, intent, review.total_score) == ("v0", "PROOF_OF_WORK", 30)
+    assert not hasattr(review, "revised_draft")
+
+    applied = fused.apply_revision({**state, **update})
+    assert applied == {"draft_post": "v1", "iteration_count": 1, "proposed_revision": None}
+
+
+def test_reused_review_falls_back_to_the_optimizer(mocker):
+    optimize = mocker.patch.object(fused, "optimize_linkedin_post", return_value={"draft_post": "v1"})
+
+    assert fused.apply_revision(_state()) == {"draft_post": "v1"}
+    optimize.assert_called_once()
+
+
+def test_fused_revision_graph_loops_over_two_nodes():
+    graph = build_graph(fused_revision=True)
+
+    assert {"evaluate_and_rewrite", "apply_revision"} <= set(graph.nodes)
+    assert ("apply_revision", "evaluate_and_rewrite") in graph.edges
+    assert "optimize_linkedin_post" not in graph.nodes
+
+
+def test_best_of_n_is_rejected_in_fused_mode(monkeypatch):
+    from app.main import PostRequest
+
+    monkeypatch.setenv("FUSED_REVISION", "true")
+    with pytest.raises(ValidationError, match="FUSED_REVISION"):
+        PostRequest(topic="Test", optimizer_candidates=2)
+    assert PostRequest(topic="Test").optimizer_candidates == 1
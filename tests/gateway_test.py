@@ -0,0 +1,60 @@
+import asyncio
+
+from models import gateway
+from models.gateway import GatewayChatOpenAI, InFlight, ModelRateLimiter
+
+
+def test_rate_limiter_queues_instead_of_rejecting(mocker):
+    mocker.patch("models.gateway.time.monotonic", return_value=100.0)
+    requests = ModelRateLimiter(rpm=60)
+    tokens = ModelRateLimiter(tpm=6000)
+
+    # One minute's worth of requests is available immediately,
+    # the next caller waits for a slot (1s at 60 RPM)
+    assert all(requests.reserve(10) == 0 for _ in range(60))
+    assert requests.reserve(10) == 1.0
+
+    # 6000 TPM refills 100 tokens/s: a 1000-token overdraft waits 10s
+    assert tokens.reserve(5000) == 0
+    assert tokens.reserve(2000) == 10.0
+
+    # Reported usage below the reservation gives tokens back
+    tokens.settle(reserved=2000, actual=500)
+    assert tokens.tokens.available == 500
+
+
+
+def test_each_worker_process_gets_a_share_of_the_limits(monkeypatch):
+    monkeypatch.setattr(gateway, "_limiters", {})
+    monkeypatch.setenv("LLM_RATE_LIMITS", '{"gpt-4.1": {"rpm": 500, "tpm": 30000}}')
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+
+    limiter = gateway.rate_limiter("gpt-4.1")
+    assert (limiter.requests.capacity, limiter.tokens.capacity) == (125, 7500)
+
+def test_in_flight_identical_calls_share_one_request():
+    in_flight = InFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "review"
+
+    async def scenario():
+        return await asyncio.gather(*[in_flight.arun("same-prompt", call) for _ in range(3)])
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert {result for result, _ in results} == {"review"}
+
+
+def test_only_deterministic_requests_are_coalesced():
+    llm = GatewayChatOpenAI(model="gpt-4.1-mini", temperature=0.0, api_key="test")
+    payload = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "x"}]}
+
+    assert llm._coalesce_key({**payload, "temperature": 0.0}) is not None
+    # Best-of-N candidates sample on purpose: never merge them
+    assert llm._coalesce_key({**payload, "temperature": 0.7}) is None
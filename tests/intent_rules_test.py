@@ -0,0 +1,35 @@
+import pytest
+from prompts import intent_classifier as ic
+
+
+@pytest.mark.parametrize("topic, expected", [
+    ("I built a semantic cache and reduced p95 latency by 40% (1.2s to 700ms). Repo: github.com/me/cache", "PROOF_OF_WORK"),
+    ("We shipped a new eval harness for our agents", "PROOF_OF_WORK"),
+    ("Why most AI systems fail in production: lessons on tradeoffs", "TECH_THOUGHT_LEADERSHIP"),
+    ("Teams often over-invest in models instead of observability", "TECH_THOUGHT_LEADERSHIP"),
+])
+def test_obvious_topics_take_the_fast_path(topic, expected):
+    intent, confidence = ic.classify_intent_locally(topic)
+
+    assert intent == expected
+    assert confidence >= ic.INTENT_FAST_PATH_THRESHOLD
+
+
+def test_ambiguous_topic_falls_back_to_llm(mocker):
+    llm = mocker.patch.object(ic, "structured_intent_llm")
+    llm.invoke.return_value = ic.IntentOutput(prompt_intent="TECH_THOUGHT_LEADERSHIP")
+
+    state = {
+        "topic": "Thoughts on vector databases",
+        "run_metrics": {
+            "llm_calls": {"intent_classifier": 0},
+            "token_budget_remaining": 40000,
+            "estimated_tokens_used": 0,
+        },
+    }
+    result = ic.intent_classifier(state)
+
+    llm.invoke.assert_called_once()
+    assert result == {"intent": "TECH_THOUGHT_LEADERSHIP"}
+    assert state["run_metrics"]["intent_fast_path"] is False
+    assert state["run_metrics"]["llm_calls"]["intent_classifier"] == 1
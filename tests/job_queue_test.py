@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+import pytest
+
+from graph import job_queue
+from graph.job_queue import JobQueue, JobWorkerPool, webhook_url_error
+
+
+REQUEST = {"topic": "Cut p95 latency 40% with a reranker cache", "max_iterations": 2}
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05, max_attempts=2)
+    job, created = queue.enqueue(REQUEST, idempotency_key="retry-1")
+    assert created
+    # A client retry gets the same job, not a second run
+    assert queue.enqueue(REQUEST, idempotency_key="retry-1") == (job, False)
+
+    claimed = queue.claim()
+    assert (claimed["status"], claimed["attempts"], claimed["run_id"]) == ("running", 1, job["run_id"])
+    assert queue.claim() is None
+
+    # Worker died: the lease runs out and another worker takes over
+    time.sleep(0.06)
+    assert queue.claim()["attempts"] == 2
+    time.sleep(0.06)
+    assert queue.claim()["status"] == "failed"
+    assert queue.stats()["failed"] == 1
+
+
+def _drain(queue, handler, until):
+    async def scenario():
+        pool = JobWorkerPool(queue, handler, workers=2, poll_interval=0.01)
+        pool.start()
+        try:
+            for _ in range(200):
+                if until():
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_pool_runs_jobs_and_calls_the_webhook(tmp_path, mocker):
+    deliver = mocker.patch.object(job_queue, "deliver_webhook", mocker.AsyncMock(return_value=(True, "delivered (200)")))
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job, _ = queue.enqueue(REQUEST, webhook_url="https://example.com/hook")
+
+    async def handler(job):
+        return {"final_post": job["request"]["topic"], "final_score": 41}
+
+    _drain(queue, handler, lambda: queue.get(job["job_id"])["webhook_status"] not in (None, "pending"))
+
+    finished = queue.get(job["job_id"])
+    assert finished["status"] == "succeeded"
+    assert finished["result"] == {"final_post": REQUEST["topic"], "final_score": 41}
+    assert finished["webhook_status"] == "delivered (200)"
+    assert deliver.call_args.args[0]["status"] == "succeeded"
+
+
+def test_webhook_left_pending_by_a_crash_is_sent_and_retried(tmp_path, mocker):
+    deliver = mocker.patch.object(job_queue, "deliver_webhook", mocker.AsyncMock(
+        side_effect=[(False, "failed (503)"), (True, "delivered (200)")]
+    ))
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), webhook_backoff_seconds=0)
+    job, _ = queue.enqueue(REQUEST, webhook_url="https://example.com/hook")
+    queue.claim()
+    # The process finished the job and died before sending the callback
+    queue.complete(job["job_id"], {"final_score": 41})
+    assert queue.get(job["job_id"])["webhook_status"] == "pending"
+
+    async def handler(job):
+        raise AssertionError("nothing left to run")
+
+    _drain(queue, handler, lambda: queue.get(job["job_id"])["webhook_status"] != "pending")
+
+    sent = queue.get(job["job_id"])
+    assert (sent["webhook_status"], sent["webhook_attempts"]) == ("delivered (200)", 2)
+    assert deliver.call_count == 2
+
+
+def test_failed_attempt_backs_off(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), retry_backoff_seconds=0.2)
+    job, _ = queue.enqueue(REQUEST)
+    queue.claim()
+
+    assert queue.fail(job["job_id"], "RuntimeError: provider down") == "queued"
+    assert queue.claim() is None
+    time.sleep(0.25)
+    assert queue.claim()["attempts"] == 2
+
+
+@pytest.mark.parametrize("url, allowed", [
+    ("https://hooks.example.com/done", True),
+    ("http://hooks.example.com/done", False),
+    ("https://127.0.0.1/done", False),
+    ("https://169.254.169.254/latest/meta-data", False),
+    ("https://[::1]/done", False),
+    ("https://10.0.0.5/done", False),
+    ("https://localhost:8000/done", False),
+    ("https://user:pw@hooks.example.com/done", False),
+])
+def test_webhook_url_must_be_public_https(url, allowed):
+    assert (webhook_url_error(url) is None) == allowed
+
+
+def test_webhook_allowlist_overrides_the_public_check(monkeypatch):
+    monkeypatch.setenv("JOB_WEBHOOK_ALLOWED_HOSTS", "*.example.com,10.0.0.5")
+    assert webhook_url_error("https://hooks.example.com/done") is None
+    assert webhook_url_error("https://10.0.0.5/done") is None
+    assert webhook_url_error("https://example.org/done") is not None
+
+
+def test_failing_job_is_retried_then_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_backoff_seconds=0)
+    job, _ = queue.enqueue(REQUEST)
+    calls = []
+
+    async def handler(job):
+        calls.append(job["attempts"])
+        raise RuntimeError("provider down")
+
+    _drain(queue, handler, lambda: queue.get(job["job_id"])["status"] == "failed")
+
+    assert calls == [1, 2]
+    assert queue.get(job["job_id"])["error"] == "RuntimeError: provider down"
+
+
+def test_stopping_the_pool_hands_running_jobs_back(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job, _ = queue.enqueue(REQUEST)
+
+    async def handler(job):
+        await asyncio.sleep(60)
+
+    _drain(queue, handler, lambda: queue.get(job["job_id"])["status"] == "running")
+
+    released = queue.get(job["job_id"])
+    assert (released["status"], released["attempts"]) == ("queued", 0)
+
+
+def test_app_opens_the_queue_and_run_store_in_the_lifespan(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import app.main as service
+
+    for name, value in {"JOB_QUEUE_PATH": tmp_path / "jobs.sqlite3", "RUN_STORE_PATH": tmp_path / "runs.sqlite3",
+                        "JOB_WORKERS": "0", "CHECKPOINT_BACKEND": "off", "LLM_WARMUP": "false"}.items():
+        monkeypatch.setenv(name, str(value))
+    # Importing the app created nothing
+    assert service.app.state.job_queue is None
+    assert not (tmp_path / "jobs.sqlite3").exists()
+
+    with TestClient(service.app) as client:
+        assert client.post("/jobs", json={"topic": REQUEST["topic"]}).status_code == 202
+        assert (tmp_path / "jobs.sqlite3").exists()
+    assert service.app.state.job_queue is None
+
+
+def test_fail_soft_run_fails_the_job_attempt(mocker):
+    from typing import Any, Dict, TypedDict
+    from langgraph.graph import StateGraph, START, END
+    import app.main as service
+    from graph.guards import safe_llm_call
+
+    class _State(TypedDict):
+        run_metrics: Dict[str, Any]
+        draft_post: str
+
+    def outage(state):
+        raise TimeoutError("provider down")
+
+    graph = StateGraph(_State)
+    graph.add_node("generate_linkedin_post", lambda s: safe_llm_call(outage, s, agent_name="generator"))
+    graph.add_edge(START, "generate_linkedin_post")
+    graph.add_edge("generate_linkedin_post", END)
+    mocker.patch.object(service, "current_workflow", return_value=graph.compile())
+    mocker.patch.object(service.app.state, "run_cache", service.NullCache())
+    finish_run = mocker.patch.object(service, "finish_run", mocker.AsyncMock(return_value={}))
+
+    job = {"job_id": "j1", "run_id": "r1", "attempts": 1, "request": {"topic": REQUEST["topic"]}}
+    with pytest.raises(service.FailSoftRun, match="generator_fail_soft"):
+        asyncio.run(service.run_job(job))
+    # Logged and kept resumable, then handed back to the queue
+    finish_run.assert_awaited_once()
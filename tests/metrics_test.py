@@ -0,0 +1,38 @@
+from prometheus_client import REGISTRY
+
+from graph.cache import MemoryCache
+from graph.metrics import metrics_payload, record_run, register_cache
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_record_run_counts_stop_reason_and_rollbacks():
+    before_runs = _sample("linkedin_optimizer_runs_total", stop_reason="Non_Focus_Regressed")
+    before_rollbacks = _sample("linkedin_optimizer_rollbacks_total")
+    before_tokens = _sample("linkedin_optimizer_run_tokens_sum")
+
+    record_run({
+        "stop_reason": "Non_Focus_Regressed",
+        "iterations": 3,
+        "rollbacks": 1,
+        "total_tokens": 12000,
+        "total_cost_usd": 0.02,
+    })
+
+    assert _sample("linkedin_optimizer_runs_total", stop_reason="Non_Focus_Regressed") == before_runs + 1
+    assert _sample("linkedin_optimizer_rollbacks_total") == before_rollbacks + 1
+    assert _sample("linkedin_optimizer_run_tokens_sum") == before_tokens + 12000
+
+
+def test_cache_hit_rate_is_read_at_scrape_time():
+    cache = MemoryCache()
+    register_cache("test", cache)
+    cache.set("k", 1)
+    cache.get("k")
+    cache.get("missing")
+
+    payload, _ = metrics_payload()
+
+    assert b'linkedin_optimizer_cache_hit_rate{cache="test"} 0.5' in payload
@@ -0,0 +1,104 @@
+import pytest
+from langchain_core.messages import AIMessage
+from prompts import optimizer, evaluator
+from prompts.evaluator import LinkedInPostReview
+
+
+DIMENSIONS = ["hook_strength", "factual_grounding", "causal_clarity", "interpretive_judgment", "density"]
+
+
+def _review(total):
+    return LinkedInPostReview(
+        review_decision="revise",
+        hook_strength=total // 5,
+        factual_grounding=total // 5,
+        causal_clarity=total // 5,
+        interpretive_judgment=total // 5,
+        density=total // 5,
+        total_score=total,
+        review_feedback=f"scored {total}",
+    )
+
+
+def _state():
+    return {
+        "topic": "Test",
+        "intent": "PROOF_OF_WORK",
+        "communication_style": "VIRAL_ENGINEER",
+        "draft_post": "v0",
+        "review_feedback": "Baseline",
+        "iteration_count": 0,
+        "optimizer_candidates": 3,
+        "scores": {},
+        "frozen_focus_factors": ["density"],
+        "active_focus_factors": ["density"],
+        "focus_graduation_threshold": 8,
+        "history": [{"iteration": 0, "draft_post": "v0", "scores": dict.fromkeys(DIMENSIONS, 5)}],
+        "iteration_focus_history": [{"iteration": 0, "scores": {"density": 5}}],
+        "best_iteration": None,
+        "run_metrics": {
+            "llm_calls": {"optimizer": 0, "evaluator": 0},
+            "iterations": 1,
+            "optimizer_runs": 0,
+            "token_budget_remaining": 40000,
+            "estimated_tokens_used": 0,
+            "initial_score": None,
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def empty_evaluation_cache(mocker):
+    mocker.patch.object(evaluator, "evaluation_cache", mocker.MagicMock(get=lambda key: None))
+
+
+def test_best_candidate_wins_and_is_not_rescored(mocker):
+    # Two distinct rewrites + one duplicate of the first
+    generators = mocker.MagicMock()
+    generators.invoke.return_value = {
+        "candidate_0": AIMessage(content="safe"),
+        "candidate_1": AIMessage(content="bold"),
+        "candidate_2": AIMessage(content="safe"),
+    }
+    mocker.patch.object(optimizer, "_candidate_generators", return_value=generators)
+    scorer = mocker.patch.object(optimizer, "structured_evaluator")
+    scorer.batch.return_value = [_review(30), _review(35)]
+
+    state = _state()
+    update = optimizer.optimize_linkedin_post(state)
+
+    assert update["draft_post"] == "bold"
+    assert update["iteration_count"] == 1
+    assert len(scorer.batch.call_args.args[0]) == 2          # duplicate scored once
+    assert state["run_metrics"]["llm_calls"] == {"optimizer": 3, "evaluator": 2}
+
+    # Evaluator reuses the winning candidate's review
+    evaluator_llm = mocker.patch.object(evaluator, "structured_evaluator")
+    mocker.patch.object(evaluator, "log_iteration_focus")
+    result = evaluator.evaluate_linkedin_post({**state, **update})
+
+    evaluator_llm.invoke.assert_not_called()
+    assert result["quality_score"] == 35
+    assert result["candidate_review"] is None
+
+
+def test_already_scored_candidate_is_not_paid_for_and_still_stops_the_loop(mocker):
+    # Candidate 0 hands back the current draft unchanged
+    generators = mocker.MagicMock()
+    generators.invoke.return_value = {"candidate_0": AIMessage(content="v0"), "candidate_1": AIMessage(content="bold")}
+    mocker.patch.object(optimizer, "_candidate_generators", return_value=generators)
+    scorer = mocker.patch.object(optimizer, "structured_evaluator")
+    scorer.batch.return_value = [_review(20)]
+
+    state = _state()
+    state["history"][0].update(total_score=25, review_feedback="Baseline")
+    update = optimizer.optimize_linkedin_post(state)
+
+    assert scorer.batch.call_args.args[0] == [evaluator._build_messages({**state, "draft_post": "bold"})]
+    assert state["run_metrics"]["llm_calls"]["evaluator"] == 1
+    assert update["draft_post"] == "v0"
+
+    # The handed-over review still marks the draft as repeated
+    mocker.patch.object(evaluator, "log_iteration_focus")
+    result = evaluator.evaluate_linkedin_post({**state, **update})
+    assert result["repeated_draft"] == "unchanged"
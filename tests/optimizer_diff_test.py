@@ -0,0 +1,60 @@
+from graph.costs import count_message_tokens
+from graph.state import draft_id
+from prompts import evaluate_and_rewrite, optimizer
+from prompts.optimizer import anchor_diff
+
+
+ANCHOR = (
+    "We moved reranking behind a semantic cache. p95 latency dropped from 2.1s to 640ms.\n\n"
+    "Most of the gain came from skipping the cross-encoder on near-duplicate queries. "
+    "Cache invalidation was the hard part. Index rebuilds bump a version in every cache key."
+)
+
+
+def _state(draft, anchor):
+    return {
+        "intent": "PROOF_OF_WORK",
+        "draft_post": draft,
+        "review_feedback": "Explain the cause",
+        "active_focus_factors": ["causal_clarity"],
+        "iteration_count": 1,
+        "history": [{"draft_id": draft_id(anchor)}],
+        "drafts": {draft_id(anchor): anchor},
+    }
+
+
+def test_anchor_diff_lists_only_changed_sentences():
+    current = ANCHOR.replace("Cache invalidation was the hard part.", "Cache invalidation, not caching, was the hard part.")
+
+    assert anchor_diff(ANCHOR, ANCHOR) == "Identical to the current draft."
+    assert anchor_diff(ANCHOR, current) == (
+        "= (3 unchanged)\n"
+        "- Cache invalidation was the hard part.\n"
+        "+ Cache invalidation, not caching, was the hard part.\n"
+        "= (1 unchanged)"
+    )
+    # A full rewrite diffs larger than the anchor: quoted as-is
+    assert anchor_diff(ANCHOR, "Something else entirely.") == f'"""\n{ANCHOR}\n"""'
+
+
+def test_diff_mode_sends_the_draft_once(monkeypatch):
+    state = _state(ANCHOR, ANCHOR)
+    full = optimizer._build_messages(state)
+    monkeypatch.setenv("OPTIMIZER_PROMPT_MODE", "diff")
+    diff = optimizer._build_messages(state)
+
+    assert full[-1].content.count("Index rebuilds") == 2
+    assert diff[-1].content.count("Index rebuilds") == 1
+    assert diff[-1].content.endswith("Identical to the current draft.")
+    assert count_message_tokens(diff[-1:]) < count_message_tokens(full[-1:])
+
+
+def test_reviser_diff_mode_keeps_the_evaluator_prefix(monkeypatch):
+    state = _state(ANCHOR.replace("2.1s", "2.1 seconds"), ANCHOR)
+    full = evaluate_and_rewrite._build_messages(state)
+    monkeypatch.setenv("OPTIMIZER_PROMPT_MODE", "diff")
+    diff = evaluate_and_rewrite._build_messages(state)
+
+    assert [m.content for m in diff[:len(full) - 1]] == [m.content for m in full[:-1]]
+    assert "- p95 latency dropped from 2.1s to 640ms." in diff[-1].content
+    assert count_message_tokens(diff[-1:]) < count_message_tokens(full[-1:])
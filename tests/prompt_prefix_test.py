@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from langchain_openai import ChatOpenAI
+
+from prompts import evaluate_and_rewrite, evaluator, generator, optimizer
+from prompts.templates import TEMPLATES, prompt_version, template_versions
+
+
+def _state(topic, draft):
+    return {
+        "topic": topic,
+        "intent": "PROOF_OF_WORK",
+        "communication_style": "STORY_DRIVEN",
+        "references": [f"Exemplar for {topic}"],
+        "draft_post": draft,
+        "review_feedback": f"Feedback on {draft}",
+        "active_focus_factors": ["causal_clarity"],
+        "iteration_count": 1,
+        "history": [],
+        "run_metrics": {},
+    }
+
+
+BUILDERS = [
+    generator._build_messages,
+    generator._build_fused_messages,
+    evaluator._build_messages,
+    optimizer._build_messages,
+    evaluate_and_rewrite._build_messages,
+]
+
+
+@pytest.mark.parametrize("build", BUILDERS)
+def test_prefix_is_byte_identical_across_requests(build):
+    first = build(_state("Cut p95 latency with a reranker cache", "Draft one"))
+    second = build(_state("Sharded the vector index", "Draft two"))
+
+    assert [m.content for m in first[:-1]] == [m.content for m in second[:-1]]
+    assert first[-1].content != second[-1].content
+    # Request-specific text lives only in the suffix
+    assert not any("reranker" in m.content or "Draft one" in m.content for m in first[:-1])
+
+
+def test_serialized_payload_shares_the_prefix_bytes():
+    llm = ChatOpenAI(model="gpt-4.1-mini", api_key="sk-test")
+    payloads = [
+        json.dumps(llm._get_request_payload(generator._build_messages(_state(topic, "d")))["messages"])
+        for topic in ("Cut p95 latency", "Sharded the vector index")
+    ]
+    prefix = json.dumps(llm._get_request_payload(
+        generator.GENERATOR_TEMPLATE.prefix_messages(intent="PROOF_OF_WORK", communication_style="STORY_DRIVEN")
+    )["messages"])[:-1]
+
+    assert all(payload.startswith(prefix) for payload in payloads)
+
+
+def test_prompt_version_follows_the_template_text(monkeypatch):
+    template = TEMPLATES["evaluator"]
+    assert evaluator.EVALUATOR_PROMPT_VERSION == template.version_id
+    assert template.version_id.startswith(f"{template.version}:")
+    assert {"intent_classifier", "generator", "evaluator", "optimizer", "reviser", "summarizer"} <= set(template_versions())
+
+    before = prompt_version()
+    monkeypatch.setattr(template, "suffix", template.suffix + "\nBe brief.")
+    prompt_version.cache_clear()
+    try:
+        assert prompt_version() != before
+    finally:
+        prompt_version.cache_clear()
+
@@ -0,0 +1,74 @@
+import json
+
+from graph.reference_index import build_index, load_index
+from prompts import reference_retriever as retriever
+from prompts.generator import _build_messages
+
+
+CORPUS = [
+    {"text": "Reranker cache cut p95 latency from 2s to 600ms.", "intent": "PROOF_OF_WORK"},
+    {"text": "Sharded the vector index, retrieval latency halved.", "intent": "PROOF_OF_WORK", "communication_style": "STORY_DRIVEN"},
+    {"text": "Agents amplify weak infrastructure; cache invalidation matters more than prompts.", "intent": "TECH_THOUGHT_LEADERSHIP"},
+]
+
+
+def test_index_round_trips_through_the_memory_mapped_matrix(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text("\n".join(json.dumps(line) for line in CORPUS))
+    index = build_index(str(corpus), str(tmp_path / "index"), dim=64)
+
+    assert (tmp_path / "index" / index.version / "embeddings.npy").read_bytes()[:6] == b"\x93NUMPY"
+    hits = index.search("Cut p95 latency with a reranker cache", intent="PROOF_OF_WORK", style="VIRAL_ENGINEER")
+
+    # Style-specific exemplars of another style are filtered out
+    assert [entry["text"] for _, entry in hits] == [CORPUS[0]["text"]]
+    assert hits[0][0] > 0.3
+
+
+def test_only_references_within_the_token_budget_are_injected(mocker, monkeypatch):
+    hits = [
+        (score, {"text": text, "tokens": tokens, "intent": "PROOF_OF_WORK"})
+        for score, text, tokens in ((0.9, "long", 300), (0.8, "short", 80), (0.7, "tiny", 20))
+    ]
+    mocker.patch.object(retriever, "get_reference_index").return_value.search.return_value = hits
+    monkeypatch.setenv("REFERENCE_TOKEN_BUDGET", "120")
+
+    state = {"topic": "T", "intent": "PROOF_OF_WORK", "communication_style": "STORY_DRIVEN", "run_metrics": {}}
+    update = retriever.reference_retriever(state)
+
+    assert update == {"references": ["short", "tiny"]}
+    assert state["run_metrics"]["reference_tokens"] == 100
+
+    messages = _build_messages({**state, **update})
+    assert "short\n---\ntiny" in messages[-1].content
+    assert any("Never reuse their facts" in m.content for m in messages[:-1])
+
+
+def test_rebuilt_index_is_swapped_in_and_picked_up(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text(json.dumps(CORPUS[0]))
+    first = build_index(str(corpus), str(tmp_path / "index"), dim=64)
+    assert load_index(str(tmp_path / "index")).version == first.version
+
+    corpus.write_text("\n".join(json.dumps(line) for line in CORPUS))
+    second = build_index(str(corpus), str(tmp_path / "index"), dim=64)
+
+    assert (tmp_path / "index" / "CURRENT").read_text() == second.version
+    assert len(load_index(str(tmp_path / "index")).entries) == 3
+
+
+def test_weak_matches_still_get_an_exemplar_of_the_intent(tmp_path, mocker):
+    state = {"topic": "I fine-tuned a small model on support tickets", "intent": "PROOF_OF_WORK",
+             "communication_style": "STORY_DRIVEN", "run_metrics": {}}
+    # Built-in snippets: nothing clears REFERENCE_MIN_SIMILARITY for this topic
+    mocker.patch.object(retriever, "get_reference_index", return_value=retriever.builtin_index())
+    references = retriever.reference_retriever(dict(state))["references"]
+    assert len(references) == 1
+    assert references[0] in [text.strip() for text in retriever.PROOF_OF_WORK_REFERENCES]
+
+    # A corpus without exemplars of the intent falls back to the built-in ones
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text(json.dumps(CORPUS[2]))
+    retriever.get_reference_index.return_value = build_index(str(corpus), str(tmp_path / "index"), dim=64)
+    references = retriever.reference_retriever(dict(state))["references"]
+    assert references and references[0] in [text.strip() for text in retriever.PROOF_OF_WORK_REFERENCES]
@@ -0,0 +1,67 @@
+import pytest
+from graph.workflow import should_continue
+from prompts import evaluator
+
+
+def _history_entry(iteration, draft, total):
+    return {
+        "iteration": iteration,
+        "draft_post": draft,
+        "scores": {
+            "hook_strength": 6,
+            "factual_grounding": 6,
+            "causal_clarity": 6,
+            "interpretive_judgment": 6,
+            "density": total - 24,
+        },
+        "total_score": total,
+        "review_feedback": f"feedback {iteration}",
+    }
+
+
+@pytest.mark.parametrize("draft, expected", [("v1", "unchanged"), ("v0", "cyclic")])
+def test_previously_scored_draft_is_reused(mocker, draft, expected):
+    mocker.patch.object(evaluator, "evaluation_cache", mocker.MagicMock(get=lambda key: None))
+    state = {
+        "draft_post": draft,
+        "intent": "PROOF_OF_WORK",
+        "history": [_history_entry(0, "v0", 30), _history_entry(1, "v1", 32)],
+    }
+
+    review, repeated_draft = evaluator._known_review(state)
+
+    assert repeated_draft == expected
+    assert review.total_score == (32 if draft == "v1" else 30)
+
+
+def test_async_lookup_goes_through_the_async_cache(mocker):
+    import asyncio
+
+    cached = _history_entry(0, "v0", 30)
+    review = {**cached["scores"], "review_decision": "revise", "total_score": 30, "review_feedback": "cached"}
+    cache = mocker.patch.object(evaluator, "evaluation_cache")
+    cache.aget = mocker.AsyncMock(return_value=review)
+
+    state = {"draft_post": "v9", "intent": "PROOF_OF_WORK", "history": []}
+    found, repeated_draft = asyncio.run(evaluator._aknown_review(state))
+
+    assert (found.review_feedback, repeated_draft) == ("cached", None)
+    cache.get.assert_not_called()
+
+
+@pytest.mark.parametrize("repeated_draft, stop_reason", [
+    ("unchanged", "Unchanged_Draft"),
+    ("cyclic", "Cyclic_Draft"),
+])
+def test_repeated_draft_stops_the_loop(repeated_draft, stop_reason):
+    state = {
+        "repeated_draft": repeated_draft,
+        "iteration_count": 2,
+        "max_iterations": 5,
+        "quality_score": 30,
+        "active_focus_factors": ["density"],
+        "run_metrics": {"stop_reason": None},
+    }
+
+    assert should_continue(state) == "summarize_changes"
+    assert state["run_metrics"]["stop_reason"] == stop_reason
@@ -0,0 +1,107 @@
+import pytest
+from graph.cache import LazyCache, MemoryCache, SQLiteCache, TieredCache, run_cache_key
+
+
+def test_run_cache_key_normalizes_request():
+    base = {"topic": "Built a RAG cache", "communication_style": "VIRAL_ENGINEER", "max_iterations": 3}
+
+    assert run_cache_key(base) == run_cache_key({**base, "topic": "  Built a RAG\n cache  "})
+    assert run_cache_key(base) != run_cache_key({**base, "max_iterations": 4})
+    assert run_cache_key(base) != run_cache_key({**base, "communication_style": "STORY_DRIVEN"})
+
+
+def test_run_cache_key_changes_with_the_optimizer_prompt_mode(monkeypatch):
+    request = {"topic": "Built a RAG cache", "communication_style": "VIRAL_ENGINEER", "max_iterations": 3}
+    full = run_cache_key(request)
+    monkeypatch.setenv("OPTIMIZER_PROMPT_MODE", "diff")
+
+    assert run_cache_key(request) != full
+
+
+def test_run_cache_key_changes_with_the_early_stop_predictor(tmp_path, monkeypatch):
+    import json
+    import os
+    from graph.early_stop import FEATURES, EarlyStopModel, load_model
+
+    request = {"topic": "Built a RAG cache", "communication_style": "VIRAL_ENGINEER", "max_iterations": 3}
+    path = tmp_path / "early_stop.json"
+    monkeypatch.setenv("EARLY_STOP_MODEL", str(path))
+    off = run_cache_key(request)
+
+    def train(bias, mtime):
+        path.write_text(json.dumps(EarlyStopModel([0.0] * len(FEATURES), bias, [0.0] * len(FEATURES), [1.0] * len(FEATURES)).to_dict()))
+        os.utime(path, (mtime, mtime))
+
+    train(0.5, 1000)
+    trained = run_cache_key(request)
+    monkeypatch.setenv("EARLY_STOP_THRESHOLD", "0.3")
+    stricter = run_cache_key(request)
+    # Retrained in place: the key and the model in use change together
+    train(-0.5, 2000)
+
+    assert len({off, trained, stricter, run_cache_key(request)}) == 4
+    assert load_model().bias == -0.5
+
+
+def test_memory_cache_evicts_lru_and_expires(mocker):
+    clock = mocker.patch("graph.cache.time.time", return_value=1000.0)
+    cache = MemoryCache(max_entries=2, ttl_seconds=10)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1      # "a" becomes most recent
+    cache.set("c", 3)               # evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.return_value = 1011.0
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_tiered_cache_promotes_shared_hits(tmp_path):
+    path = str(tmp_path / "runs.sqlite3")
+    SQLiteCache(path).set("k", {"final_post": "v1"})
+
+    # Fresh worker: empty memory tier, shared SQLite tier
+    cache = TieredCache(MemoryCache(), SQLiteCache(path))
+
+    assert cache.get("k") == {"final_post": "v1"}
+    assert cache.memory.get("k") == {"final_post": "v1"}
+    assert cache.stats()["tiers"]["sqlite"]["hits"] == 1
+
+
+def test_async_lookups_run_sqlite_off_the_event_loop(tmp_path, mocker):
+    import asyncio
+    import threading
+
+    cache = TieredCache(MemoryCache(), SQLiteCache(str(tmp_path / "runs.sqlite3")))
+    threads = []
+    shared_get = cache.shared.get
+    mocker.patch.object(cache.shared, "get", side_effect=lambda key: threads.append(threading.get_ident()) or shared_get(key))
+
+    async def scenario():
+        await cache.aset("k", {"final_post": "v1"})
+        cache.memory = MemoryCache()
+        return await cache.aget("k"), threading.get_ident()
+
+    value, loop_thread = asyncio.run(scenario())
+
+    assert value == {"final_post": "v1"}
+    assert threads and loop_thread not in threads
+
+
+def test_lazy_cache_opens_on_first_use_off_the_event_loop(tmp_path):
+    import asyncio
+    import threading
+
+    opened = []
+    cache = LazyCache(lambda: opened.append(threading.get_ident()) or SQLiteCache(str(tmp_path / "eval.sqlite3")))
+    assert cache.stats() == {"backend": "not opened"}
+    assert not (tmp_path / "eval.sqlite3").exists()
+
+    asyncio.run(cache.aset("k", {"total_score": 30}))
+
+    assert opened and opened[0] != threading.get_ident()
+    assert cache.get("k") == {"total_score": 30}
@@ -0,0 +1,53 @@
+from graph.run_store import RunStore
+
+
+def _final_state(stop_reason, initial, final, cost, intent="PROOF_OF_WORK"):
+    return {
+        "topic": "Test",
+        "intent": intent,
+        "communication_style": "ENGINEERING_DIRECT",
+        "iteration_count": 1,
+        "history": [],
+        "drafts": {},
+        "run_metrics": {
+            "stop_reason": stop_reason,
+            "initial_score": initial,
+            "optimizer_runs": 1,
+            "llm_calls": {"generator": 1, "evaluator": 2},
+            "total_tokens": 1000,
+            "total_cost_usd": cost,
+        },
+    }
+
+
+def test_analytics_aggregate_recorded_runs(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite3"))
+    store.record("a", _final_state("focus_graduated", 30, 40, 0.02), {"final_score": 40, "final_post": "a"})
+    store.record("b", _final_state("Non_Focus_Regressed", 30, 32, 0.02), {"final_score": 32, "final_post": "b"})
+    store.record("c", _final_state("focus_graduated", 28, 36, 0.04, intent="TECH_THOUGHT_LEADERSHIP"),
+                 {"final_score": 36, "final_post": "c"})
+    store.flush()
+
+    result = store.analytics()
+    assert result["runs"] == 3
+    assert result["iterations_distribution"] == {"1": 3}
+    assert result["cost_per_point_gained"] == round(0.08 / 20, 8)
+    assert result["stop_reasons"][0]["stop_reason"] == "focus_graduated"
+    assert result["stop_reasons"][0]["runs"] == 2
+
+    assert store.analytics(intent="PROOF_OF_WORK")["runs"] == 2
+    store.close()
+
+
+def test_rerecorded_run_replaces_its_rollup(tmp_path):
+    # A resumed run finishes (and is recorded) again under its run_id
+    store = RunStore(str(tmp_path / "runs.sqlite3"))
+    store.record("a", _final_state("evaluator_fail_soft", 30, 30, 0.01), {"final_score": 30})
+    store.flush()
+    store.record("a", _final_state("focus_graduated", 30, 40, 0.03), {"final_score": 40})
+    store.close()
+
+    result = store.analytics()
+    assert result["runs"] == 1
+    assert [r["stop_reason"] for r in result["stop_reasons"]] == ["focus_graduated"]
+    assert result["total_cost_usd"] == 0.03
@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.messages import SystemMessage, HumanMessage
+from graph.costs import charge_cost, can_afford, count_message_tokens, estimate_call_tokens, record_usage
+
+
+def _state(draft="", budget=40000):
+    return {
+        "draft_post": draft,
+        "run_metrics": {
+            "llm_calls": {"optimizer": 0},
+            "token_budget_remaining": budget,
+            "estimated_tokens_used": 0,
+            "stop_reason": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "total_cost_usd": 0,
+        },
+    }
+
+
+def _messages(draft):
+    return [SystemMessage(content="You refine posts."), HumanMessage(content=f"Revise:\n{draft}")]
+
+
+def test_estimates_scale_with_rendered_content():
+    short, long = "Cut latency by 40%.", "Cut latency by 40% with a semantic cache. " * 60
+
+    assert count_message_tokens(_messages(long)) > 10 * count_message_tokens(_messages(short))
+    # Optimizer output is predicted from the draft it rewrites
+    assert (
+        estimate_call_tokens(_state(long), "optimizer", _messages(long))
+        > estimate_call_tokens(_state(short), "optimizer", _messages(short))
+    )
+
+
+def test_budget_enforced_on_measured_tokens_and_reconciled():
+    draft = "Cut latency by 40% with a semantic cache. " * 60
+    state = _state(draft, budget=5000)
+    messages = _messages(draft)
+    estimate = estimate_call_tokens(state, "optimizer", messages)
+
+    assert can_afford(state, "optimizer", messages)
+    assert not can_afford(_state(draft, budget=estimate - 1), "optimizer", messages)
+
+    charge_cost(state, "optimizer", messages)
+    assert state["run_metrics"]["token_budget_remaining"] == 5000 - estimate
+
+    # Provider reports the real usage: reservation is replaced by it
+    record_usage(state["run_metrics"], "optimizer", "gpt-4.1-mini", 700, 600)
+
+    assert state["run_metrics"]["token_budget_remaining"] == 5000 - 1300
+    assert state["run_metrics"]["estimation_error_tokens"] == 1300 - estimate
+    assert state["run_metrics"]["pending_estimates"]["optimizer"] == []
+
+
+def test_optimizer_out_of_budget_stops_without_rescoring():
+    from graph.workflow import after_optimize
+    from prompts.optimizer import optimize_linkedin_post
+
+    draft = "Cut latency by 40% with a semantic cache. " * 60
+    state = {
+        **_state(draft, budget=10),
+        "iteration_count": 1,
+        "intent": "PROOF_OF_WORK",
+        "review_feedback": "Tighten the hook.",
+        "active_focus_factors": ["hook_strength"],
+        "frozen_focus_factors": [],
+        "history": [],
+    }
+    state["run_metrics"]["optimizer_runs"] = 0
+
+    update = optimize_linkedin_post(state)
+
+    assert update["run_metrics"]["stop_reason"] == "token_budget_exceeded"
+    assert "draft_post" not in update
+    assert after_optimize({**state, **update}) == "summarize_changes"
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from typing import TypedDict
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph import StateGraph, START, END
+from graph.observability import run_workflow, arun_workflow
+
+
+class UsageReportingChatModel(BaseChatModel):
+    model_name: str = "gpt-4.1-mini-2025-04-14"
+    input_tokens: int = 100
+    output_tokens: int = 50
+
+    @property
+    def _llm_type(self) -> str:
+        return "usage-reporting-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = AIMessage(
+            content="ok",
+            usage_metadata={
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.input_tokens + self.output_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class State(TypedDict):
+    run_metrics: dict
+
+
+def _build_workflow():
+    evaluator = UsageReportingChatModel()
+    generator = UsageReportingChatModel(model_name="gpt-4.1", input_tokens=200, output_tokens=400)
+
+    graph = StateGraph(State)
+    graph.add_node("generate_linkedin_post", lambda s: generator.invoke("draft") and {})
+    graph.add_node("evaluate_linkedin_post", lambda s: evaluator.invoke("score") and {})
+    graph.add_edge(START, "generate_linkedin_post")
+    graph.add_edge("generate_linkedin_post", "evaluate_linkedin_post")
+    graph.add_edge("evaluate_linkedin_post", END)
+    return graph.compile()
+
+
+def _metrics():
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "total_cost_usd": 0}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_usage_is_attributed_per_node_and_per_run(use_async):
+    workflow = _build_workflow()
+    states = [{"run_metrics": _metrics()}, {"run_metrics": _metrics()}]
+
+    if use_async:
+        async def _run_both():
+            return await asyncio.gather(*(arun_workflow(workflow, s, {}) for s in states))
+        results = asyncio.run(_run_both())
+    else:
+        results = [run_workflow(workflow, s, {}) for s in states]
+
+    for final_state in results:
+        metrics = final_state["run_metrics"]
+        assert metrics["prompt_tokens"] == 300
+        assert metrics["completion_tokens"] == 450
+        assert metrics["usage_by_agent"]["generator"]["completion_tokens"] == 400
+        assert metrics["usage_by_agent"]["evaluator"]["prompt_tokens"] == 100
+        # gpt-4.1: 200 * $2 + 400 * $8 ; gpt-4.1-mini: 100 * $0.4 + 50 * $1.6 (per 1M)
+        assert metrics["total_cost_usd"] == pytest.approx((400 + 3200 + 40 + 80) / 1_000_000)
+
+
+def test_best_of_n_scoring_is_booked_to_the_evaluator():
+    from prompts.optimizer import EVALUATION_CONFIG
+
+    model = UsageReportingChatModel()
+
+    def optimize(state):
+        model.invoke("rewrite")
+        model.batch(["score a", "score b"], EVALUATION_CONFIG)
+        return {}
+
+    graph = StateGraph(State)
+    graph.add_node("optimize_linkedin_post", optimize)
+    graph.add_edge(START, "optimize_linkedin_post")
+    graph.add_edge("optimize_linkedin_post", END)
+
+    metrics = {
+        **_metrics(),
+        "token_budget_remaining": 1000,
+        "pending_estimates": {"optimizer": [150], "evaluator": [150, 150]},
+    }
+    final_state = run_workflow(graph.compile(), {"run_metrics": metrics}, {})
+
+    metrics = final_state["run_metrics"]
+    assert metrics["usage_by_agent"]["optimizer"]["calls"] == 1
+    assert metrics["usage_by_agent"]["evaluator"]["calls"] == 2
+    # Every reservation is swapped for its own agent's reported usage
+    assert metrics["pending_estimates"] == {"optimizer": [], "evaluator": []}
+    assert metrics["estimation_error_tokens"] == 0